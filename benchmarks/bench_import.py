@@ -0,0 +1,110 @@
+"""
+Імпорт холодильника файлом: час і пікова памʼять потокового імпорту CSV / JSON
+проти старого шляху (той самий вміст як текст для /add, пачками по 50 продуктів),
+плюс експорт і повторний імпорт (злиття кількостей замість дублікатів).
+
+Дані синтетичні й детерміновані; ~2% рядків навмисно невалідні.
+
+Запуск з кореня репозиторію:
+    python -m benchmarks.bench_import --rows 10000
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+_TMP = tempfile.mkdtemp(prefix="culinary-import-")
+os.environ["DB_PATH"] = os.path.join(_TMP, "bench.db")
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import db
+    import fridge_io
+
+NAMES = ["помідори чері", "яйця", "молоко", "сир твердий", "курка філе", "гречка", "огірки",
+         "тунець консервований", "рис", "морква", "цибуля", "картопля", "йогурт грецький"]
+UNITS = ["г", "кг", "шт", "л", "мл"]
+
+
+def gen_rows(n: int, rnd: random.Random) -> list:
+    rows = []
+    for i in range(n):
+        expiry = f"{rnd.randint(1, 28):02d}.{rnd.randint(1, 12):02d}.{rnd.randint(2025, 2030)}" if rnd.random() < 0.7 else ""
+        qty = "???" if rnd.random() < 0.02 else rnd.choice(["1", "2", "0,5", "300", "1.5", "12"])
+        rows.append((f"{rnd.choice(NAMES)} {i}", qty, rnd.choice(UNITS), expiry))
+    return rows
+
+
+def as_csv(rows: list) -> bytes:
+    lines = ["name;quantity;unit;expiry_date"] + [";".join(r) for r in rows]
+    return ("\n".join(lines) + "\n").encode()
+
+
+def as_json(rows: list) -> bytes:
+    return json.dumps([dict(zip(fridge_io.COLUMNS, r)) for r in rows], ensure_ascii=False).encode()
+
+
+async def measure(make_coro) -> tuple:
+    """Час — окремим прогоном без tracemalloc (він сповільнює в рази), памʼять — другим."""
+    started = time.perf_counter()
+    result = await make_coro(0)
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    await make_coro(1)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, round(elapsed, 3), round(peak / 1e6, 2)
+
+
+async def legacy_add(user_id: int, rows: list, chunk: int = 50):
+    # так імпорт виглядав би через /add: повідомлення по 50 продуктів, кожне — окремий виклик
+    items = [" ".join(x for x in r if x) for r in rows]
+    for i in range(0, len(items), chunk):
+        await db.add_product_to_db(user_id, ", ".join(items[i:i + chunk]))
+
+
+async def run(n: int):
+    db.init_db()
+    rows = gen_rows(n, random.Random(7))
+    documents = {"csv": as_csv(rows), "json": as_json(rows)}
+
+    _, elapsed, peak = await measure(lambda k: legacy_add(1000 + k, rows))
+    print(f"legacy /add x{n // 50:<5d} {elapsed:7.3f}s  peak {peak:6.2f}MB")
+
+    def import_doc(user_id: int, fmt: str, payload: bytes):
+        stream = tempfile.TemporaryFile()
+        stream.write(payload)
+        stream.seek(0)
+        return fridge_io.import_stream(user_id, stream, fmt)
+
+    for fmt, payload in documents.items():
+        base = 2000 if fmt == "csv" else 3000
+        report, elapsed, peak = await measure(lambda k: import_doc(base + k, fmt, payload))
+        print(f"import {fmt:4s} {len(payload) / 1e6:5.2f}MB {elapsed:7.3f}s  peak {peak:6.2f}MB  "
+              f"rows={report.rows} added={report.added} errors={report.error_count}")
+
+    out = tempfile.TemporaryFile()
+    count, elapsed, peak = await measure(lambda k: fridge_io.export_stream(2000, out if not k else tempfile.TemporaryFile(), "csv"))
+    print(f"export csv        {elapsed:7.3f}s  peak {peak:6.2f}MB  rows={count}")
+    out.seek(0)
+    started = time.perf_counter()
+    report = await fridge_io.import_stream(2000, out, "csv")
+    print(f"re-import         {time.perf_counter() - started:7.3f}s  added={report.added} updated={report.updated}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10_000)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+    asyncio.run(run(args.rows))
+
+
+if __name__ == "__main__":
+    main()
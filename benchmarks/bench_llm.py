@@ -0,0 +1,106 @@
+"""
+Перевірка LLMScheduler на локальній OpenAI-заглушці: здорова відповідь,
+сплеск навантаження, повільний бекенд, помилки 5xx і відновлення.
+
+Запуск з кореня репозиторію:
+    python -m benchmarks.bench_llm --requests 150
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from openai import AsyncOpenAI
+
+from benchmarks.fake_openai import FakeOpenAI
+from llm import CircuitBreaker, LLMScheduler, LLMUnavailable
+
+PHASES = [
+    # назва, затримка, частка помилок
+    ("healthy", 0.05, 0.0),
+    ("slow", 2.0, 0.0),
+    ("flaky_5xx", 0.05, 0.3),
+    ("outage", 0.05, 1.0),
+    ("recovered", 0.05, 0.0),
+]
+
+
+def _pct(values, q):
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * q))] * 1000, 1) if values else 0.0
+
+
+async def run_phase(scheduler: LLMScheduler, client: AsyncOpenAI, requests: int) -> dict:
+    ok = fallback = failed = queued = 0
+    latencies = []
+
+    async def on_queued(position):
+        nonlocal queued
+        queued += 1
+
+    async def one():
+        nonlocal ok, fallback, failed
+        start = time.perf_counter()
+        try:
+            await scheduler.run(
+                lambda: client.chat.completions.create(
+                    model="fake", messages=[{"role": "user", "content": "рецепт"}], max_tokens=50,
+                ),
+                on_queued=on_queued,
+            )
+            ok += 1
+        except LLMUnavailable:
+            fallback += 1
+        except Exception:
+            failed += 1
+        latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return {
+        "ok": ok, "fallback": fallback, "failed": failed, "queued": queued,
+        "p50_ms": _pct(latencies, 0.5), "p95_ms": _pct(latencies, 0.95), "max_ms": _pct(latencies, 1.0),
+        "breaker": scheduler.breaker.state,
+    }
+
+
+async def main_async(args) -> dict:
+    fake = FakeOpenAI()
+    base_url = await fake.start()
+    client = AsyncOpenAI(api_key="bench", base_url=base_url, max_retries=0, timeout=30)
+    scheduler = LLMScheduler(
+        max_concurrency=args.concurrency, max_queue=args.queue, deadline=args.deadline,
+        retries=2, backoff=0.05, breaker=CircuitBreaker(failure_threshold=5, reset_timeout=1.0),
+    )
+
+    results = {}
+    for name, latency, error_rate in PHASES:
+        fake.latency, fake.error_rate = latency, error_rate
+        if scheduler.breaker.state != "closed":
+            # чекаємо half-open і пропускаємо один пробний запит
+            await asyncio.sleep(scheduler.breaker.reset_timeout)
+            await run_phase(scheduler, client, 1)
+        results[name] = await run_phase(scheduler, client, args.requests)
+        print(f"{name:10s} {results[name]}")
+
+    await client.close()
+    await fake.stop()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=150)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--queue", type=int, default=200)
+    parser.add_argument("--deadline", type=float, default=3.0)
+    parser.add_argument("--out")
+    args = parser.parse_args()
+
+    results = asyncio.run(main_async(args))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
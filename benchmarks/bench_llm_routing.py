@@ -0,0 +1,89 @@
+"""
+Перевірка маршрутизації LLMRouter на двох локальних OpenAI-заглушках.
+
+Швидкий і повільний бекенд обслуговують той самий клас задач; на середині
+прогону швидкий починає сипати 5xx. Роутер має спершу віддавати перевагу
+швидкому, а потім перейти на здоровий. Окремо перевіряється, що задачі
+класу large йдуть лише на бекенд, який його підтримує.
+
+Запуск з кореня репозиторію:
+    python -m benchmarks.bench_llm_routing --requests 200
+"""
+import argparse
+import asyncio
+import collections
+import json
+
+from benchmarks.fake_openai import FakeOpenAI
+from llm import CircuitBreaker, LLMBackend, LLMRouter, LLMScheduler, LLMUnavailable
+
+MESSAGES = [{"role": "user", "content": "рецепт"}]
+
+
+async def run_batch(router: LLMRouter, tier: str, requests: int) -> dict:
+    used = collections.Counter()
+    before = {b.name: b.requests for b in router.backends}
+    failed = 0
+
+    async def one():
+        nonlocal failed
+        try:
+            await router.complete(tier, MESSAGES)
+        except LLMUnavailable:
+            failed += 1
+
+    # невеликими хвилями, щоб статистика встигала оновлюватись
+    for _ in range(requests // 10):
+        await asyncio.gather(*(one() for _ in range(10)))
+    for b in router.backends:
+        used[b.name] = b.requests - before[b.name]
+    return {
+        "attempts": dict(used),
+        "failed": failed,
+        "stats": {b.name: {"latency_ms": round(b.latency * 1000, 1), "error_rate": round(b.error_rate, 3)}
+                  for b in router.backends},
+    }
+
+
+async def main_async(args) -> dict:
+    fast, slow = FakeOpenAI(latency=0.02), FakeOpenAI(latency=0.15)
+    fast_url, slow_url = await fast.start(), await slow.start()
+
+    backends = [
+        LLMBackend("fast", "fast-model", base_url=fast_url, api_key="x", tiers=["fast", "default"]),
+        LLMBackend("slow", "big-model", base_url=slow_url, api_key="x", tiers=["default", "large"]),
+    ]
+    scheduler = LLMScheduler(max_concurrency=16, deadline=10, retries=3, backoff=0.01,
+                             breaker=CircuitBreaker(failure_threshold=50))
+    router = LLMRouter(backends, scheduler, explore=0.05)
+
+    results = {"default_healthy": await run_batch(router, "default", args.requests)}
+    fast.error_rate = 1.0
+    results["default_fast_failing"] = await run_batch(router, "default", args.requests)
+    fast.error_rate = 0.0
+    results["large_only_big"] = await run_batch(router, "large", args.requests // 2)
+
+    for name, r in results.items():
+        print(f"{name:22s} attempts={r['attempts']} failed={r['failed']} stats={r['stats']}")
+
+    for b in backends:
+        await b.client.close()
+    await fast.stop()
+    await slow.stop()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--out")
+    args = parser.parse_args()
+
+    results = asyncio.run(main_async(args))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
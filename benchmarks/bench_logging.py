@@ -0,0 +1,158 @@
+"""
+Скільки часу event loop витрачає на логи: старі print-и промптів і відповідей
+проти синхронного logging і черги з фоновим потоком (log.py).
+
+Навантаження імітує suggest_recipe + add_product_to_db: на кожен запит —
+промпт ~3 КБ, відповідь ~1 КБ і список розпізнаних продуктів. Вивід іде у
+файл або в pipe з повільним читачем (як stdout контейнера під навантаженням).
+
+Запуск з кореня репозиторію:
+    python -m benchmarks.bench_logging --requests 2000 --sink pipe
+"""
+import argparse
+import asyncio
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import subprocess
+import sys
+import tempfile
+import time
+
+from log import PayloadSampler, StructuredFormatter, _DeferredQueueHandler, fields, payload
+
+PROMPT = ("Ти кулінарний помічник. Ось список продуктів у холодильнику: " + "помідори 300 г, яйця 6 шт, " * 60)[:3000]
+RESPONSE = ("🔶 Омлет\n**Інгредієнти:**\n" + "- яйця, 2 шт\n" * 40 + "**🔷 Рецепт:**\n1. Збий яйця.")[:1000]
+ITEMS = [f"продукт {i} 1 шт" for i in range(10)]
+
+
+def _pct(values, q):
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * q))] * 1000, 3) if values else 0.0
+
+
+def open_sink(kind: str, throttle: float):
+    if kind == "file":
+        return open(os.path.join(tempfile.mkdtemp(), "bench.log"), "w", encoding="utf-8"), None
+    # pipe з читачем, що забирає по 16 КБ і спить — pipe-буфер заповнюється і write() блокує
+    reader = subprocess.Popen(
+        [sys.executable, "-c",
+         f"import sys,time\nwhile sys.stdin.buffer.read1(16384): time.sleep({throttle})"],
+        stdin=subprocess.PIPE,
+    )
+    return open(reader.stdin.fileno(), "w", encoding="utf-8", closefd=False), reader
+
+
+def build(mode: str, out, sample: float):
+    """Повертає (функція логування одного запиту, функція дочекатися запису)."""
+    if mode == "print":
+        def emit(user_id):
+            print("PROMPT:\n", PROMPT, file=out)
+            print("GPT RESPONSE:\n", RESPONSE, file=out)
+            print("🔍 Отримано продукти:", ITEMS, file=out)
+            print("✅ Parsed продукти:", [(user_id, i, 1.0, "шт", None) for i in ITEMS], file=out)
+        return emit, out.flush, None
+
+    logger = logging.getLogger(f"bench.{mode}")
+    logger.propagate = False
+    logger.handlers[:] = []
+    logger.setLevel(logging.INFO if mode == "queue-info" else logging.DEBUG)
+
+    output = logging.StreamHandler(out)
+    output.setFormatter(StructuredFormatter(as_json=True, redact=True))
+    listener = None
+    if mode == "sync":
+        logger.addHandler(output)
+    else:
+        records = queue.SimpleQueue()
+        handler = _DeferredQueueHandler(records)
+        handler.addFilter(PayloadSampler(1.0 if mode == "queue-all" else sample))
+        logger.addHandler(handler)
+        listener = logging.handlers.QueueListener(records, output)
+        listener.start()
+
+    def emit(user_id):
+        logger.debug("Промпт до LLM", extra=payload(user_id=user_id, meal_type="lunch", prompt=PROMPT))
+        logger.debug("Відповідь LLM", extra=payload(user_id=user_id, response=RESPONSE))
+        logger.debug("Розпізнано продукти", extra=payload(user_id=user_id, received=len(ITEMS), items=ITEMS))
+        logger.info("🍽️ Генерація страви дня", extra=fields(user_id=user_id, meal_type="lunch"))
+
+    def drain():
+        if listener is not None:
+            listener.stop()
+        out.flush()
+    return emit, drain, listener
+
+
+async def run_mode(mode: str, args) -> dict:
+    out, reader = open_sink(args.sink, args.throttle)
+    emit, drain, _ = build(mode, out, args.sample)
+    on_loop = []
+    lags = []
+    stop = asyncio.Event()
+
+    async def lag_monitor():
+        loop = asyncio.get_running_loop()
+        while not stop.is_set():
+            start = loop.time()
+            await asyncio.sleep(0.005)
+            lags.append(max(0.0, loop.time() - start - 0.005))
+
+    async def request(user_id):
+        await asyncio.sleep(0)  # "мережевий" виклик
+        start = time.perf_counter()
+        emit(user_id)
+        on_loop.append(time.perf_counter() - start)
+
+    monitor = asyncio.ensure_future(lag_monitor())
+    start = time.perf_counter()
+    for batch in range(0, args.requests, args.concurrency):
+        await asyncio.gather(*(request(i) for i in range(batch, min(args.requests, batch + args.concurrency))))
+        await asyncio.sleep(0)
+    wall = time.perf_counter() - start
+    stop.set()
+    await monitor
+
+    drain_start = time.perf_counter()
+    drain()
+    drained = time.perf_counter() - drain_start
+    out.close()
+    if reader is not None:
+        reader.stdin.close()
+        reader.wait()
+
+    return {
+        "loop_ms_total": round(sum(on_loop) * 1000, 1),
+        "per_request_us": round(sum(on_loop) / len(on_loop) * 1e6, 1),
+        "p99_call_ms": _pct(on_loop, 0.99),
+        "loop_lag_p99_ms": _pct(lags, 0.99),
+        "wall_s": round(wall, 3),
+        "drain_s": round(drained, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--sink", choices=["file", "pipe"], default="pipe")
+    parser.add_argument("--throttle", type=float, default=0.002, help="пауза читача pipe на кожні 16 КБ, с")
+    parser.add_argument("--sample", type=float, default=0.05, help="LOG_PAYLOAD_SAMPLE для режиму queue")
+    parser.add_argument("--out")
+    args = parser.parse_args()
+
+    results = {}
+    for mode in ("print", "sync", "queue-all", "queue", "queue-info"):
+        results[mode] = asyncio.run(run_mode(mode, args))
+        r = results[mode]
+        print(f"{mode:10s} loop={r['loop_ms_total']:9.1f}ms ({r['per_request_us']:8.1f}us/req)  "
+              f"call_p99={r['p99_call_ms']}ms lag_p99={r['loop_lag_p99_ms']}ms  drain={r['drain_s']}s")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+БЖУ для аналітики: скільки холодильників за секунду рахує nutrition.totals_by_key
+(одна векторна операція на всі рядки) проти звичайного циклу по продуктах на Python.
+
+Холодильники синтетичні й детерміновані: назви з таблиці (з «хвостами» на кшталт
+«помідори чері 3») та ~5% невідомих, одиниці — г, кг, мл, л, шт, ложки.
+
+Запуск з кореня репозиторію:
+    python -m benchmarks.bench_nutrition --users 1000 5000 20000 --products 30
+"""
+import argparse
+import json
+import random
+import time
+
+import nutrition
+
+UNITS = ["г", "г", "г", "кг", "мл", "л", "шт", "шт", "ст.л."]
+
+
+def gen_rows(users: int, products: int, rnd: random.Random) -> list:
+    names = list(nutrition.table().index)
+    rows = []
+    for user in range(users):
+        for i in range(products):
+            name = rnd.choice(names) if rnd.random() > 0.05 else f"екзотика {i}"
+            if rnd.random() < 0.3:
+                name += f" {rnd.choice(['свіжі', 'домашній', 'чері', str(i)])}"
+            rows.append((user, name, float(rnd.randint(1, 500)), rnd.choice(UNITS)))
+    return rows
+
+
+def naive_totals(rows: list) -> dict:
+    """Те саме без numpy: пошук і перерахунок одиниць для кожного продукту окремо."""
+    t = nutrition.table()
+    per_gram = t.per_gram.tolist()
+    piece, density = t.piece_g.tolist(), t.density.tolist()
+    totals = {}
+    for key, name, quantity, unit in rows:
+        row = t.lookup(name)
+        kind, scale = nutrition._UNITS.get(unit.lower(), (None, None))
+        if row == t.unknown_row or kind is None:
+            continue
+        grams = quantity * scale * (density[row] if kind == nutrition._VOLUME else
+                                    piece[row] if kind == nutrition._PIECE else 1.0)
+        if grams != grams:  # NaN — немає ваги штуки
+            continue
+        acc = totals.setdefault(key, [0.0, 0.0, 0.0, 0.0])
+        for c, value in enumerate(per_gram[row]):
+            acc[c] += value * grams
+    return {key: nutrition.Macros(*(round(v, 1) for v in acc)) for key, acc in totals.items()}
+
+
+def best_of(fn, rows: list, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(rows)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, nargs="+", default=[1000, 5000, 20000])
+    parser.add_argument("--products", type=int, default=30, help="продуктів у холодильнику")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--out", help="куди записати JSON з результатами")
+    args = parser.parse_args()
+
+    rnd = random.Random(7)
+    results = []
+    for users in args.users:
+        rows = gen_rows(users, args.products, rnd)
+        vector, naive = nutrition.totals_by_key(rows), naive_totals(rows)
+        drift = max(abs(a - b) for key in naive for a, b in zip(vector[key], naive[key]))
+        t_vec = best_of(nutrition.totals_by_key, rows, args.repeat)
+        t_naive = best_of(naive_totals, rows, args.repeat)
+        r = {
+            "users": users, "rows": len(rows),
+            "numpy_ms": round(t_vec * 1000, 1), "python_ms": round(t_naive * 1000, 1),
+            "numpy_fridges_per_sec": round(users / t_vec), "python_fridges_per_sec": round(users / t_naive),
+            "max_drift": round(drift, 3),
+        }
+        results.append(r)
+        print(f"{users:7,d} холодильників ({len(rows):9,d} рядків): numpy {r['numpy_ms']:8.1f} мс "
+              f"({r['numpy_fridges_per_sec']:,}/с)  python {r['python_ms']:8.1f} мс "
+              f"({r['python_fridges_per_sec']:,}/с)  розбіжність {r['max_drift']}")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
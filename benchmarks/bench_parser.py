@@ -0,0 +1,122 @@
+"""
+Розбір введення продуктів: старий поелементний парсер (копія з db.py до product_parser)
+проти product_parser.parse_products на реалістичних повідомленнях.
+
+Старий парсер тут — ще й еталон для властивостей нового: tests/test_product_parser.py
+перевіряє на генерованому корпусі з шумом, що новий розбирає прийняте так само, а
+відхилене — з причиною й позицією.
+
+Запуск з кореня репозиторію:
+    python -m benchmarks.bench_parser --messages 2000
+"""
+import argparse
+import random
+import re
+import time
+import typing
+from datetime import datetime
+
+from product_parser import parse_products
+
+
+# ====== Старий парсер (як був у db.py) ======
+def legacy_normalize_name(name: str) -> str:
+    name = name.lower()
+    synonyms = {
+        "помідор": "томат",
+        "помідори": "томат",
+        "огірки": "огірок",
+        "огурець": "огірок",
+        "яйце": "яйця"
+    }
+    return synonyms.get(name, name)
+
+
+LEGACY_DATE_RE = re.compile(r"\b(\d{2})\.(\d{2})\.(\d{4})\b")
+
+
+def legacy_extract_optional_date(s: str):
+    m = LEGACY_DATE_RE.search(s)
+    if not m:
+        return s.strip(), None
+    date_str = m.group(0)
+    try:
+        datetime.strptime(date_str, "%d.%m.%Y")
+    except ValueError:
+        return s.strip(), None
+    s_wo = (s[:m.start()] + s[m.end():]).strip()
+    s_wo = re.sub(r"[\(\)\-–—]*\s*$", "", s_wo).strip()
+    s_wo = re.sub(r"\s{2,}", " ", s_wo)
+    return s_wo, date_str
+
+
+def legacy_parse_one_item(raw: str):
+    s = raw.strip()
+    if not s:
+        return None
+    s_no_date, date_str = legacy_extract_optional_date(s)
+    parts = s_no_date.split()
+    if len(parts) < 3:
+        return None
+    unit = parts[-1]
+    qty_str = parts[-2]
+    name = " ".join(parts[:-2]).strip().lower()
+    if not name:
+        return None
+    try:
+        quantity = float(qty_str.replace(",", "."))
+    except ValueError:
+        return None
+    return (legacy_normalize_name(name), quantity, unit, date_str)
+
+
+def legacy_parse_message(text: str) -> list:
+    items = [it for it in (x.strip() for x in text.split(",")) if it]
+    return [p for p in (legacy_parse_one_item(raw) for raw in items) if p]
+
+
+# ====== Реалістичні повідомлення ======
+WORDS = ["помідори", "Помідори", "чері", "яйце", "яйця", "молоко", "сир", "твердий", "курка", "філе",
+         "огурець", "Огірки", "гречка", "тунець", "консервований", "рис"]
+UNITS = ["г", "кг", "шт", "л", "мл", "уп", "пачка", "банка"]
+QTYS = ["1", "2", "12", "300", "0.5", "1.5"]
+
+
+def gen_realistic(n: int, rnd: random.Random) -> str:
+    # як пишуть насправді: здебільшого коректні продукти, у більшості — термін
+    items = []
+    for _ in range(n):
+        item = f"{' '.join(rnd.sample(WORDS, rnd.choice([1, 1, 2, 3])))} {rnd.choice(QTYS)} {rnd.choice(UNITS)}"
+        if rnd.random() < 0.7:
+            item += " " + f"{rnd.randint(1, 28):02d}.{rnd.randint(1, 12):02d}.{rnd.randint(2025, 2030)}"
+        items.append(item)
+    return ", ".join(items)
+
+
+def throughput(messages: int, size: int, seed: int = 11) -> typing.Tuple[float, float]:
+    rnd = random.Random(seed)
+    corpus = [gen_realistic(size, rnd) for _ in range(messages)]
+    best = {}
+    for label, fn in (("legacy", legacy_parse_message), ("batch", parse_products)):
+        runs = []
+        for _ in range(5):
+            started = time.perf_counter()
+            for text in corpus:
+                fn(text)
+            runs.append(time.perf_counter() - started)
+        best[label] = messages * size / min(runs)
+    return best["legacy"], best["batch"]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=2000)
+    args = parser.parse_args()
+
+    for size in (1, 10, 60):
+        legacy, batch = throughput(args.messages, size)
+        print(f"{size:3d} елем./повідомлення: legacy {legacy:10,.0f}/s  batch {batch:10,.0f}/s  x{batch / legacy:.1f}")
+
+
+if __name__ == "__main__":
+    main()
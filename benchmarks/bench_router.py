@@ -0,0 +1,91 @@
+"""
+Вартість диспетчеризації callback-кнопки залежно від кількості хендлерів:
+старий спосіб (кожен хендлер зі своїм lambda-фільтром, aiogram перевіряє їх по черзі,
+разом із фільтром стану) проти одного callback_router на весь набір.
+
+Міряється лише вибір хендлера й виклик порожнього хендлера через
+dp.callback_query_handlers.notify — мережі немає, сховище станів у памʼяті.
+
+Запуск з кореня репозиторію:
+    python -m benchmarks.bench_router --handlers 10 25 50 100 200
+"""
+import argparse
+import asyncio
+import time
+
+from aiogram import Bot, Dispatcher, types
+from aiogram.contrib.fsm_storage.memory import MemoryStorage
+
+from callback_router import CallbackRouter, data
+from workers import close_bot_session
+
+
+def callback(value: str) -> types.CallbackQuery:
+    return types.CallbackQuery(**{
+        "id": "1", "chat_instance": "x", "data": value,
+        "from": {"id": 5, "is_bot": False, "first_name": "u"},
+        "message": {"message_id": 9, "date": 0, "chat": {"id": 5, "type": "private"}, "text": "m"},
+    })
+
+
+async def noop(callback_query: types.CallbackQuery, *args, **kwargs):
+    pass
+
+
+def linear_dispatcher(bot: Bot, n: int) -> Dispatcher:
+    dp = Dispatcher(bot, storage=MemoryStorage())
+    for i in range(n):
+        # як у старому register_callback_handlers: префіксні lambda-фільтри
+        dp.register_callback_query_handler(noop, lambda c, p=f"h{i}_": c.data.startswith(p))
+    return dp
+
+
+def routed_dispatcher(bot: Bot, n: int) -> Dispatcher:
+    dp = Dispatcher(bot, storage=MemoryStorage())
+    router = CallbackRouter()
+    for i in range(n):
+        router.add(f"h{i}", "go", noop, int)
+    router.register(dp)
+    return dp
+
+
+async def per_dispatch_us(dp: Dispatcher, value: str, rounds: int) -> float:
+    Dispatcher.set_current(dp)
+    query = callback(value)
+    # те, що aiogram виставляє в process_update перед хендлерами
+    types.User.set_current(query.from_user)
+    types.Chat.set_current(query.message.chat)
+    best = float("inf")
+    for _ in range(5):
+        started = time.perf_counter()
+        for _ in range(rounds):
+            await dp.callback_query_handlers.notify(query)
+        best = min(best, time.perf_counter() - started)
+    return best / rounds * 1e6
+
+
+async def run(sizes, rounds: int):
+    bot = Bot("1:bench")
+    Bot.set_current(bot)
+    print(f"{'хендлерів':>9s} {'lambda, перший':>15s} {'lambda, середній':>17s} {'lambda, останній':>17s} {'роутер':>8s}")
+    for n in sizes:
+        linear = linear_dispatcher(bot, n)
+        routed = routed_dispatcher(bot, n)
+        first = await per_dispatch_us(linear, "h0_42", rounds)
+        middle = await per_dispatch_us(linear, f"h{n // 2}_42", rounds)
+        last = await per_dispatch_us(linear, f"h{n - 1}_42", rounds)
+        router = await per_dispatch_us(routed, data(f"h{n - 1}", "go", 42), rounds)
+        print(f"{n:9d} {first:13.1f}us {middle:15.1f}us {last:15.1f}us {router:6.1f}us")
+    await close_bot_session(bot)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--handlers", type=int, nargs="+", default=[10, 25, 50, 100, 200])
+    parser.add_argument("--rounds", type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(run(args.handlers, args.rounds))
+
+
+if __name__ == "__main__":
+    main()
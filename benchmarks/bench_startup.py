@@ -0,0 +1,149 @@
+"""
+Холодний старт: скільки минає від запуску процесу до першого обробленого апдейта.
+
+Кожен прогін — окремий процес на тому самому фейковому Bot API. Ще до запуску
+в черзі getUpdates лежить /start; бот проходить той самий шлях, що й у
+продакшні (import main → bootstrap.get_dispatcher() → bootstrap.startup() →
+polling) і відповідає на нього. Звіт — медіани по прогонах:
+  import   — import main (імпорт модулів бота);
+  app      — create_app(): Bot, Dispatcher, middleware, хендлери;
+  startup  — хуки старту: схема й міграції БД, outbox, індекс термінів, крон-задачі;
+  first    — від початку polling до кінця обробки /start;
+  total    — від запуску процесу до sendMessage у фейковому Bot API (разом зі стартом інтерпретатора).
+
+Запуск з кореня репозиторію:
+    python -m benchmarks.bench_startup --runs 10
+    python -m benchmarks.bench_startup --runs 10 --rows 50000
+"""
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.fake_telegram import FakeTelegram
+
+PHASES = ("import", "app", "startup", "first", "total")
+
+
+async def child() -> dict:
+    """Один холодний старт у цьому процесі; повертає тривалість фаз у мс."""
+    marks = {"start": time.perf_counter()}
+    import main  # noqa: F401
+    marks["import"] = time.perf_counter()
+
+    import bootstrap
+    from aiogram.dispatcher.middlewares import BaseMiddleware
+    from workers import close_bot_session
+
+    dp = bootstrap.get_dispatcher()
+    marks["app"] = time.perf_counter()
+    await bootstrap.startup(dp)
+    marks["startup"] = time.perf_counter()
+
+    handled = asyncio.Event()
+
+    class _FirstUpdate(BaseMiddleware):
+        async def on_post_process_update(self, update, result, data):
+            handled.set()
+
+    dp.middleware.setup(_FirstUpdate())
+    polling = asyncio.ensure_future(dp.start_polling(timeout=1, relax=0))
+    await handled.wait()
+    marks["first"] = time.perf_counter()
+
+    dp.stop_polling()
+    await asyncio.gather(polling, return_exceptions=True)
+    await bootstrap.shutdown(dp)
+    await dp.storage.close()
+    await dp.storage.wait_closed()
+    await close_bot_session(dp.bot)
+
+    order = ["start", "import", "app", "startup", "first"]
+    return {phase: round((marks[phase] - marks[prev]) * 1000, 1) for prev, phase in zip(order, order[1:])}
+
+
+def fill_db(path: str, rows: int):
+    """Холодильники `rows` продуктів — щоб старт бачив не порожню БД (індекс термінів, міграції)."""
+    env = {**os.environ, "DB_PATH": path, "PRODUCTS_DB_PATH": path}
+    subprocess.run([sys.executable, "-c", "import db; db.init_db()"], env=env, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    conn = sqlite3.connect(path)
+    conn.executemany(
+        "INSERT INTO products (user_id, name, quantity, unit, expiry_date) VALUES (?, ?, ?, ?, ?)",
+        [(i % 2000, f"продукт {i}", 1.0, "шт", f"{i % 28 + 1:02d}.{i % 12 + 1:02d}.2030") for i in range(rows)],
+    )
+    conn.commit()
+    conn.close()
+
+
+async def run_once(tg: FakeTelegram, base_url: str, path: str) -> dict:
+    sent = asyncio.Event()
+    tg.sent.clear()
+    tg.on_call = lambda method, params: sent.set() if method == "sendMessage" else None
+    await tg.push(tg.message_update(1, "/start"))
+
+    env = {
+        **os.environ,
+        "TELEGRAM_API_URL": base_url,
+        "TELEGRAM_BOT_TOKEN": "123456:STARTUP",
+        "OPENAI_API_KEY": "startup",
+        "DB_PATH": path,
+        "PRODUCTS_DB_PATH": path,
+        "FSM_STORAGE": os.getenv("FSM_STORAGE") or "memory",
+        "LOG_LEVEL": "WARNING",
+    }
+    started = time.perf_counter()
+    proc = await asyncio.create_subprocess_exec(
+        sys.executable, "-m", "benchmarks.bench_startup", "--child", env=env,
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL,
+    )
+    await sent.wait()
+    total = time.perf_counter() - started
+    out, _ = await proc.communicate()
+    if proc.returncode:
+        raise RuntimeError(f"прогін завершився з кодом {proc.returncode}")
+    result = json.loads(out.decode().strip().splitlines()[-1])
+    result["total"] = round(total * 1000, 1)
+    return result
+
+
+async def main_async(args) -> dict:
+    tg = FakeTelegram()
+    base_url = await tg.start()
+    path = os.path.join(tempfile.mkdtemp(prefix="culinary-startup-"), "startup.db")
+    fill_db(path, args.rows)
+
+    runs = []
+    for _ in range(args.runs):
+        runs.append(await run_once(tg, base_url, path))
+    await tg.stop()
+    return {phase: round(statistics.median(r[phase] for r in runs), 1) for phase in PHASES}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--rows", type=int, default=10000, help="продуктів у БД перед стартом")
+    parser.add_argument("--out", help="куди записати JSON з результатами")
+    parser.add_argument("--child", action="store_true", help="(службове) один старт у цьому процесі")
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(child())))
+        return
+
+    result = asyncio.run(main_async(args))
+    print("  ".join(f"{phase}={result[phase]}ms" for phase in PHASES))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Пропускна здатність запису й розмір БД: старий режим SQLite (журнал DELETE,
+synchronous=FULL, нове зʼєднання на кожен запит) проти WAL і повністю
+налаштованого режиму (WAL + NORMAL + спільне зʼєднання + кеш/mmap).
+
+Кожен режим запускається в окремому процесі, бо db.py читає налаштування при
+імпорті. Розмір робочої БД (з WAL) міряється до й після maintenance.run() на таблиці, де частина
+продуктів давно прострочена або має нульову кількість.
+
+Запуск з кореня репозиторію:
+    python -m benchmarks.bench_storage --ops 2000 --rows 100000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+MODES = {
+    "legacy": {"DB_JOURNAL_MODE": "delete", "DB_SYNCHRONOUS": "full", "DB_SHARED_CONNECTION": "0",
+               "DB_CACHE_MB": "2", "DB_MMAP_MB": "0"},
+    "wal": {"DB_JOURNAL_MODE": "wal", "DB_SYNCHRONOUS": "normal", "DB_SHARED_CONNECTION": "0",
+            "DB_CACHE_MB": "2", "DB_MMAP_MB": "0"},
+    "tuned": {"DB_JOURNAL_MODE": "wal", "DB_SYNCHRONOUS": "normal", "DB_SHARED_CONNECTION": "1"},
+}
+
+
+def child(ops: int, rows: int):
+    import asyncio
+    import contextlib
+    import io
+    import logging
+    import random
+    import sqlite3
+    import time
+    from datetime import datetime, timedelta
+
+    logging.disable(logging.CRITICAL)
+    with contextlib.redirect_stdout(io.StringIO()):
+        import db
+        import maintenance
+
+    async def run() -> dict:
+        db.init_db()
+        rnd = random.Random(7)
+        result = {}
+
+        start = time.perf_counter()
+        for i in range(ops):
+            await db.add_product_to_db(i % 50, f"продукт {i} 1 шт 01.01.2030")
+        result["insert_ops_s"] = round(ops / (time.perf_counter() - start))
+
+        ids = [row[0] for uid in range(50) for row in await db.get_all_products_with_ids(uid)]
+        start = time.perf_counter()
+        for i in range(ops):
+            await db.update_product_quantity_by_id(rnd.choice(ids), float(i))
+        result["update_ops_s"] = round(ops / (time.perf_counter() - start))
+
+        start = time.perf_counter()
+        for i in range(ops):
+            await db.get_all_products_with_ids(i % 50)
+        result["read_ops_s"] = round(ops / (time.perf_counter() - start))
+
+        # наповнення для обслуговування: перші 40% рядків (додані давно) прострочені, ще 5% — нульові
+        old = (datetime.now() - timedelta(days=90)).strftime("%d.%m.%Y")
+        fresh = (datetime.now() + timedelta(days=10)).strftime("%d.%m.%Y")
+        conn = sqlite3.connect(db.db_path())
+        conn.executemany(
+            "INSERT INTO products (user_id, name, quantity, unit, expiry_date) VALUES (?, ?, ?, ?, ?)",
+            [(rnd.randrange(5000), f"продукт {i} " + "x" * 40, 0 if rnd.random() < 0.05 else 1.0, "шт",
+              old if i < rows * 0.4 else fresh) for i in range(rows)],
+        )
+        conn.commit()
+        conn.close()
+
+        def size_mb(*files):
+            sizes = db.db_size_bytes()
+            return round(sum(sizes.get(f, 0) for f in files) / 1e6, 2)
+
+        result["size_before_mb"] = size_mb("main", "wal")
+        start = time.perf_counter()
+        result["archived"] = await maintenance.run()
+        result["maintenance_s"] = round(time.perf_counter() - start, 2)
+        result["size_after_mb"] = size_mb("main", "wal")
+        result["archive_mb"] = size_mb("archive")
+        return result
+
+    print(json.dumps(asyncio.run(run())))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ops", type=int, default=2000)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--out")
+    args = parser.parse_args()
+    if args.child:
+        child(args.ops, args.rows)
+        return
+
+    results = {}
+    for mode, env in MODES.items():
+        path = os.path.join(tempfile.mkdtemp(prefix="culinary-storage-"), "bench.db")
+        proc = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_storage", "--child", "--ops", str(args.ops), "--rows", str(args.rows)],
+            env={**os.environ, **env, "DB_PATH": path, "PRODUCTS_DB_PATH": path},
+            capture_output=True, text=True, check=True,
+        )
+        results[mode] = r = json.loads(proc.stdout.strip().splitlines()[-1])
+        print(f"{mode:7s} insert={r['insert_ops_s']:6d}/s update={r['update_ops_s']:6d}/s read={r['read_ops_s']:6d}/s  "
+              f"db {r['size_before_mb']}MB -> {r['size_after_mb']}MB, archive {r['archive_mb']}MB "
+              f"({r['archived']} rows, {r['maintenance_s']}s)")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
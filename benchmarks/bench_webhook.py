@@ -0,0 +1,157 @@
+"""
+Порівняння polling і webhook на локальному фейковому Bot API.
+
+Міряє затримку від появи апдейту до входу в хендлер (p50/p95/p99) і
+максимальну кількість апдейтів/с, які встигає обробити бот.
+
+Запуск з кореня репозиторію:
+    python -m benchmarks.bench_webhook --updates 2000 --latency 0.005
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+
+from aiohttp import web
+from aiogram import types
+from aiogram.dispatcher.middlewares import BaseMiddleware
+
+from benchmarks.fake_telegram import FakeTelegram
+from workers import close_bot_session
+
+
+class _Probe(BaseMiddleware):
+    def __init__(self):
+        super().__init__()
+        self.pushed = {}
+        self.latencies = []
+        self.done = 0
+        self.target = 0
+        self.finished = asyncio.Event()
+
+    async def on_process_message(self, message: types.Message, data: dict):
+        started = self.pushed.pop(types.Update.get_current().update_id, None)
+        if started is not None:
+            self.latencies.append(time.perf_counter() - started)
+
+    async def on_post_process_update(self, update: types.Update, result, data: dict):
+        self.done += 1
+        if self.done >= self.target:
+            self.finished.set()
+
+    def reset(self, target: int):
+        self.pushed.clear()
+        self.latencies.clear()
+        self.done = 0
+        self.target = target
+        self.finished = asyncio.Event()
+
+
+def _pct(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] * 1000 if values else 0.0
+
+
+async def _run_phase(tg: FakeTelegram, probe: _Probe, updates: int, users: int, spaced: bool) -> dict:
+    probe.reset(updates)
+    connections = asyncio.Semaphore(40)  # як max_connections у Telegram
+
+    async def push_one(i):
+        update = tg.message_update(10_000 + i % users, "/start")
+        async with connections:
+            probe.pushed[update["update_id"]] = time.perf_counter()
+            await tg.push(update)
+
+    start = time.perf_counter()
+    if spaced:
+        for i in range(updates):
+            await push_one(i)
+            await asyncio.sleep(0.005)
+    else:
+        await asyncio.gather(*(push_one(i) for i in range(updates)))
+    await asyncio.wait_for(probe.finished.wait(), timeout=300)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "p50_ms": round(_pct(probe.latencies, 0.50), 2),
+        "p95_ms": round(_pct(probe.latencies, 0.95), 2),
+        "p99_ms": round(_pct(probe.latencies, 0.99), 2),
+        "mean_ms": round(statistics.mean(probe.latencies) * 1000, 2) if probe.latencies else 0.0,
+        "updates_per_sec": round(updates / elapsed, 1),
+    }
+
+
+async def main_async(args):
+    tg = FakeTelegram(latency=args.latency)
+    base_url = await tg.start()
+
+    os.environ["TELEGRAM_API_URL"] = base_url
+    os.environ.setdefault("TELEGRAM_BOT_TOKEN", "123456:BENCH")
+    os.environ.setdefault("OPENAI_API_KEY", "bench")
+    os.environ.setdefault("DB_PATH", os.path.join(tempfile.mkdtemp(), "bench.db"))
+    os.environ.setdefault("FSM_STORAGE", "memory")
+    import bootstrap
+
+    dp = bootstrap.get_dispatcher()
+    await bootstrap.startup(dp)
+    probe = _Probe()
+    dp.middleware.setup(probe)
+    results = {}
+
+    # --- polling ---
+    polling = asyncio.ensure_future(dp.start_polling(timeout=20, relax=0))
+    await asyncio.sleep(0.2)
+    results["polling"] = {
+        "latency": await _run_phase(tg, probe, args.probes, args.users, spaced=True),
+        "throughput": await _run_phase(tg, probe, args.updates, args.users, spaced=False),
+    }
+    dp.stop_polling()
+    await tg.push(tg.message_update(1, "/start"))  # розбудити long poll
+    await asyncio.gather(polling, return_exceptions=True)
+    await asyncio.sleep(0.1)
+
+    # --- webhook ---
+    from webhook import create_web_app
+    app = create_web_app(dp, "/webhook", secret="bench-secret")
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    await dp.bot.set_webhook(f"http://127.0.0.1:{port}/webhook", secret_token="bench-secret")
+    results["webhook"] = {
+        "latency": await _run_phase(tg, probe, args.probes, args.users, spaced=True),
+        "throughput": await _run_phase(tg, probe, args.updates, args.users, spaced=False),
+    }
+
+    await runner.cleanup()
+    await bootstrap.shutdown(dp)
+    await close_bot_session(dp.bot)
+    await tg.stop()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--probes", type=int, default=200)
+    parser.add_argument("--users", type=int, default=300)
+    parser.add_argument("--latency", type=float, default=0.0, help="затримка фейкового Bot API, с")
+    parser.add_argument("--out", help="куди записати JSON з результатами")
+    args = parser.parse_args()
+
+    results = asyncio.run(main_async(args))
+    for mode, r in results.items():
+        lat, thr = r["latency"], r["throughput"]
+        print(f"{mode:8s} p50={lat['p50_ms']}ms p95={lat['p95_ms']}ms p99={lat['p99_ms']}ms "
+              f"max={thr['updates_per_sec']} upd/s")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
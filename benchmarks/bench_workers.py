@@ -0,0 +1,64 @@
+"""
+Навантажувальний тест шардованого режиму: скільки апдейтів/с обробляють N воркерів.
+
+Запуск з кореня репозиторію:
+    python -m benchmarks.bench_workers --updates 4000 --workers 1 2 4
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing as mp
+import os
+import time
+
+from workers import serve_queue, shard_for
+
+# типовий "важкий" апдейт: довга вставка продуктів
+_PASTE = ", ".join(f"продукт {i} {i % 7 + 1} шт 0{i % 9 + 1}.10.2030" for i in range(60))
+
+
+async def _cpu_process(update: dict):
+    from product_parser import parse_products
+    parse_products(update["message"]["text"])
+
+
+def _worker(q):
+    asyncio.run(serve_queue(q, _cpu_process))
+
+
+def run(workers: int, updates: int, users: int) -> float:
+    ctx = mp.get_context("spawn")
+    queues = [ctx.Queue() for _ in range(workers)]
+    procs = [ctx.Process(target=_worker, args=(q,)) for q in queues]
+    for p in procs:
+        p.start()
+
+    start = time.perf_counter()
+    for i in range(updates):
+        user_id = 1000 + i % users
+        update = {"update_id": i, "message": {"from": {"id": user_id}, "text": _PASTE}}
+        queues[shard_for(user_id, workers)].put(update)
+    for q in queues:
+        q.put(None)
+    for p in procs:
+        p.join()
+    return updates / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--updates", type=int, default=4000)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    results = {}
+    for n in args.workers:
+        results[n] = run(n, args.updates, args.users)
+        base = results[args.workers[0]]
+        print(f"workers={n}: {results[n]:.0f} updates/s (x{results[n] / base:.2f}), cpu={os.cpu_count()}")
+    print(json.dumps({"updates_per_sec": results}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Порівняння двох JSON-звітів benchmarks.micro.
+
+    python -m benchmarks.compare base.json new.json --threshold 0.15
+
+Код виходу 1, якщо хоч один бенчмарк повільніший за поріг.
+"""
+import argparse
+import json
+import sys
+
+
+def _index(report: dict) -> dict:
+    return {
+        (name, r["scale"]): r["min_s"]
+        for name, runs in report["results"].items()
+        for r in runs
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=0.15, help="допустиме сповільнення, частка")
+    args = parser.parse_args()
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+
+    print(f"base {base.get('commit')} → new {new.get('commit')}")
+    base_idx, new_idx = _index(base), _index(new)
+    regressions = 0
+    for key in sorted(base_idx.keys() & new_idx.keys()):
+        ratio = new_idx[key] / base_idx[key] if base_idx[key] else 1.0
+        mark = ""
+        if ratio > 1 + args.threshold:
+            mark = "  ❗ регресія"
+            regressions += 1
+        elif ratio < 1 - args.threshold:
+            mark = "  ✅ швидше"
+        name, scale = key
+        print(f"{name:34s} n={scale:<7d} {base_idx[key] * 1000:9.2f}ms → {new_idx[key] * 1000:9.2f}ms "
+              f"x{ratio:.2f}{mark}")
+
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Локальна OpenAI-сумісна заглушка (/v1/chat/completions) з керованою
+затримкою та помилками.
+
+Окремий запуск:
+    python -m benchmarks.fake_openai --port 8089 --latency 0.5 --error-rate 0.2
+і далі OPENAI_BASE_URL=http://127.0.0.1:8089/v1 для бота.
+
+Під час роботи параметри можна змінити: POST /_control {"latency": 2, "error_rate": 1}.
+"""
+import argparse
+import asyncio
+import collections
+import itertools
+import random
+import time
+
+from aiohttp import web
+
+RECIPE = (
+    "🔶 Омлет з помідорами\n"
+    "**Інгредієнти:**\n"
+    "- яйця, 2 шт\n"
+    "- томат, 1 шт\n"
+    "**🔷 Рецепт:**\n"
+    "1. Збий яйця.\n"
+    "2. Додай томат і смаж 5 хвилин."
+)
+
+
+class FakeOpenAI:
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 error_status: int = 500, content: str = RECIPE):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.content = content
+        self.calls = collections.Counter()
+        self._ids = itertools.count(1)
+        self._runner = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", self._completions)
+        app.router.add_post("/_control", self._control)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return f"http://{host}:{port}/v1"
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    async def _control(self, request: web.Request) -> web.Response:
+        for key, value in (await request.json()).items():
+            if hasattr(self, key):
+                setattr(self, key, value)
+        return web.json_response({"ok": True})
+
+    async def _completions(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        model = body.get("model", "fake")
+        self.calls[model] += 1
+
+        delay = self.latency + random.uniform(0, self.jitter)
+        if delay:
+            await asyncio.sleep(delay)
+
+        if random.random() < self.error_rate:
+            self.calls["errors"] += 1
+            return web.json_response(
+                {"error": {"message": "injected failure", "type": "server_error"}},
+                status=self.error_status,
+            )
+
+        prompt_tokens = sum(len(m.get("content", "")) // 4 for m in body.get("messages", []))
+        completion_tokens = len(self.content) // 4
+        return web.json_response({
+            "id": f"chatcmpl-{next(self._ids)}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": self.content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        })
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=500)
+    args = parser.parse_args()
+
+    async def serve():
+        fake = FakeOpenAI(args.latency, args.jitter, args.error_rate, args.error_status)
+        print("🧪 Fake OpenAI:", await fake.start(args.host, args.port))
+        await asyncio.Event().wait()
+
+    asyncio.run(serve())
+
+
+if __name__ == "__main__":
+    main()
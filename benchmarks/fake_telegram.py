@@ -0,0 +1,169 @@
+"""
+Локальний фейковий Bot API сервер для бенчмарків і навантажувальних тестів.
+
+Підтримує getUpdates (long polling) і доставку через вебхук, відповідає
+валідними обʼєктами на sendMessage/editMessageText/answerCallbackQuery
+та рахує кількість викликів кожного методу.
+"""
+import asyncio
+import collections
+import itertools
+import json
+import time
+import typing
+
+import aiohttp
+from aiohttp import web
+
+
+class FakeTelegram:
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = collections.Counter()
+        self.sent: typing.List[typing.Tuple[str, dict, float]] = []
+        # chat_id → callback_data кнопок останньої клавіатури, яку бот показав у чаті
+        self.buttons: typing.Dict[int, typing.List[str]] = {}
+        self.on_call: typing.Optional[typing.Callable[[str, dict], None]] = None
+
+        self._updates: "asyncio.Queue[dict]" = asyncio.Queue()
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._webhook_url: typing.Optional[str] = None
+        self._secret: typing.Optional[str] = None
+        self._session: typing.Optional[aiohttp.ClientSession] = None
+        self._runner: typing.Optional[web.AppRunner] = None
+
+    # ====== Сервер ======
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        app = web.Application()
+        app.router.add_route("*", "/bot{token}/{method}", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self._session = aiohttp.ClientSession()
+        return f"http://{host}:{port}"
+
+    async def stop(self):
+        if self._session is not None:
+            await self._session.close()
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        if request.content_type == "application/json":
+            params = await request.json()
+        else:
+            params = dict(await request.post())
+        self.calls[method] += 1
+        if self.on_call is not None:
+            self.on_call(method, params)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        result = await self._dispatch(method, params)
+        return web.json_response({"ok": True, "result": result})
+
+    async def _dispatch(self, method: str, params: dict):
+        method = method.lower()
+        if method == "getme":
+            return {"id": 1, "is_bot": True, "first_name": "FakeBot", "username": "fake_bot"}
+        if method == "getupdates":
+            return await self._get_updates(float(params.get("timeout") or 0))
+        if method == "setwebhook":
+            self._webhook_url = params.get("url")
+            self._secret = params.get("secret_token")
+            return True
+        if method == "deletewebhook":
+            self._webhook_url = None
+            return True
+        if method in ("sendmessage", "editmessagetext", "senddocument", "editmessagereplymarkup", "forwardmessage"):
+            self.sent.append((method, params, time.perf_counter()))
+            self._remember_buttons(params)
+            return self._message(params)
+        if method == "getfile":
+            return {"file_id": params.get("file_id"), "file_unique_id": "u", "file_path": "documents/file"}
+        return True
+
+    def _remember_buttons(self, params: dict):
+        markup = params.get("reply_markup")
+        if isinstance(markup, str):
+            markup = json.loads(markup)
+        if not isinstance(markup, dict) or "inline_keyboard" not in markup:
+            return
+        self.buttons[int(params.get("chat_id") or 0)] = [
+            button["callback_data"] for row in markup["inline_keyboard"] for button in row if "callback_data" in button
+        ]
+
+    def button(self, chat_id: int, prefix: str) -> typing.Optional[str]:
+        """callback_data першої кнопки з останньої клавіатури чату, що починається з prefix."""
+        return next((data for data in self.buttons.get(chat_id, ()) if data.startswith(prefix)), None)
+
+    def _message(self, params: dict) -> dict:
+        chat_id = int(params.get("chat_id") or 0)
+        message_id = int(params.get("message_id") or next(self._message_ids))
+        return {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": 1, "is_bot": True, "first_name": "FakeBot"},
+            "text": params.get("text") or "",
+        }
+
+    async def _get_updates(self, timeout: float) -> list:
+        batch = []
+        try:
+            batch.append(await asyncio.wait_for(self._updates.get(), timeout=max(timeout, 0.01)))
+        except asyncio.TimeoutError:
+            return []
+        while not self._updates.empty() and len(batch) < 100:
+            batch.append(self._updates.get_nowait())
+        return batch
+
+    # ====== Апдейти ======
+    async def push(self, update: dict):
+        """Доставляє апдейт боту: через вебхук, якщо його встановлено, або в чергу getUpdates."""
+        if self._webhook_url:
+            headers = {"Content-Type": "application/json"}
+            if self._secret:
+                headers["X-Telegram-Bot-Api-Secret-Token"] = self._secret
+            async with self._session.post(self._webhook_url, data=json.dumps(update), headers=headers) as resp:
+                await resp.read()
+        else:
+            await self._updates.put(update)
+
+    def message_update(self, user_id: int, text: str) -> dict:
+        user = {"id": user_id, "is_bot": False, "first_name": f"user{user_id}", "language_code": "uk"}
+        return {
+            "update_id": next(self._update_ids),
+            "message": {
+                "message_id": next(self._message_ids),
+                "date": int(time.time()),
+                "chat": {"id": user_id, "type": "private"},
+                "from": user,
+                "text": text,
+                "entities": [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+                if text.startswith("/") else [],
+            },
+        }
+
+    def callback_update(self, user_id: int, data: str, message_id: int = 1) -> dict:
+        user = {"id": user_id, "is_bot": False, "first_name": f"user{user_id}", "language_code": "uk"}
+        return {
+            "update_id": next(self._update_ids),
+            "callback_query": {
+                "id": str(next(self._update_ids)),
+                "from": user,
+                "chat_instance": str(user_id),
+                "data": data,
+                "message": {
+                    "message_id": message_id,
+                    "date": int(time.time()),
+                    "chat": {"id": user_id, "type": "private"},
+                    "from": {"id": 1, "is_bot": True, "first_name": "FakeBot"},
+                    "text": "menu",
+                },
+            },
+        }
@@ -0,0 +1,234 @@
+"""
+Навантажувальний генератор: справжній Dispatcher з усіма хендлерами й
+middleware, фейковий Bot API і фейковий OpenAI з керованою затримкою.
+
+Кожен віртуальний користувач проходить сценарій послідовно (як живий
+юзер), користувачі працюють паралельно. Для кожного сценарію звіт дає
+p50/p95/p99 часу обробки апдейта, апдейти/с, лаг event loop, приріст
+памʼяті й виклики Bot API на сесію (по методах).
+
+Запуск з кореня репозиторію:
+    python -m benchmarks.loadgen --users 200 --tg-latency 0.02 --llm-latency 1.0
+    python -m benchmarks.loadgen --scenarios full --users 500 --out load.json
+    python -m benchmarks.loadgen --users 10 --baseline load.json
+"""
+import argparse
+import asyncio
+import collections
+import gc
+import json
+import os
+import resource
+import tempfile
+import time
+import typing
+
+# БД задаємо до запуску бота — db.py читає шлях при першому зверненні
+os.environ.setdefault("DB_PATH", os.path.join(tempfile.mkdtemp(prefix="culinary-load-"), "load.db"))
+
+from aiogram import Bot, Dispatcher, types  # noqa: E402
+
+from benchmarks.fake_openai import FakeOpenAI  # noqa: E402
+from benchmarks.fake_telegram import FakeTelegram  # noqa: E402
+from workers import close_bot_session  # noqa: E402
+
+# Крок сценарію: ("msg", текст), ("cb", callback_data) або ("btn", префікс) — кнопка з останньої
+# клавіатури, яку бот показав користувачу (коли callback_data містить id, відомий лише боту)
+Step = typing.Tuple[str, str]
+
+START = [("msg", "/start")]
+FRIDGE = [("cb", "fridge"), ("cb", "back_to_menu")]
+ADD = [("cb", "fridge"), ("cb", "add_product"), ("msg", "яйця 6 шт 25.12.2030, томат 3 шт, сир твердий 200 г")]
+COOK = [("cb", "daily_dish"), ("cb", "daily_dish_lunch"), ("btn", "dish:cook:")]
+PROFILE = [
+    ("cb", "profile"),
+    ("cb", "edit_allergies"), ("msg", "горіхи, мед"),
+    ("cb", "edit_dislikes"), ("msg", "цибуля"),
+    ("cb", "set_status_vegetarian"),
+]
+
+SCENARIOS: typing.Dict[str, typing.List[Step]] = {
+    "browse": START + FRIDGE,
+    "add": ADD,
+    "cook": ADD + COOK,
+    "profile": PROFILE,
+    "full": START + FRIDGE + ADD + COOK + PROFILE,
+}
+
+
+def _pct(values, q):
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * q))] * 1000, 2) if values else 0.0
+
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class LoopLagMonitor:
+    """Міряє, наскільки пізніше запланованого прокидається корутина."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples: typing.List[float] = []
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - start - self.interval))
+
+    def start(self):
+        self.samples = []
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+
+
+async def run_scenario(dp: Dispatcher, tg: FakeTelegram, llm: FakeOpenAI, name: str, steps: typing.List[Step],
+                       users: int, loops: int, think: float, base_user: int) -> dict:
+    latencies = []
+    per_step = collections.defaultdict(list)
+    errors = collections.Counter()
+    lag = LoopLagMonitor()
+
+    async def virtual_user(user_id: int):
+        for _ in range(loops):
+            for kind, value in steps:
+                if kind == "msg":
+                    update = tg.message_update(user_id, value)
+                else:
+                    data = tg.button(user_id, value) if kind == "btn" else value
+                    if data is None:
+                        errors["no_button"] += 1
+                        continue
+                    update = tg.callback_update(user_id, data)
+                start = time.perf_counter()
+                try:
+                    # окрема задача на апдейт, як у polling/webhook: aiogram кешує стан у contextvars
+                    await asyncio.ensure_future(dp.updates_handler.notify(types.Update.to_object(update)))
+                except Exception as e:
+                    errors[type(e).__name__] += 1
+                elapsed = time.perf_counter() - start
+                latencies.append(elapsed)
+                per_step[value].append(elapsed)
+                if think:
+                    await asyncio.sleep(think)
+
+    gc.collect()
+    rss_before = _rss_mb()
+    calls_before = collections.Counter(tg.calls)
+    llm_before = sum(llm.calls.values())
+    lag.start()
+    start = time.perf_counter()
+    await asyncio.gather(*(virtual_user(base_user + i) for i in range(users)))
+    elapsed = time.perf_counter() - start
+    await lag.stop()
+    gc.collect()
+    calls = collections.Counter(tg.calls)
+    calls.subtract(calls_before)
+    calls = +calls
+
+    return {
+        "updates": len(latencies),
+        "seconds": round(elapsed, 2),
+        "updates_per_sec": round(len(latencies) / elapsed, 1),
+        "p50_ms": _pct(latencies, 0.50),
+        "p95_ms": _pct(latencies, 0.95),
+        "p99_ms": _pct(latencies, 0.99),
+        "max_ms": _pct(latencies, 1.0),
+        "loop_lag_p99_ms": _pct(lag.samples, 0.99),
+        "loop_lag_max_ms": _pct(lag.samples, 1.0),
+        "rss_growth_mb": round(_rss_mb() - rss_before, 1),
+        "api_calls": sum(calls.values()),
+        # сесія — один прохід сценарію одним користувачем
+        "api_calls_per_session": round(sum(calls.values()) / (users * loops), 2),
+        "api_calls_by_method": dict(sorted(calls.items())),
+        "llm_calls": sum(llm.calls.values()) - llm_before,
+        "errors": dict(errors),
+        "steps_p95_ms": {step: _pct(values, 0.95) for step, values in per_step.items()},
+    }
+
+
+async def main_async(args) -> dict:
+    tg = FakeTelegram(latency=args.tg_latency)
+    llm = FakeOpenAI(latency=args.llm_latency, jitter=args.llm_latency / 2)
+    tg_url = await tg.start()
+    llm_url = await llm.start()
+
+    os.environ["TELEGRAM_API_URL"] = tg_url
+    os.environ["OPENAI_BASE_URL"] = llm_url
+    os.environ["TELEGRAM_BOT_TOKEN"] = "123456:LOAD"
+    os.environ.setdefault("OPENAI_API_KEY", "load")
+    os.environ.setdefault("FSM_STORAGE", args.fsm_storage)
+    # навантаження не повинно впиратися в ліміти на користувача
+    for action in ("LLM", "DB_WRITE", "FEEDBACK"):
+        os.environ.setdefault(f"THROTTLE_{action}", "1000000/1")
+    import bootstrap
+
+    dp = bootstrap.get_dispatcher()
+    Bot.set_current(dp.bot)
+    Dispatcher.set_current(dp)
+    await bootstrap.startup(dp)
+
+    results = {}
+    for i, name in enumerate(args.scenarios):
+        results[name] = await run_scenario(
+            dp, tg, llm, name, SCENARIOS[name], args.users, args.loops, args.think, base_user=100_000 * (i + 1),
+        )
+        r = results[name]
+        print(f"{name:8s} {r['updates']:6d} upd  {r['updates_per_sec']:8.1f} upd/s  "
+              f"p50={r['p50_ms']}ms p95={r['p95_ms']}ms p99={r['p99_ms']}ms  "
+              f"lag_p99={r['loop_lag_p99_ms']}ms  rss+{r['rss_growth_mb']}MB  errors={r['errors']}")
+        print(f"{'':8s} Bot API: {r['api_calls_per_session']} викликів/сесію  {r['api_calls_by_method']}")
+
+    await bootstrap.shutdown(dp)
+    await dp.storage.close()
+    await dp.storage.wait_closed()
+    await close_bot_session(dp.bot)
+    await tg.stop()
+    await llm.stop()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--users", type=int, default=100, help="паралельних віртуальних користувачів")
+    parser.add_argument("--loops", type=int, default=1, help="скільки разів кожен проходить сценарій")
+    parser.add_argument("--think", type=float, default=0.0, help="пауза між кроками, с")
+    parser.add_argument("--tg-latency", type=float, default=0.02, help="затримка фейкового Bot API, с")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="затримка фейкового OpenAI, с")
+    parser.add_argument("--fsm-storage", default="memory", choices=["memory", "sqlite"])
+    parser.add_argument("--out", help="куди записати JSON з результатами")
+    parser.add_argument("--baseline", help="JSON попереднього запуску (--out) — показати, скільки викликів зекономлено")
+    args = parser.parse_args()
+
+    results = asyncio.run(main_async(args))
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print("\nвиклики Bot API на сесію: було → стало (зекономлено)")
+        for name, r in results.items():
+            before = baseline.get(name)
+            if not before:
+                continue
+            # старі звіти не мали api_calls_per_session — рахуємо з api_calls
+            was = before.get("api_calls_per_session") or before["api_calls"] / (before["updates"] / len(SCENARIOS[name]))
+            now = r["api_calls_per_session"]
+            print(f"{name:8s} {was:6.1f} → {now:6.1f}  (-{was - now:.1f}, -{(was - now) / was * 100:.0f}%)")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""
+Мікробенчмарки гарячих шляхів: парсинг продуктів, запис у БД, розбір
+рецепту, FEFO-списання, вибірка для нагадувань і побудова промпта.
+
+Працює офлайн (LLM підмінено миттєвою відповіддю), дані синтетичні й
+детерміновані (фіксований seed). Результати пишуться в JSON, який можна
+порівняти між комітами через benchmarks/compare.py.
+
+Запуск з кореня репозиторію:
+    python -m benchmarks.micro --out bench.json
+    python -m benchmarks.micro --scales 100 1000 --only parse_one_item
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+_TMP = tempfile.mkdtemp(prefix="culinary-bench-")
+os.environ["DB_PATH"] = os.path.join(_TMP, "bench.db")
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import db
+    import gpt
+    import product_parser
+    import callback_handlers
+
+DEFAULT_SCALES = [100, 1_000, 10_000]
+
+NAMES = ["помідори чері", "яйця", "молоко", "сир твердий", "курка філе", "гречка", "огірки",
+         "тунець консервований", "рис", "морква", "цибуля", "картопля", "йогурт грецький"]
+UNITS = ["г", "кг", "шт", "л", "мл"]
+
+
+# ====== Генератори даних ======
+def gen_items(n: int, rnd: random.Random) -> list:
+    items = []
+    for i in range(n):
+        name = f"{rnd.choice(NAMES)} {i % 50}"
+        qty = rnd.choice(["1", "2", "0,5", "300", "1.5", "12"])
+        unit = rnd.choice(UNITS)
+        if rnd.random() < 0.6:
+            items.append(f"{name} {qty} {unit} {rnd.randint(1, 28):02d}.{rnd.randint(1, 12):02d}.{rnd.randint(2024, 2030)}")
+        elif rnd.random() < 0.1:
+            items.append(f"{name} ??? {unit}")  # невалідний рядок
+        else:
+            items.append(f"{name} {qty} {unit}")
+    return items
+
+
+def gen_recipe(n: int, rnd: random.Random) -> str:
+    lines = [f"- {rnd.choice(NAMES)} {i}, {rnd.randint(1, 500)} {rnd.choice(UNITS)}" for i in range(n)]
+    steps = [f"{i + 1}. Крок {i + 1}" for i in range(10)]
+    return "🔶 Страва\n**Інгредієнти:**\n" + "\n".join(lines) + "\n**🔷 Рецепт:**\n" + "\n".join(steps)
+
+
+def fill_products(rows: int, users: int, rnd: random.Random):
+    db.close_db()  # спільне зʼєднання інакше лишиться на видаленому файлі
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(db.db_path() + suffix):
+            os.remove(db.db_path() + suffix)
+    db.init_db()
+    conn = sqlite3.connect(db.db_path())
+    data = []
+    for i in range(rows):
+        expiry = (f"{rnd.randint(1, 28):02d}.{rnd.randint(1, 12):02d}.{rnd.randint(2024, 2030)}"
+                  if rnd.random() < 0.7 else None)
+        data.append((1 + i % users, f"{rnd.choice(NAMES)} {i % 40}", float(rnd.randint(1, 500)),
+                     rnd.choice(UNITS), expiry))
+    conn.executemany(
+        "INSERT INTO products (user_id, name, quantity, unit, expiry_date) VALUES (?, ?, ?, ?, ?)", data
+    )
+    conn.commit()
+    conn.close()
+
+
+# ====== Фейки для хендлерів ======
+class _Message:
+    async def answer(self, *args, **kwargs):
+        return None
+
+
+class _Callback:
+    def __init__(self, user_id: int, data: str = "cook_confirm"):
+        self.from_user = type("U", (), {"id": user_id})()
+        self.data = data
+        self.message = _Message()
+
+    async def answer(self, *args, **kwargs):
+        return None
+
+
+class _FakeRouter:
+    def __init__(self, content: str):
+        self.content = content
+
+    async def complete(self, tier, messages, on_queued=None, **params):
+        msg = type("M", (), {"content": self.content})()
+        return type("R", (), {"choices": [type("C", (), {"message": msg})()]})()
+
+
+# ====== Бенчмарки: setup(scale, rnd) -> аргументи, fn(*args) — те, що міряємо ======
+def bench_parse_one_item():
+    def setup(n, rnd):
+        return (gen_items(n, rnd),)
+
+    def fn(items):
+        for raw in items:
+            product_parser.parse_item(raw)
+    return setup, fn
+
+
+def bench_parse_products():
+    def setup(n, rnd):
+        return (", ".join(gen_items(n, rnd)),)
+
+    def fn(text):
+        product_parser.parse_products(text)
+    return setup, fn
+
+
+def bench_add_product_to_db():
+    def setup(n, rnd):
+        fill_products(0, 1, rnd)
+        return (", ".join(gen_items(n, rnd)),)
+
+    def fn(text):
+        return db.add_product_to_db(42, text)
+    return setup, fn
+
+
+def bench_extract_ingredients():
+    def setup(n, rnd):
+        return (gen_recipe(n, rnd),)
+
+    def fn(text):
+        gpt.extract_ingredients(text)
+    return setup, fn
+
+
+def bench_fefo_cook_confirm():
+    def setup(n, rnd):
+        fill_products(n, 1, rnd)
+        rows = sqlite3.connect(db.db_path()).execute("SELECT name, unit FROM products").fetchall()
+        ingredients = [(name, unit, float(rnd.randint(1, 300))) for name, unit in rows[: max(1, n // 10)]]
+        recipe_id = asyncio.run(db.save_recipe(1, "lunch", "Страва", "Страва", ingredients, 50))
+        return _Callback(1, f"dish:cook:{recipe_id}"), recipe_id
+
+    def fn(callback, recipe_id):
+        # як показ рецепта: без відмітки «Готую це!» нічого не списує
+        callback_handlers.pending_cooks.set((1, recipe_id), True)
+        return callback_handlers.handle_cook_confirm(callback, recipe_id)
+    return setup, fn
+
+
+def bench_grouped_by_user():
+    def setup(n, rnd):
+        fill_products(n, max(1, n // 20), rnd)
+        return ()
+
+    def fn():
+        return db.get_all_products_grouped_by_user()
+    return setup, fn
+
+
+def bench_suggest_recipe_prompt():
+    def setup(n, rnd):
+        fill_products(n, 1, rnd)
+        gpt.router = _FakeRouter(gen_recipe(8, rnd))
+        return ()
+
+    def fn():
+        return gpt.suggest_recipe(1, "lunch")
+    return setup, fn
+
+
+BENCHMARKS = {
+    "parse_one_item": bench_parse_one_item,
+    "parse_products": bench_parse_products,
+    "add_product_to_db": bench_add_product_to_db,
+    "extract_ingredients": bench_extract_ingredients,
+    "fefo_cook_confirm": bench_fefo_cook_confirm,
+    "get_all_products_grouped_by_user": bench_grouped_by_user,
+    "suggest_recipe_prompt": bench_suggest_recipe_prompt,
+}
+
+
+# ====== Запуск ======
+def measure(name: str, scale: int, repeat: int, loop: asyncio.AbstractEventLoop) -> dict:
+    setup, fn = BENCHMARKS[name]()
+    timings = []
+    for r in range(repeat):
+        rnd = random.Random(1000 * scale + r)
+        with contextlib.redirect_stdout(io.StringIO()):
+            args = setup(scale, rnd)
+            start = time.perf_counter()
+            result = fn(*args)
+            if asyncio.iscoroutine(result):
+                loop.run_until_complete(result)
+            timings.append(time.perf_counter() - start)
+    best = min(timings)
+    return {
+        "scale": scale,
+        "repeat": repeat,
+        "min_s": best,
+        "median_s": statistics.median(timings),
+        "per_item_us": best / scale * 1e6,
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scales", type=int, nargs="+", default=DEFAULT_SCALES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS))
+    parser.add_argument("--out", help="JSON-файл з результатами")
+    args = parser.parse_args()
+
+    loop = asyncio.new_event_loop()
+    results = {}
+    for name in args.only or BENCHMARKS:
+        results[name] = []
+        for scale in args.scales:
+            r = measure(name, scale, args.repeat, loop)
+            results[name].append(r)
+            print(f"{name:34s} n={scale:<7d} min={r['min_s'] * 1000:9.2f}ms  {r['per_item_us']:8.2f}us/item")
+    loop.close()
+
+    report = {
+        "commit": _git_commit(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "sqlite": sqlite3.sqlite_version,
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
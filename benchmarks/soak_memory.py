@@ -0,0 +1,157 @@
+"""
+Тиждень трафіку за кілька десятків секунд: чи лишається памʼять процесу пласкою.
+
+Віртуальний годинник крокує по хвилині; щохвилини кілька сесій від користувачів,
+серед яких постійно зʼявляються нові (старі поступово зникають). Сесія — те, що
+робить бот на апдейт: читає FSM-стан, входить у діалог і пише дані, бере токен із
+відра лімітів, іноді запамʼятовує рецепт для «Готую це!»; частина діалогів
+кидається посередині й ніколи не завершується.
+
+Варіанти запускаються окремими процесами, щоб RSS одного не впливав на інший:
+  bounded   — BoundedMemoryStorage, ThrottlingMiddleware, callback_handlers.pending_cooks;
+  unbounded — як було: MemoryStorage з aiogram і звичайні dict.
+
+Запуск з кореня репозиторію:
+    python -m benchmarks.soak_memory --days 7 --sessions-per-minute 30 --new-users-per-day 5000
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+
+# БД задаємо до запуску бота — db.py читає шлях при першому зверненні
+os.environ.setdefault("DB_PATH", os.path.join(tempfile.mkdtemp(prefix="culinary-soak-"), "soak.db"))
+
+MINUTE = 60
+DAY = 24 * 3600
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _ingredients(rnd: random.Random) -> dict:
+    return {(f"продукт {rnd.randrange(500)}", rnd.choice(["г", "шт", "мл"])): float(rnd.randint(1, 500))
+            for _ in range(rnd.randint(3, 10))}
+
+
+async def simulate(variant: str, days: int, per_minute: int, new_per_day: int, seed: int) -> list:
+    from aiogram.contrib.fsm_storage.memory import MemoryStorage
+
+    import bounded_cache
+    import callback_handlers
+    import metrics
+    from fsm_storage import BoundedMemoryStorage
+    from throttling import DEFAULT_LIMITS, ThrottlingMiddleware
+
+    clock = Clock()
+    rnd = random.Random(seed)
+    throttle = ThrottlingMiddleware(DEFAULT_LIMITS)
+    if variant == "bounded":
+        storage = BoundedMemoryStorage(ttl=int(os.getenv("FSM_STATE_TTL") or 86400))
+        cooks = callback_handlers.pending_cooks
+        bounded_cache.set_clock(clock)
+
+        async def take_token(user_id: int, action: str):
+            state = await throttle._load(user_id, action)
+            throttle.buckets[action].take(state, 1, clock.now)
+            await throttle._save(user_id, action, state)
+
+        def remember_cook(user_id: int, ingredients: dict):
+            # інгредієнти — у БД, у кеші лише відмітка показаного рецепта
+            cooks.set((user_id, rnd.randrange(10 ** 6)), True)
+    else:
+        storage = MemoryStorage()
+        buckets, cooks = {}, {}
+
+        async def take_token(user_id: int, action: str):
+            # старий ThrottlingMiddleware._memory: setdefault і ніколи не видаляється
+            throttle.buckets[action].take(buckets.setdefault((user_id, action), {}), 1, clock.now)
+
+        def remember_cook(user_id: int, ingredients: dict):
+            cooks[user_id] = ingredients
+
+    states = ["AddProductState:waiting_for_product", "ProfileState:waiting_for_allergies",
+              "PartialDeleteState:waiting_for_quantity", "FeedbackState:waiting_for_text"]
+    users, minute = 0, 0
+    report = []
+    for day in range(1, days + 1):
+        for _ in range(DAY // MINUTE):
+            clock.now += MINUTE
+            minute += 1
+            # нові користувачі рівномірно протягом доби; id — порядковий номер
+            users = max(1, new_per_day * minute * MINUTE // DAY)
+            for _ in range(per_minute):
+                # більшість сесій — від тих, хто прийшов за останню добу, решта — від будь-кого
+                if rnd.random() < 0.8:
+                    user = rnd.randint(max(1, users - new_per_day + 1), users)
+                else:
+                    user = rnd.randint(1, users)
+                await storage.get_state(chat=user, user=user)
+                await take_token(user, rnd.choice(("db_write", "db_write", "llm", "feedback")))
+                await storage.set_state(chat=user, user=user, state=rnd.choice(states))
+                await storage.update_data(chat=user, user=user, product_id=rnd.randrange(10 ** 6))
+                if rnd.random() < 0.25:
+                    remember_cook(user, _ingredients(rnd))
+                if rnd.random() < 0.7:
+                    # завершений діалог; решта кинута посередині
+                    await storage.reset_state(chat=user, user=user)
+        gc.collect()
+        if variant == "bounded":
+            entries = {c["name"]: c["entries"] for c in bounded_cache.all_stats()}
+            accounted = sum(c["bytes"] for c in bounded_cache.all_stats())
+        else:
+            fsm = sum(len(users) for users in storage.data.values())
+            entries = {"fsm_memory": fsm, "throttle_buckets": len(buckets), "pending_cooks": len(cooks)}
+            accounted = None
+        report.append({"day": day, "users": users, "rss_mb": round(metrics.rss_bytes() / 2 ** 20, 1),
+                       "entries": entries, "accounted_mb": round(accounted / 2 ** 20, 2) if accounted else None})
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--sessions-per-minute", type=int, default=30)
+    parser.add_argument("--new-users-per-day", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=3)
+    parser.add_argument("--variant", choices=["bounded", "unbounded"], help="(службове) один варіант у цьому процесі")
+    args = parser.parse_args()
+
+    if args.variant:
+        report = asyncio.run(simulate(args.variant, args.days, args.sessions_per_minute,
+                                      args.new_users_per_day, args.seed))
+        print(json.dumps(report))
+        return
+
+    results = {}
+    for variant in ("unbounded", "bounded"):
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.soak_memory", "--variant", variant, "--days", str(args.days),
+             "--sessions-per-minute", str(args.sessions_per_minute),
+             "--new-users-per-day", str(args.new_users_per_day), "--seed", str(args.seed)],
+            check=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+        ).stdout
+        results[variant] = json.loads(out.strip().splitlines()[-1])
+
+    print(f"{'день':>4s} {'користувачів':>12s} │ {'RSS без меж':>11s} {'FSM':>7s} {'відра':>7s} {'рецепти':>7s} │ "
+          f"{'RSS з межами':>12s} {'FSM':>6s} {'відра':>6s} {'рецепти':>7s} {'облік':>8s}")
+    for old, new in zip(results["unbounded"], results["bounded"]):
+        o, n = old["entries"], new["entries"]
+        print(f"{old['day']:4d} {old['users']:12,d} │ {old['rss_mb']:9.1f}МБ {o['fsm_memory']:7,d} "
+              f"{o['throttle_buckets']:7,d} {o['pending_cooks']:7,d} │ {new['rss_mb']:10.1f}МБ "
+              f"{n.get('fsm_memory', 0):6,d} {n['throttle_buckets']:6,d} {n['pending_cooks']:7,d} "
+              f"{new['accounted_mb']:6.2f}МБ")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+import asyncio
+import logging
+import os
+import time
+import typing
+
+import aiocron
+from aiogram import Bot, Dispatcher
+from aiogram.bot.api import TelegramAPIServer, TELEGRAM_PRODUCTION
+
+import expiry_index
+import llm
+import maintenance
+import metrics
+import migrations
+import nutrition
+import outbox
+import profiler
+import reminders
+from callback_handlers import register_callback_handlers
+from db import close_db, db_path, init_db
+from fsm_storage import create_storage
+from handlers import register_handlers
+from log import fields
+from throttling import ThrottlingMiddleware
+from workers import is_cron_leader
+
+logger = logging.getLogger(__name__)
+
+# Явний запуск застосунку. Імпорт модулів бота нічого не відкриває й не створює:
+# create_app() лише збирає Bot, Dispatcher, middleware і хендлери (без мережі й БД),
+# а все, що потребує I/O, — у хуках startup()/shutdown(), які виконуються в робочому
+# event loop у порядку реєстрації. Закрити сховище FSM і HTTP-сесію бота — справа того,
+# хто крутить loop (executor aiogram робить це сам, воркер і бенчмарки — явно).
+
+Shard = typing.Optional[typing.Tuple[int, int]]  # (index, workers) для воркера; None — один процес
+Hook = typing.Callable[[Dispatcher, Shard], typing.Awaitable[None]]
+
+_startup_hooks: typing.List[Hook] = []
+_shutdown_hooks: typing.List[Hook] = []
+
+
+def on_startup(hook: Hook) -> Hook:
+    _startup_hooks.append(hook)
+    return hook
+
+
+def on_shutdown(hook: Hook) -> Hook:
+    _shutdown_hooks.append(hook)
+    return hook
+
+
+# ====== Збирання застосунку ======
+_dp: typing.Optional[Dispatcher] = None
+
+
+def create_app() -> Dispatcher:
+    """Bot + Dispatcher з усіма middleware і хендлерами. Нічого не відкриває — це робить startup()."""
+    # TELEGRAM_API_URL — власний Bot API сервер (або фейковий для бенчмарків)
+    api_url = os.getenv("TELEGRAM_API_URL")
+    bot = Bot(
+        token=os.getenv("TELEGRAM_BOT_TOKEN") or os.getenv("BOT_TOKEN"),
+        server=TelegramAPIServer.from_base(api_url) if api_url else TELEGRAM_PRODUCTION,
+    )
+    # FSM-стани зберігаються між рестартами (див. FSM_STORAGE у .env)
+    dp = Dispatcher(bot, storage=create_storage())
+
+    # Метрики хендлерів (першими, щоб бачити й обмежені запити) і ліміти на дорогі дії
+    metrics.setup(dp)
+    dp.middleware.setup(ThrottlingMiddleware.from_env())
+
+    register_handlers(dp)
+    # ID каналу для фідбеку
+    register_callback_handlers(dp, bot, os.getenv("FEEDBACK_CHAT_ID"))
+    return dp
+
+
+def get_dispatcher() -> Dispatcher:
+    """Єдиний Dispatcher процесу — збирається при першому зверненні."""
+    global _dp
+    if _dp is None:
+        _dp = create_app()
+    return _dp
+
+
+# ====== Крон-задачі ======
+@metrics.timed_job("reminders_tick")
+async def reminders_tick():
+    # нагадування про терміни — у часовому поясі й о часі кожного користувача (див. reminders.py)
+    if not is_cron_leader():
+        return
+    await reminders.tick()
+
+
+@metrics.timed_job("db_maintenance")
+async def db_maintenance():
+    # архів прострочених, ANALYZE і vacuum — у найтихішу годину
+    if not is_cron_leader():
+        return
+    await maintenance.run()
+
+
+CRON_JOBS = (
+    ("* * * * *", reminders_tick),  # щохвилини: надсилає тим, у кого вже настав час
+    ("30 3 * * *", db_maintenance),  # щодня о 03:30
+)
+
+_crons: typing.List[aiocron.Cron] = []
+_background: typing.List[asyncio.Future] = []
+_metrics_runner = None
+
+
+# ====== Старт ======
+@on_startup
+async def open_database(dp: Dispatcher, shard: Shard):
+    # схема й міграції — до першого апдейта
+    init_db()
+
+
+@on_startup
+async def start_metrics(dp: Dispatcher, shard: Shard):
+    global _metrics_runner
+    # METRICS_PORT — локальний /metrics; кожен воркер — на METRICS_PORT + 1 + index
+    _metrics_runner = await metrics.start_server(port_offset=1 + shard[0] if shard else 0)
+
+
+@on_startup
+async def start_profiler(dp: Dispatcher, shard: Shard):
+    # PROFILER=1 — нагляд за блокуваннями event loop; /cpuprofile для адмінів працює завжди
+    await profiler.setup(dp, reminders_tick, db_maintenance)
+
+
+@on_startup
+async def start_outbox(dp: Dispatcher, shard: Shard):
+    # доставляє лише лідер: ліміт Telegram спільний для всіх воркерів
+    await outbox.setup(dp.bot, is_leader=is_cron_leader)
+
+
+@on_startup
+async def warm_expiry_index(dp: Dispatcher, shard: Shard):
+    # індекс термінів у памʼяті; воркер індексує лише своїх користувачів
+    await expiry_index.setup(shard=shard)
+
+
+@on_startup
+async def start_crons(dp: Dispatcher, shard: Shard):
+    for spec, job in CRON_JOBS:
+        _crons.append(aiocron.crontab(spec, func=job, start=True))
+
+
+@on_startup
+async def start_backfills(dp: Dispatcher, shard: Shard):
+    # незавершені backfill міграцій — у фоні, невеликими пачками, в одному процесі
+    if shard is None or shard[0] == 0:
+        _background.append(asyncio.ensure_future(migrations.run_backfills_online(db_path())))
+
+
+@on_startup
+async def warm_llm_client(dp: Dispatcher, shard: Shard):
+    # імпорт openai — у потоці, не затримуючи старт і перші апдейти
+    _background.append(asyncio.get_running_loop().run_in_executor(None, llm.warm_up))
+
+
+@on_startup
+async def warm_nutrition(dp: Dispatcher, shard: Shard):
+    # numpy і таблиця БЖУ — теж у потоці, щоб перший рецепт не чекав на них
+    _background.append(asyncio.get_running_loop().run_in_executor(None, nutrition.warm_up))
+
+
+# ====== Зупинка ======
+@on_shutdown
+async def stop_jobs(dp: Dispatcher, shard: Shard):
+    for cron in _crons:
+        cron.stop()
+    _crons.clear()
+    for task in _background:
+        task.cancel()
+    await asyncio.gather(*_background, return_exceptions=True)
+    _background.clear()
+
+
+@on_shutdown
+async def stop_services(dp: Dispatcher, shard: Shard):
+    global _metrics_runner
+    await expiry_index.index.stop()
+    if outbox.worker is not None:
+        await outbox.worker.stop()
+    await profiler.profiler.stop()
+    if _metrics_runner is not None:
+        await _metrics_runner.cleanup()
+        _metrics_runner = None
+
+
+@on_shutdown
+async def close_database(dp: Dispatcher, shard: Shard):
+    close_db()
+
+
+async def _run(hooks: typing.List[Hook], stage: str, dp: Dispatcher, shard: Shard, strict: bool):
+    total = time.perf_counter()
+    for hook in hooks:
+        started = time.perf_counter()
+        try:
+            await hook(dp, shard)
+        except Exception:
+            # зупинку доводимо до кінця навіть якщо щось одне впало
+            if strict:
+                raise
+            logger.exception("❌ Хук зупинки впав", extra=fields(hook=hook.__name__))
+        logger.debug("Хук виконано", extra=fields(
+            stage=stage, hook=hook.__name__, ms=round((time.perf_counter() - started) * 1000, 1),
+        ))
+    logger.info("🚀 Запуск завершено" if stage == "startup" else "🛑 Зупинку завершено", extra=fields(
+        ms=round((time.perf_counter() - total) * 1000, 1), shard=list(shard) if shard else None,
+    ))
+
+
+async def startup(dp: Dispatcher, shard: Shard = None):
+    """Відкриває БД (схема, міграції), метрики, outbox, індекс термінів, крон-задачі й фонові задачі."""
+    await _run(_startup_hooks, "startup", dp, shard, strict=True)
+
+
+async def shutdown(dp: Dispatcher, shard: Shard = None):
+    await _run(_shutdown_hooks, "shutdown", dp, shard, strict=False)
@@ -0,0 +1,144 @@
+import collections
+import sys
+import time
+import typing
+
+import metrics
+
+# Обмежений кеш для стану в памʼяті процесу (FSM, відра лімітів, незавершені дії користувачів):
+# не більше max_size записів (найдавніше використаний витісняється першим) і не довше ttl секунд
+# від останнього запису. Протухлі записи прибираються ліниво при зверненні й повним проходом
+# не частіше за sweep_interval. Розмір рахується приблизно (deep_sizeof) при кожному записі,
+# тож звіт /stats і метрики не обходять структури заново. Тому змінене на місці значення
+# треба записати ще раз через set().
+
+_MISSING = object()
+
+# Скільки коштує сам запис у кеші: вузол OrderedDict + кортеж (термін, значення, розмір)
+_ENTRY_OVERHEAD = 100
+
+
+def deep_sizeof(value, _depth: int = 0) -> int:
+    """Приблизний розмір значення в байтах разом із вкладеними dict/list/tuple/set."""
+    size = sys.getsizeof(value)
+    if _depth > 8:
+        return size
+    if isinstance(value, dict):
+        size += sum(deep_sizeof(k, _depth + 1) + deep_sizeof(v, _depth + 1) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(v, _depth + 1) for v in value)
+    return size
+
+
+class BoundedCache:
+    def __init__(self, name: str, max_size: int, ttl: typing.Optional[float] = None,
+                 sweep_interval: float = 60.0, clock: typing.Callable[[], float] = time.monotonic):
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self.clock = clock
+        self.bytes = 0
+        self.evictions: typing.Counter[str] = collections.Counter()  # reason: lru / ttl
+        # ключ → (коли протухає, значення, розмір)
+        self._data: "collections.OrderedDict[typing.Hashable, typing.Tuple[float, typing.Any, int]]" = \
+            collections.OrderedDict()
+        self._last_sweep = clock()
+        _REGISTRY.append(self)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    # ====== Читання / запис ======
+    def get(self, key, default=None):
+        now = self.clock()
+        self._maybe_sweep(now)
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        if entry[0] <= now:
+            self._drop(key, "ttl")
+            return default
+        self._data.move_to_end(key)
+        return entry[1]
+
+    def set(self, key, value):
+        """Записує значення й відраховує ttl заново."""
+        now = self.clock()
+        self._maybe_sweep(now)
+        size = deep_sizeof(key) + deep_sizeof(value) + _ENTRY_OVERHEAD
+        old = self._data.pop(key, None)
+        if old is not None:
+            self.bytes -= old[2]
+        expires = now + self.ttl if self.ttl is not None else float("inf")
+        self._data[key] = (expires, value, size)
+        self.bytes += size
+        while len(self._data) > self.max_size:
+            oldest = next(iter(self._data))
+            self._drop(oldest, "ttl" if self._data[oldest][0] <= now else "lru")
+
+    def pop(self, key, default=None):
+        entry = self._data.pop(key, None)
+        if entry is None:
+            return default
+        self.bytes -= entry[2]
+        return entry[1] if entry[0] > self.clock() else default
+
+    def clear(self):
+        self._data.clear()
+        self.bytes = 0
+
+    # ====== Прибирання ======
+    def _drop(self, key, reason: str):
+        self.bytes -= self._data.pop(key)[2]
+        self.evictions[reason] += 1
+
+    def _maybe_sweep(self, now: float):
+        if self.ttl is not None and now - self._last_sweep >= self.sweep_interval:
+            self.sweep(now)
+
+    def sweep(self, now: typing.Optional[float] = None) -> int:
+        """Видаляє всі протухлі записи; повертає, скільки видалено."""
+        now = self.clock() if now is None else now
+        self._last_sweep = now
+        expired = [key for key, (expires, _, _) in self._data.items() if expires <= now]
+        for key in expired:
+            self._drop(key, "ttl")
+        return len(expired)
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "entries": len(self._data),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "bytes": self.bytes,
+            "evicted_lru": self.evictions["lru"],
+            "evicted_ttl": self.evictions["ttl"],
+        }
+
+
+_REGISTRY: typing.List[BoundedCache] = []
+
+
+def all_stats() -> typing.List[dict]:
+    return [cache.stats() for cache in _REGISTRY]
+
+
+def set_clock(clock: typing.Callable[[], float]):
+    """Один годинник для всіх кешів — для бенчмарків, що проганяють віртуальний час."""
+    for cache in _REGISTRY:
+        cache.clock = clock
+        cache._last_sweep = clock()
+
+
+metrics.Gauge("bot_cache_entries", "Записів у кеші стану",
+              lambda: {(c.name,): len(c) for c in _REGISTRY}, ("cache",))
+metrics.Gauge("bot_cache_bytes", "Приблизний розмір кешу стану, байт",
+              lambda: {(c.name,): c.bytes for c in _REGISTRY}, ("cache",))
+metrics.Gauge("bot_cache_evictions_total", "Витіснено з кешу стану",
+              lambda: {(c.name, reason): n for c in _REGISTRY for reason, n in c.evictions.items()},
+              ("cache", "reason"), kind="counter")
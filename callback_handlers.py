@@ -2,6 +2,8 @@ from aiogram import types, Dispatcher, Bot
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.dispatcher import FSMContext
 from aiogram.dispatcher.filters.state import State, StatesGroup
+import logging
+import os
 import re
 from datetime import datetime
 
@@ -19,8 +21,21 @@ from db import (
     update_user_status,
     clear_user_allergies,
     clear_user_dislikes,
+    get_recipe,
+    set_recipe_favourite,
 )
-from gpt import suggest_recipe, filter_expired_batches_before_deduction
+from gpt import suggest_recipe, extract_ingredients, filter_expired_batches_before_deduction, LLM_FALLBACK_PREFIX
+from throttling import rate_limit, items_cost
+from callback_router import data as cb, router
+from log import fields
+from product_parser import format_errors
+from bounded_cache import BoundedCache
+import nutrition
+import recipes
+import reminders
+import screens
+
+logger = logging.getLogger(__name__)
 
 # =========================
 #          СТАНИ
@@ -41,109 +56,205 @@ class FeedbackState(StatesGroup):
 # =========================
 #        КНОПКИ / КЛАВІАТУРИ
 # =========================
-def root_menu_keyboard() -> InlineKeyboardMarkup:
-    return InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton("📋 Холодильник", callback_data="fridge")],
-        [InlineKeyboardButton("🍽 Страва дня", callback_data="daily_dish")],
-        [InlineKeyboardButton("📅 Тижневе меню", callback_data="weekly_menu")],
-        [InlineKeyboardButton("👤 Профіль", callback_data="profile")],
-        [InlineKeyboardButton("ℹ️ Допомога / Про бота", callback_data="help")],
-        [InlineKeyboardButton("📝 Пропозиції та ідеї", callback_data="feedback")],
+# Статичні клавіатури зібрані один раз при імпорті й лише серіалізуються при відправці —
+# не змінюй їх на місці (keyboard.add тощо), для динамічних будуй нову.
+def _home_row() -> list:
+    return [InlineKeyboardButton("🏠 Головне меню", callback_data=cb("menu", "root"))]
+
+ROOT_MENU = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton("📋 Холодильник", callback_data=cb("menu", "fridge"))],
+    [InlineKeyboardButton("🍽 Страва дня", callback_data=cb("menu", "dish"))],
+    [InlineKeyboardButton("⭐ Улюблені рецепти", callback_data=cb("menu", "recipes"))],
+    [InlineKeyboardButton("📅 Тижневе меню", callback_data=cb("menu", "weekly"))],
+    [InlineKeyboardButton("👤 Профіль", callback_data=cb("menu", "profile"))],
+    [InlineKeyboardButton("ℹ️ Допомога / Про бота", callback_data=cb("menu", "help"))],
+    [InlineKeyboardButton("📝 Пропозиції та ідеї", callback_data=cb("menu", "feedback"))],
+])
+
+HOME = InlineKeyboardMarkup(inline_keyboard=[_home_row()])
+
+FRIDGE_ACTIONS = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton("🟩 Додати продукт", callback_data=cb("fridge", "add"))],
+    [InlineKeyboardButton("🟥 Видалити продукт", callback_data=cb("fridge", "list"))],
+    _home_row(),
+])
+
+BACK_TO_DELETE_LIST = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton("🔙 Назад до списку продуктів", callback_data=cb("fridge", "list"))],
+    [InlineKeyboardButton("📋 Холодильник", callback_data=cb("menu", "fridge"))],
+])
+
+_CANCEL = {
+    to_main: InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton("❌ Скасувати", callback_data=cb("cancel", "to", "menu" if to_main else "fridge"))]
     ])
+    for to_main in (True, False)
+}
+
+MEAL_TYPES = ("breakfast", "lunch", "dinner", "snack")
+
+MEAL_MENU = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton("🍳 Сніданок", callback_data=cb("dish", "meal", "breakfast"))],
+    [InlineKeyboardButton("🍝 Обід", callback_data=cb("dish", "meal", "lunch"))],
+    [InlineKeyboardButton("🍲 Вечеря", callback_data=cb("dish", "meal", "dinner"))],
+    [InlineKeyboardButton("🍩 Перекус", callback_data=cb("dish", "meal", "snack"))],
+    _home_row(),
+])
+
+NO_USABLE_PRODUCTS = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton("📋 Холодильник", callback_data=cb("menu", "fridge"))],
+    [InlineKeyboardButton("👤 Профіль", callback_data=cb("menu", "profile"))],
+    _home_row(),
+])
+
+# «Інша спроба» та клавіатура під рецептом — по одній на тип прийому їжі
+_RETRY = {
+    meal: InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton("🔁 Інша спроба", callback_data=cb("dish", "meal", meal))],
+        _home_row(),
+    ])
+    for meal in MEAL_TYPES
+}
+
+PROFILE = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton("✏️ Змінити алергії", callback_data=cb("profile", "edit", "allergies"))],
+    [InlineKeyboardButton("🗑 Очистити алергії", callback_data=cb("profile", "clear", "allergies"))],
+    [InlineKeyboardButton("✏️ Змінити 'Не люблю'", callback_data=cb("profile", "edit", "dislikes"))],
+    [InlineKeyboardButton("🗑 Очистити 'Не люблю'", callback_data=cb("profile", "clear", "dislikes"))],
+    [InlineKeyboardButton("🌿 Вегетаріанець", callback_data=cb("profile", "status", "vegetarian"))],
+    [InlineKeyboardButton("🌱 Веган", callback_data=cb("profile", "status", "vegan"))],
+    [InlineKeyboardButton("🔄 Скинути статус", callback_data=cb("profile", "status", "none"))],
+    _home_row(),
+])
+
+def root_menu_keyboard() -> InlineKeyboardMarkup:
+    return ROOT_MENU
 
 def main_menu_keyboard() -> InlineKeyboardMarkup:
     # залишено для сумісності з старим кодом
-    return root_menu_keyboard()
+    return ROOT_MENU
 
 def back_to_delete_list_keyboard() -> InlineKeyboardMarkup:
+    return BACK_TO_DELETE_LIST
+
+def cancel_keyboard(to_main: bool = True) -> InlineKeyboardMarkup:
+    return _CANCEL[to_main]
+
+def profile_keyboard() -> InlineKeyboardMarkup:
+    return PROFILE
+
+def retry_keyboard(meal_type: str) -> InlineKeyboardMarkup:
+    return _RETRY.get(meal_type) or InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton("🔁 Інша спроба", callback_data=cb("dish", "meal", meal_type))],
+        _home_row(),
+    ])
+
+def _favourite_button(recipe_id: int, favourite: bool) -> InlineKeyboardButton:
+    if favourite:
+        return InlineKeyboardButton("💔 Прибрати з улюблених", callback_data=cb("recipe", "unfav", recipe_id))
+    return InlineKeyboardButton("⭐ В улюблені", callback_data=cb("recipe", "fav", recipe_id))
+
+def recipe_keyboard(meal_type: str, recipe_id: int, favourite: bool = False) -> InlineKeyboardMarkup:
+    # кнопка улюблених містить id рецепта — клавіатура своя для кожного рецепта
     return InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton("🔙 Назад до списку продуктів", callback_data="delete_product")],
-        [InlineKeyboardButton("📋 Холодильник", callback_data="fridge")],
+        [InlineKeyboardButton("✅ Готую це!", callback_data=cb("dish", "cook", recipe_id)),
+         _favourite_button(recipe_id, favourite)],
+        [InlineKeyboardButton("🔁 Інша страва", callback_data=cb("dish", "meal", meal_type))],
+        _home_row(),
     ])
 
-def cancel_keyboard(to_main: bool = True) -> InlineKeyboardMarkup:
-    target = "back_to_menu" if to_main else "fridge"
+def saved_recipe_keyboard(recipe_id: int, favourite: bool) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton("❌ Скасувати", callback_data=f"cancel_{target}")]
+        [InlineKeyboardButton("✅ Готую це!", callback_data=cb("dish", "cook", recipe_id)),
+         _favourite_button(recipe_id, favourite)],
+        [InlineKeyboardButton("⭐ Улюблені рецепти", callback_data=cb("menu", "recipes"))],
+        _home_row(),
     ])
 
+def recipe_list_keyboard(rows: list) -> InlineKeyboardMarkup:
+    """rows — (id, підпис кнопки)."""
+    keyboard = InlineKeyboardMarkup(row_width=1)
+    for recipe_id, label in rows:
+        keyboard.add(InlineKeyboardButton(label[:60], callback_data=cb("recipe", "open", recipe_id)))
+    keyboard.add(*_home_row())
+    return keyboard
+
 # =========================
 #        ГОЛ. МЕНЮ / ХОЛОДИЛЬНИК
 # =========================
 async def handle_main_menu_callback(callback_query: types.CallbackQuery):
     await callback_query.answer()
     fridge_contents = await get_fridge_view(callback_query.from_user.id)
-    await callback_query.message.answer(fridge_contents)
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton("🟩 Додати продукт", callback_data="add_product")],
-        [InlineKeyboardButton("🟥 Видалити продукт", callback_data="delete_product")],
-        [InlineKeyboardButton("🏠 Головне меню", callback_data="back_to_menu")],
-    ])
-    await callback_query.message.answer("Обери дію:", reply_markup=keyboard)
+    await screens.show(callback_query, f"{fridge_contents}\n\nОбери дію:", FRIDGE_ACTIONS)
 
-async def handle_fridge_callback(callback_query: types.CallbackQuery, state: FSMContext):
+async def handle_add_product(callback_query: types.CallbackQuery):
     await callback_query.answer()
-    action = callback_query.data
-    user_id = callback_query.from_user.id
+    await screens.show(
+        callback_query,
+        "🧾 Введи продукт(и) у форматі (через кому):\n"
+        "Назва(може містити пробіли) Кількість Одиниця [Термін дд.мм.рррр — опційно]\n"
+        "Наприклад: помідори чері 300 г 25.07.2025, тунець консервований 1 шт, яйця 6 шт",
+        cancel_keyboard(to_main=True),
+    )
+    await AddProductState.waiting_for_product.set()
+
+async def show_delete_list(callback_query: types.CallbackQuery, header: str = "", notice: str = None):
+    """Екран вибору продукту для видалення (header — рядок над списком, напр. підтвердження)."""
+    products = await get_all_products_with_ids(callback_query.from_user.id)
+    if not products:
+        await screens.show(callback_query, header + "❌ У холодильнику немає продуктів для видалення.",
+                           ROOT_MENU, notice=notice)
+        return
 
-    if action == "add_product":
-        await callback_query.message.answer(
-            "🧾 Введи продукт(и) у форматі (через кому):\n"
-            "Назва(може містити пробіли) Кількість Одиниця [Термін дд.мм.рррр — опційно]\n"
-            "Наприклад: помідори чері 300 г 25.07.2025, тунець консервований 1 шт, яйця 6 шт",
-            reply_markup=cancel_keyboard(to_main=True),
-        )
-        await AddProductState.waiting_for_product.set()
-
-    elif action == "delete_product":
-        products = await get_all_products_with_ids(user_id)
-        if not products:
-            await callback_query.message.answer("❌ У холодильнику немає продуктів для видалення.", reply_markup=main_menu_keyboard())
-            return
-
-        keyboard = InlineKeyboardMarkup(row_width=1)
-        for prod_id, name, quantity, unit, expiry in products:
-            line = f"{name} ({quantity} {unit})"
-            if expiry:
-                line += f" – {expiry}"
-            keyboard.add(InlineKeyboardButton(line, callback_data=f"del_{prod_id}"))
-        keyboard.add(InlineKeyboardButton("🏠 Головне меню", callback_data="back_to_menu"))
-        await callback_query.message.answer("Оберіть продукт для видалення:", reply_markup=keyboard)
-
-    elif action.startswith("del_") and action.count("_") == 1:
-        product_id = int(action.replace("del_", ""))
-        keyboard = InlineKeyboardMarkup(inline_keyboard=[
-            [
-                InlineKeyboardButton("❌ Видалити повністю", callback_data=f"del_full_{product_id}"),
-                InlineKeyboardButton("➖ Видалити частково", callback_data=f"del_partial_{product_id}"),
-            ]
-        ])
-        await callback_query.message.answer("Оберіть тип видалення:", reply_markup=keyboard)
+    keyboard = InlineKeyboardMarkup(row_width=1)
+    for prod_id, name, quantity, unit, expiry in products:
+        line = f"{name} ({quantity} {unit})"
+        if expiry:
+            line += f" – {expiry}"
+        keyboard.add(InlineKeyboardButton(line, callback_data=cb("fridge", "del", prod_id)))
+    keyboard.add(InlineKeyboardButton("🏠 Головне меню", callback_data=cb("menu", "root")))
+    await screens.show(callback_query, header + "Оберіть продукт для видалення:", keyboard, notice=notice)
 
-    elif action == "back_to_menu":
-        await callback_query.message.answer("🏠 Головне меню:", reply_markup=root_menu_keyboard())
+async def handle_delete_list(callback_query: types.CallbackQuery):
+    await callback_query.answer()
+    await show_delete_list(callback_query)
+
+async def handle_delete_item(callback_query: types.CallbackQuery, product_id: int):
+    await callback_query.answer()
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[
+        [
+            InlineKeyboardButton("❌ Видалити повністю", callback_data=cb("fridge", "full", product_id)),
+            InlineKeyboardButton("➖ Видалити частково", callback_data=cb("fridge", "part", product_id)),
+        ],
+        [InlineKeyboardButton("🔙 Назад до списку продуктів", callback_data=cb("fridge", "list"))],
+    ])
+    await screens.show(callback_query, "Оберіть тип видалення:", keyboard)
+
+async def handle_back_to_menu(callback_query: types.CallbackQuery):
+    await callback_query.answer()
+    await screens.show(callback_query, "🏠 Головне меню:", ROOT_MENU)
 
 # =========================
 #          ВИДАЛЕННЯ
 # =========================
-async def handle_delete_choice(callback_query: types.CallbackQuery, state: FSMContext):
+@rate_limit("db_write")
+async def handle_delete_full(callback_query: types.CallbackQuery, product_id: int):
+    await delete_product_by_id(product_id)
+    # одразу оновлений список замість «видалено» + окремого кроку «назад до списку»
+    await show_delete_list(callback_query, header="🗑️ Продукт повністю видалено.\n\n", notice="🗑️ Видалено")
+
+@rate_limit("db_write")
+async def handle_delete_partial(callback_query: types.CallbackQuery, product_id: int, state: FSMContext):
     await callback_query.answer()
-    action = callback_query.data
-
-    if action.startswith("del_full_"):
-        product_id = int(action.replace("del_full_", ""))
-        await delete_product_by_id(product_id)
-        await callback_query.message.answer("🗑️ Продукт повністю видалено.", reply_markup=back_to_delete_list_keyboard())
-
-    elif action.startswith("del_partial_"):
-        product_id = int(action.replace("del_partial_", ""))
-        await state.update_data(product_id=product_id)
-        await callback_query.message.answer(
-            "✂️ Введи кількість, яку хочеш видалити (наприклад: 1 або 250):",
-            reply_markup=cancel_keyboard(to_main=True),
-        )
-        await PartialDeleteState.waiting_for_quantity.set()
+    await state.update_data(product_id=product_id)
+    await screens.show(
+        callback_query,
+        "✂️ Введи кількість, яку хочеш видалити (наприклад: 1 або 250):",
+        cancel_keyboard(to_main=True),
+    )
+    await PartialDeleteState.waiting_for_quantity.set()
 
+@rate_limit("db_write")
 async def handle_partial_quantity_input(message: types.Message, state: FSMContext):
     data = await state.get_data()
     product_id = data.get("product_id")
@@ -187,9 +298,21 @@ async def handle_partial_quantity_input(message: types.Message, state: FSMContex
 # =========================
 #         ДОДАВАННЯ
 # =========================
+@rate_limit("db_write", cost=items_cost)
 async def handle_product_input(message: types.Message, state: FSMContext):
-    await add_product_to_db(user_id=message.from_user.id, text=message.text)
-    await message.reply("✅ Продукт(и) додано до холодильника!", reply_markup=main_menu_keyboard())
+    result = await add_product_to_db(user_id=message.from_user.id, text=message.text)
+    if not result.items:
+        # нічого не розпізнано — лишаємось у стані, щоб користувач виправив і надіслав знову
+        await message.reply(
+            "❗️ Не розпізнав жодного продукту:\n" + format_errors(result.errors)
+            + "\n\nФормат: Назва Кількість Одиниця [дд.мм.рррр], через кому.",
+            reply_markup=cancel_keyboard(to_main=True),
+        )
+        return
+    text = "✅ Продукт(и) додано до холодильника!"
+    if result.errors:
+        text += "\n\n❗️ Пропущено:\n" + format_errors(result.errors)
+    await message.reply(text, reply_markup=main_menu_keyboard())
     await state.finish()
 
 # =========================
@@ -197,94 +320,93 @@ async def handle_product_input(message: types.Message, state: FSMContext):
 # =========================
 async def handle_daily_dish(callback_query: types.CallbackQuery):
     await callback_query.answer()
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton("🍳 Сніданок", callback_data="daily_dish_breakfast")],
-        [InlineKeyboardButton("🍝 Обід", callback_data="daily_dish_lunch")],
-        [InlineKeyboardButton("🍲 Вечеря", callback_data="daily_dish_dinner")],
-        [InlineKeyboardButton("🍩 Перекус", callback_data="daily_dish_snack")],
-        [InlineKeyboardButton("🏠 Головне меню", callback_data="back_to_menu")],
-    ])
-    await callback_query.message.answer("Оберіть тип прийому їжі:", reply_markup=keyboard)
+    await screens.show(callback_query, "Оберіть тип прийому їжі:", MEAL_MENU)
 
-async def handle_meal_type_selection(callback_query: types.CallbackQuery):
+@rate_limit("llm")
+async def handle_meal_type_selection(callback_query: types.CallbackQuery, meal_type: str):
+    # meal_type: breakfast / lunch / dinner / snack
     await callback_query.answer()
     user_id = callback_query.from_user.id
-    meal_type = callback_query.data.replace("daily_dish_", "")  # breakfast / lunch / dinner / snack
-    print(f"🍽️ CALLBACK: daily_dish → {meal_type}")
+    logger.info("🍽️ Генерація страви дня", extra=fields(user_id=user_id, meal_type=meal_type))
 
-    await callback_query.message.answer("⏳ Генерую страву...")
-    recipe = await suggest_recipe(user_id, meal_type)
+    # той самий екран проходить «генерую» → «черга» → рецепт
+    progress = await screens.show(callback_query, "⏳ Генерую страву...")
+
+    async def notify_queue(position: int):
+        nonlocal progress
+        progress = await screens.edit(progress, f"🚶 Зараз багато запитів — ти {position}-й у черзі, зачекай трохи.")
+
+    recipe = await suggest_recipe(user_id, meal_type, on_queued=notify_queue)
+
+    if recipe.startswith(LLM_FALLBACK_PREFIX):
+        await screens.edit(progress, recipe, retry_keyboard(meal_type))
+        return
 
     if recipe.startswith("❌ Усі продукти в холодильнику"):
-        await callback_query.message.answer(
+        await screens.edit(
+            progress,
             "🚫 Не вдалося згенерувати страву, бо у холодильнику немає жодного продукту, який можна використати.\n"
             "Можливо, всі вони прострочені або входять до списку алергенів/нелюбимих.\n\n"
             "🧾 Додай нові продукти або зміни профіль, щоб отримати рецепти.",
-            reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                [InlineKeyboardButton("📋 Холодильник", callback_data="fridge")],
-                [InlineKeyboardButton("👤 Профіль", callback_data="profile")],
-                [InlineKeyboardButton("🏠 Головне меню", callback_data="back_to_menu")],
-            ]),
+            NO_USABLE_PRODUCTS,
         )
         return
 
     if "Інгредієнти:" not in recipe:
-        print("⚠️ Структура рецепту не відповідає очікуваному формату!")
-        await callback_query.message.answer(
+        logger.warning("⚠️ Структура рецепту не відповідає очікуваному формату", extra=fields(user_id=user_id))
+        await screens.edit(
+            progress,
             "⚠️ Виникла помилка при генерації страви. Спробуй ще раз або натисни 🔁 Інша спроба.",
-            reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                [InlineKeyboardButton("🔁 Інша спроба", callback_data=f"daily_dish_{meal_type}")],
-                [InlineKeyboardButton("🏠 Головне меню", callback_data="back_to_menu")],
-            ]),
+            retry_keyboard(meal_type),
         )
         return
 
-    # --- Збереження інгредієнтів для списання ---
-    global last_generated_ingredients
-    last_generated_ingredients = {}
+    # один розбір на все: списання, БЖУ під рецептом і бібліотека рецептів
+    ingredients = extract_ingredients(recipe)
 
-    try:
-        ingredients_block = recipe.split("Інгредієнти:")[1].split("🔷")[0]
-        lines = ingredients_block.strip().split("\n")
-        for line in lines:
-            if "-" not in line:
-                continue
-            parts = line.strip("- ").rsplit(",", 1)
-            if len(parts) != 2:
-                continue
-            name = parts[0].strip().lower()
-            quantity_unit = parts[1].strip()
-            match = re.match(r"([\d.,]+)\s*(\S+)", quantity_unit)
-            if match:
-                quantity = float(match.group(1).replace(",", "."))
-                unit = match.group(2)
-                last_generated_ingredients[(name, unit)] = quantity
-    except Exception as e:
-        print("❌ Парсинг інгредієнтів не вдався:", e)
-        await callback_query.message.answer(
-            "⚠️ Не вдалося розпізнати інгредієнти. Спробуй ще раз або вибери іншу страву.",
-            reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                [InlineKeyboardButton("🔁 Інша спроба", callback_data=f"daily_dish_{meal_type}")],
-                [InlineKeyboardButton("🏠 Головне меню", callback_data="back_to_menu")],
-            ]),
-        )
-        return
+    # у бібліотеку — щоб улюблене можна було знайти й приготувати знову без генерації;
+    # «Готую це!» списує саме цей рецепт за його id
+    recipe_id = await recipes.save(user_id, meal_type, recipe, ingredients)
+    pending_cooks.set((user_id, recipe_id), True)
+    await screens.edit(progress, await with_nutrition(user_id, recipe, ingredients), recipe_keyboard(meal_type, recipe_id))
 
-    await callback_query.message.answer(recipe, reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton("✅ Готую це!", callback_data="cook_confirm")],
-        [InlineKeyboardButton("🔁 Інша страва", callback_data=f"daily_dish_{meal_type}")],
-        [InlineKeyboardButton("🏠 Головне меню", callback_data="back_to_menu")],
-    ]))
+async def with_nutrition(user_id: int, recipe: str, ingredients: dict) -> str:
+    """Рецепт + рядок БЖУ з тих самих інгредієнтів (локально, без LLM)."""
+    if not ingredients:
+        return recipe
+    profile = await get_user_profile(user_id)
+    return recipe + "\n\n" + nutrition.format_summary(
+        nutrition.recipe_summary(ingredients), nutrition.daily_targets(profile), title="БЖУ страви",
+    )
 
 # --- Підтвердження приготування / списання ---
 from aiogram import types as _types
 from aiogram.types import InlineKeyboardMarkup as _InlineKeyboardMarkup, InlineKeyboardButton as _InlineKeyboardButton
 
-last_generated_ingredients = {}  # продукт_назва → (кількість, одиниця)
+# (user_id, recipe_id) показаних рецептів, які ще можна списати. Інгредієнти — у БД (recipe_ingredients),
+# тут лише відмітка: «Готую це!» знімає її першою, тож подвійне натискання не списує двічі.
+# Рецепт, який не приготували за PENDING_COOK_TTL, треба відкрити знову
+pending_cooks = BoundedCache(
+    "pending_cooks",
+    int(os.getenv("PENDING_COOK_MAX") or 10_000),
+    ttl=int(os.getenv("PENDING_COOK_TTL") or 6 * 3600),
+)
+
+@rate_limit("db_write")
+async def handle_cook_confirm(callback_query: _types.CallbackQuery, recipe_id: int):
+    user_id = callback_query.from_user.id
 
-async def handle_cook_confirm(callback_query: _types.CallbackQuery):
+    # знімаємо відмітку до будь-якого await — друге натискання вже нічого не знайде
+    if pending_cooks.pop((user_id, recipe_id)) is None:
+        await callback_query.answer("✅ Цю страву вже списано. Щоб приготувати ще раз — відкрий рецепт знову.",
+                                    show_alert=True)
+        return
+    recipe = await get_recipe(user_id, recipe_id)
+    if recipe is None:
+        await callback_query.answer("⌛ Рецепт застарів — згенеруй страву ще раз.", show_alert=True)
+        return
     await callback_query.answer("🍳 Готуємо страву...")
-    user_id = callback_query.from_user.id
+    ingredients = recipe["ingredients"]
 
     fridge = await get_all_products_with_ids(user_id)
 
@@ -299,14 +421,14 @@ async def handle_cook_confirm(callback_query: _types.CallbackQuery):
                 exp_dt = None
         fridge_dict.setdefault(key, []).append((prod_id, float(quantity), exp_dt))
 
-    print("📦 Списання продуктів:")
-    for (ingredient, unit), needed_qty in last_generated_ingredients.items():
+    logger.debug("📦 Списання продуктів", extra=fields(user_id=user_id, ingredients=len(ingredients)))
+    for (ingredient, unit), needed_qty in ingredients.items():
         key = (ingredient.lower(), unit)
         batches = fridge_dict.get(key, [])
 
         batches = filter_expired_batches_before_deduction(batches)
         if not batches:
-            print(f"⚠️ {ingredient} ({unit}) — всі партії прострочені або відсутні.")
+            logger.debug("⚠️ Усі партії прострочені або відсутні", extra=fields(user_id=user_id, ingredient=ingredient, unit=unit))
             continue
 
         def sort_key(batch):
@@ -316,7 +438,6 @@ async def handle_cook_confirm(callback_query: _types.CallbackQuery):
             return (0, exp_dt)
         batches.sort(key=sort_key)
 
-        print(f"🔸 {ingredient} ({unit}) — потрібно {needed_qty}")
 
         for prod_id, available_qty, exp_dt in batches:
             if needed_qty <= 0:
@@ -326,7 +447,10 @@ async def handle_cook_confirm(callback_query: _types.CallbackQuery):
             remaining = round(available_qty - used_qty, 3)
 
             exp_str = exp_dt.strftime('%d.%m.%Y') if exp_dt else "без терміну"
-            print(f"  🧾 Партія до {exp_str}: було {available_qty}, списано {used_qty}, залишилось {remaining}")
+            logger.debug("🧾 Списано з партії", extra=fields(
+                user_id=user_id, ingredient=ingredient, unit=unit, expiry=exp_str,
+                was=available_qty, used=used_qty, remaining=remaining,
+            ))
 
             if remaining > 0:
                 await update_product_quantity_by_id(prod_id, remaining)
@@ -336,125 +460,168 @@ async def handle_cook_confirm(callback_query: _types.CallbackQuery):
     await callback_query.message.answer("✅ Холодильник оновлено після приготування страви.")
 
 # =========================
-#            ПРОФІЛЬ
+#        УЛЮБЛЕНІ РЕЦЕПТИ
 # =========================
-async def handle_profile_callback(callback_query: types.CallbackQuery):
+async def show_favourites(target: screens.Target):
+    """Улюблені рецепти — ті, для яких у холодильнику є найбільше, першими."""
+    rows = await recipes.favourites(target.from_user.id)
+    if not rows:
+        await screens.show(
+            target,
+            "⭐ Улюблених рецептів поки немає.\n"
+            "Натисни «⭐ В улюблені» під стравою, яка сподобалась, а знайти будь-який збережений — /recipes запит.",
+            HOME,
+        )
+        return
+    keyboard = recipe_list_keyboard(
+        [(recipe_id, f"{title} · {recipes.coverage_label(total, covered)}") for recipe_id, title, total, covered in rows]
+    )
+    await screens.show(target, "⭐ Улюблені рецепти (за тим, що є в холодильнику):", keyboard)
+
+async def handle_favourites(callback_query: types.CallbackQuery):
     await callback_query.answer()
+    await show_favourites(callback_query)
+
+async def handle_recipe_open(callback_query: types.CallbackQuery, recipe_id: int):
     user_id = callback_query.from_user.id
-    profile = await get_user_profile(user_id)
+    recipe = await get_recipe(user_id, recipe_id)
+    if recipe is None:
+        await callback_query.answer("⌛ Цього рецепта вже немає.", show_alert=True)
+        return
+    await callback_query.answer()
+    # «Готую це!» під цим екраном списує саме цей рецепт
+    pending_cooks.set((user_id, recipe_id), True)
+    await screens.show(
+        callback_query,
+        await with_nutrition(user_id, recipe["body"], recipe["ingredients"]),
+        saved_recipe_keyboard(recipe_id, recipe["favourite"]),
+    )
+
+@rate_limit("db_write")
+async def handle_recipe_favourite(callback_query: types.CallbackQuery, recipe_id: int, favourite: bool = True):
+    if not await set_recipe_favourite(callback_query.from_user.id, recipe_id, favourite):
+        await callback_query.answer("⌛ Цього рецепта вже немає.", show_alert=True)
+        return
+    await callback_query.answer("⭐ Додано в улюблені" if favourite else "💔 Прибрано з улюблених")
+    # міняємо лише кнопку, текст рецепта лишається
+    markup = callback_query.message.reply_markup
+    if markup is not None:
+        old = {cb("recipe", "fav", recipe_id), cb("recipe", "unfav", recipe_id)}
+        keyboard = InlineKeyboardMarkup(inline_keyboard=[
+            [_favourite_button(recipe_id, favourite) if b.callback_data in old else b for b in row]
+            for row in markup.inline_keyboard
+        ])
+        try:
+            await callback_query.message.edit_reply_markup(keyboard)
+        except screens.CANT_EDIT:
+            pass  # кнопка — не критично, прапорець у БД уже змінено
+
+async def handle_recipe_unfavourite(callback_query: types.CallbackQuery, recipe_id: int):
+    await handle_recipe_favourite(callback_query, recipe_id, favourite=False)
+
+# =========================
+#            ПРОФІЛЬ
+# =========================
+async def show_profile(target: screens.Target, header: str = "", notice: str = None):
+    """Екран профілю; header — рядок-підтвердження над ним, notice — спливаюче підтвердження кнопки."""
+    profile = await get_user_profile(target.from_user.id)
 
     allergies = profile.get("allergies", "") or "не вказано"
     dislikes = profile.get("dislikes", "") or "не вказано"
     status = profile.get("status", "") or "звичайний"
+    targets = nutrition.daily_targets(profile)
 
     text = (
+        f"{header}"
         "👤 Твій профіль:\n"
         f"• 🤧 Алергії: {allergies}\n"
         f"• 🙅‍♂️ Не люблю: {dislikes}\n"
-        f"• 🌱 Статус: {status}"
+        f"• 🌱 Статус: {status}\n"
+        f"• 🎯 Денна норма: {targets or 'не задано'} (/goal)"
     )
+    await screens.show(target, text, PROFILE, notice=notice)
 
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton("✏️ Змінити алергії", callback_data="edit_allergies")],
-        [InlineKeyboardButton("🗑 Очистити алергії", callback_data="clear_allergies")],
-        [InlineKeyboardButton("✏️ Змінити 'Не люблю'", callback_data="edit_dislikes")],
-        [InlineKeyboardButton("🗑 Очистити 'Не люблю'", callback_data="clear_dislikes")],
-        [InlineKeyboardButton("🌿 Вегетаріанець", callback_data="set_status_vegetarian")],
-        [InlineKeyboardButton("🌱 Веган", callback_data="set_status_vegan")],
-        [InlineKeyboardButton("🔄 Скинути статус", callback_data="set_status_none")],
-        [InlineKeyboardButton("🏠 Головне меню", callback_data="back_to_menu")],
-    ])
-    await callback_query.message.answer(text, reply_markup=keyboard)
-
-async def handle_profile_buttons(callback_query: types.CallbackQuery, state: FSMContext):
+async def handle_profile_callback(callback_query: types.CallbackQuery):
     await callback_query.answer()
-    action = callback_query.data
-    user_id = callback_query.from_user.id
+    await show_profile(callback_query)
 
-    if action == "edit_allergies":
-        await callback_query.message.answer("🤧 Введи алергії (через кому):", reply_markup=cancel_keyboard(to_main=True))
+async def handle_profile_edit(callback_query: types.CallbackQuery, field: str, state: FSMContext):
+    await callback_query.answer()
+    if field == "allergies":
+        await screens.show(callback_query, "🤧 Введи алергії (через кому):", cancel_keyboard(to_main=True))
         await ProfileState.waiting_for_allergies.set()
 
-    elif action == "edit_dislikes":
-        await callback_query.message.answer("🙅‍♂️ Введи продукти, які не любиш (через кому):", reply_markup=cancel_keyboard(to_main=True))
+    elif field == "dislikes":
+        await screens.show(callback_query, "🙅‍♂️ Введи продукти, які не любиш (через кому):", cancel_keyboard(to_main=True))
         await ProfileState.waiting_for_dislikes.set()
 
-    elif action == "set_status_vegan":
+# Підтвердження — спливаючим повідомленням, а профіль перемальовується на місці
+async def handle_profile_status(callback_query: types.CallbackQuery, status: str):
+    user_id = callback_query.from_user.id
+    if status == "vegan":
         await update_user_status(user_id, "веган")
-        await callback_query.message.answer("🌿 Статус оновлено на: веган")
-        await handle_profile_callback(callback_query)
+        notice = "🌿 Статус оновлено на: веган"
 
-    elif action == "set_status_vegetarian":
+    elif status == "vegetarian":
         await update_user_status(user_id, "вегетаріанець")
-        await callback_query.message.answer("🥕 Статус оновлено на: вегетаріанець")
-        await handle_profile_callback(callback_query)
+        notice = "🥕 Статус оновлено на: вегетаріанець"
 
-    elif action == "set_status_none":
+    elif status == "none":
         await update_user_status(user_id, "")
-        await callback_query.message.answer("🔄 Статус скинуто до звичайного")
-        await handle_profile_callback(callback_query)
+        notice = "🔄 Статус скинуто до звичайного"
 
-    elif action == "clear_allergies":
+    else:
+        await callback_query.answer()
+        return
+    await show_profile(callback_query, notice=notice)
+
+async def handle_profile_clear(callback_query: types.CallbackQuery, field: str):
+    user_id = callback_query.from_user.id
+    if field == "allergies":
         await clear_user_allergies(user_id)
-        await callback_query.message.answer("🧽 Алергії очищено.")
-        await handle_profile_callback(callback_query)
+        notice = "🧽 Алергії очищено."
 
-    elif action == "clear_dislikes":
+    elif field == "dislikes":
         await clear_user_dislikes(user_id)
-        await callback_query.message.answer("🧽 'Не люблю' очищено.")
-        await handle_profile_callback(callback_query)
+        notice = "🧽 'Не люблю' очищено."
 
+    else:
+        await callback_query.answer()
+        return
+    await show_profile(callback_query, notice=notice)
+
+@rate_limit("db_write")
 async def handle_profile_text_input(message: types.Message, state: FSMContext):
     user_id = message.from_user.id
     current_state = await state.get_state()
 
+    header = ""
     if current_state == ProfileState.waiting_for_allergies.state:
         await update_user_allergies(user_id, message.text.strip())
-        await message.answer("✅ Алергії оновлено!")
+        header = "✅ Алергії оновлено!\n\n"
 
     elif current_state == ProfileState.waiting_for_dislikes.state:
         await update_user_dislikes(user_id, message.text.strip())
-        await message.answer("✅ Список 'Не люблю' оновлено!")
+        header = "✅ Список 'Не люблю' оновлено!\n\n"
 
     await state.finish()
 
-    # Повернення до профілю після оновлення
-    profile = await get_user_profile(user_id)
-
-    allergies = profile.get("allergies", "") or "не вказано"
-    dislikes = profile.get("dislikes", "") or "не вказано"
-    status = profile.get("status", "") or "звичайний"
-
-    text = (
-        "👤 Твій профіль:\n"
-        f"• 🤧 Алергії: {allergies}\n"
-        f"• 🙅‍♂️ Не люблю: {dislikes}\n"
-        f"• 🌱 Статус: {status}"
-    )
-
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton("✏️ Змінити алергії", callback_data="edit_allergies")],
-        [InlineKeyboardButton("🗑 Очистити алергії", callback_data="clear_allergies")],
-        [InlineKeyboardButton("✏️ Змінити 'Не люблю'", callback_data="edit_dislikes")],
-        [InlineKeyboardButton("🗑 Очистити 'Не люблю'", callback_data="clear_dislikes")],
-        [InlineKeyboardButton("🌿 Вегетаріанець", callback_data="set_status_vegetarian")],
-        [InlineKeyboardButton("🌱 Веган", callback_data="set_status_vegan")],
-        [InlineKeyboardButton("🔄 Скинути статус", callback_data="set_status_none")],
-        [InlineKeyboardButton("🏠 Головне меню", callback_data="back_to_menu")],
-    ])
-
-    await message.answer(text, reply_markup=keyboard)
+    # Повернення до профілю після оновлення — одним повідомленням разом із підтвердженням
+    await show_profile(message, header=header)
 
 # =========================
 #        ЗАГЛУШКИ
 # =========================
 async def handle_weekly_menu_placeholder(callback_query: types.CallbackQuery):
-    await callback_query.answer()
-    await callback_query.message.answer("📅 Ця функція ще в розробці. Скоро зʼявиться можливість планувати меню на тиждень!")
+    # спливаюче вікно — меню лишається на місці, окреме повідомлення не потрібне
+    await callback_query.answer(
+        "📅 Ця функція ще в розробці. Скоро зʼявиться можливість планувати меню на тиждень!", show_alert=True,
+    )
 
 async def handle_help_placeholder(callback_query: types.CallbackQuery):
     await callback_query.answer()
-    await callback_query.message.answer(
+    await screens.show(
+        callback_query,
         "🍳 **Про кулінарного бота**\n\n"
         "Я допомагаю швидко вигадувати, що приготувати з того, що є в холодильнику — без зайвого клопоту.\n\n"
         "---\n\n"
@@ -468,12 +635,22 @@ async def handle_help_placeholder(callback_query: types.CallbackQuery):
         "- Генерую рецепт з того, що є у твоєму холодильнику.\n"
         "- Пріоритет — продукти, у яких скоро спливає термін.\n"
         "- Прострочені не використовуються.\n\n"
+        "**⭐ Улюблені рецепти**\n"
+        "- Кожна згенерована страва зберігається; «⭐ В улюблені» — щоб не загубити.\n"
+        "- Улюблені показую за тим, скільки інгредієнтів уже є в холодильнику, — і готуєш без нової генерації.\n"
+        "- /recipes запит — пошук по назвах і кроках збережених рецептів.\n\n"
         "**👤 Профіль**\n"
         "- Вкажи алергії та “не люблю” — я їх уникатиму.\n"
         "- Статус харчування: звичайний / вегетаріанець / веган.\n\n"
+        "**🏋️ БЖУ та калорії**\n"
+        "- Під кожною стравою — калорії, білки, жири й вуглеводи.\n"
+        "- /goal — денна норма під ціль (схуднення / підтримка / набір) і БЖУ холодильника.\n\n"
         "**🔔 Нагадування**\n"
-        "- Щодня о 09:00 — про продукти, що спливають сьогодні.\n"
-        "- Щосуботи о 09:00 — про прострочені продукти.\n\n"
+        f"- Щодня у твій час (типово {reminders.DEFAULT_TIME}, {reminders.DEFAULT_TZ}) — про продукти, що спливають сьогодні.\n"
+        "- Щосуботи в той самий час — про прострочені продукти.\n"
+        f"- Щоб усі не отримували повідомлення в одну секунду, кожному воно приходить у межах "
+        f"{reminders.SPREAD_SECONDS // 60} хв після обраного часу — щодня в той самий момент.\n"
+        "- `/reminder 08:30 Europe/Kyiv` — змінити час і часовий пояс, `/reminder off` / `/reminder on` — вимкнути чи увімкнути.\n\n"
         "---\n\n"
         "## ✍️ Як вводити продукти\n"
         "- Формат: `Назва Кількість Одиниця [Термін дд.мм.рррр — опціонально]`\n"
@@ -484,17 +661,14 @@ async def handle_help_placeholder(callback_query: types.CallbackQuery):
         "---\n\n"
         "## 🗺 Дорожня карта (у розробці)\n"
         "- 📅 Тижневе меню\n"
-        "- 🏋️ БЖУ та калорії для спортсменів\n"
         "- 🎯 Меню під різні цілі\n"
         "- 🧠 Підтримка харчових звичок і РПП\n\n"
         "---\n\n"
         "## 🔐 Приватність\n"
         "Дані зберігаються локально для роботи бота.\n\n"
         "💡 Маєш ідеї чи знайшов баг? Натисни кнопку *📝 Пропозиції та ідеї* у головному меню — твій відгук одразу потрапить розробнику.",
+        HOME,
         parse_mode="Markdown",
-        reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton("🏠 Головне меню", callback_data="back_to_menu")]
-        ]),
     )
 
 # =========================
@@ -502,10 +676,11 @@ async def handle_help_placeholder(callback_query: types.CallbackQuery):
 # =========================
 async def handle_feedback_click(callback_query: types.CallbackQuery, state: FSMContext):
     await callback_query.answer()
-    await callback_query.message.answer(
+    await screens.show(
+        callback_query,
         "📝 Напиши свої ідеї, пропозиції або баги одним повідомленням.\n"
         "_Я перешлю їх розробнику._",
-        reply_markup=cancel_keyboard(to_main=True),
+        cancel_keyboard(to_main=True),
     )
     await FeedbackState.waiting_for_text.set()
 
@@ -528,8 +703,8 @@ async def handle_feedback_text(message: types.Message, state: FSMContext, bot: B
         await bot.send_message(feedback_chat_id, msg, parse_mode="Markdown", disable_web_page_preview=True)
         # залишаємо forward для прозорості у тестовому періоді
         await bot.forward_message(feedback_chat_id, message.chat.id, message.message_id)
-    except Exception as e:
-        print("❌ Не вдалося надіслати фідбек:", e)
+    except Exception:
+        logger.exception("❌ Не вдалося надіслати фідбек", extra=fields(user_id=message.from_user.id))
 
     await message.answer("✅ Дякую! Твій фідбек надіслано розробнику.", reply_markup=root_menu_keyboard())
     await state.finish()
@@ -537,50 +712,68 @@ async def handle_feedback_text(message: types.Message, state: FSMContext, bot: B
 # =========================
 #        СКАСУВАННЯ
 # =========================
-async def handle_cancel(callback_query: types.CallbackQuery, state: FSMContext):
+async def handle_cancel(callback_query: types.CallbackQuery, target: str, state: FSMContext):
+    # target ("menu" / "fridge") поки не розрізняється — після скасування завжди головне меню
     await state.finish()
-    await callback_query.answer("❌ Дію скасовано.")
-    await callback_query.message.answer("🏠 Головне меню:", reply_markup=root_menu_keyboard())
+    await screens.show(callback_query, "🏠 Головне меню:", ROOT_MENU, notice="❌ Дію скасовано.")
 
 # =========================
 #        РЕЄСТРАЦІЯ
 # =========================
 def register_callback_handlers(dp: Dispatcher, bot: Bot, feedback_chat_id: str):
+    # Усі кнопки — через один роутер: "префікс:дія[:аргументи]" → хендлер
+    router.add("menu", "root", handle_back_to_menu)
+    router.add("menu", "fridge", handle_main_menu_callback)
+    router.add("menu", "dish", handle_daily_dish)
+    router.add("menu", "weekly", handle_weekly_menu_placeholder)
+    router.add("menu", "profile", handle_profile_callback)
+    router.add("menu", "help", handle_help_placeholder)
+    router.add("menu", "feedback", handle_feedback_click)
+    router.add("cancel", "to", handle_cancel, str, any_state=True)
+
     # Холодильник
-    dp.register_callback_query_handler(handle_main_menu_callback, lambda c: c.data == "fridge")
-    dp.register_callback_query_handler(handle_cancel, lambda c: c.data.startswith("cancel_"), state="*")
-    dp.register_callback_query_handler(
-        handle_delete_choice,
-        lambda c: c.data.startswith("del_full_") or c.data.startswith("del_partial_"),
-    )
-    dp.register_callback_query_handler(
-        handle_fridge_callback,
-        lambda c: c.data.startswith("del_") or c.data in ["add_product", "delete_product", "back_to_menu"],
-    )
-    dp.register_message_handler(handle_product_input, state=AddProductState.waiting_for_product)
-    dp.register_message_handler(handle_partial_quantity_input, state=PartialDeleteState.waiting_for_quantity)
+    router.add("fridge", "add", handle_add_product)
+    router.add("fridge", "list", handle_delete_list)
+    router.add("fridge", "del", handle_delete_item, int)
+    router.add("fridge", "full", handle_delete_full, int)
+    router.add("fridge", "part", handle_delete_partial, int)
 
     # Страва дня
-    dp.register_callback_query_handler(handle_daily_dish, lambda c: c.data == "daily_dish")
-    dp.register_callback_query_handler(handle_meal_type_selection, lambda c: c.data.startswith("daily_dish_"))
-    dp.register_callback_query_handler(handle_cook_confirm, lambda c: c.data == "cook_confirm")
+    router.add("dish", "meal", handle_meal_type_selection, str)
+    router.add("dish", "cook", handle_cook_confirm, int)
 
-    # Заглушки
-    dp.register_callback_query_handler(handle_weekly_menu_placeholder, lambda c: c.data == "weekly_menu")
-    dp.register_callback_query_handler(handle_help_placeholder, lambda c: c.data == "help")
+    # Бібліотека рецептів
+    router.add("menu", "recipes", handle_favourites)
+    router.add("recipe", "open", handle_recipe_open, int)
+    router.add("recipe", "fav", handle_recipe_favourite, int)
+    router.add("recipe", "unfav", handle_recipe_unfavourite, int)
 
     # Профіль
-    dp.register_callback_query_handler(handle_profile_callback, lambda c: c.data == "profile")
-    dp.register_callback_query_handler(
-        handle_profile_buttons,
-        lambda c: c.data.startswith("edit_") or c.data.startswith("set_status") or c.data.startswith("clear_"),
-    )
+    router.add("profile", "edit", handle_profile_edit, str)
+    router.add("profile", "clear", handle_profile_clear, str)
+    router.add("profile", "status", handle_profile_status, str)
+
+    # Кнопки старого формату, що лишились в історії чатів
+    for old, new in (("fridge", "menu:fridge"), ("daily_dish", "menu:dish"), ("weekly_menu", "menu:weekly"),
+                     ("profile", "menu:profile"), ("help", "menu:help"), ("feedback", "menu:feedback"),
+                     ("back_to_menu", "menu:root"), ("add_product", "fridge:add"), ("delete_product", "fridge:list")):
+        router.alias(old, new)
+    for old_prefix, prefix, action in (("cancel_", "cancel", "to"), ("del_full_", "fridge", "full"),
+                                       ("del_partial_", "fridge", "part"), ("del_", "fridge", "del"),
+                                       ("daily_dish_", "dish", "meal"), ("edit_", "profile", "edit"),
+                                       ("clear_", "profile", "clear"), ("set_status_", "profile", "status")):
+        router.alias_prefix(old_prefix, prefix, action)
+    router.register(dp)
+
+    # Діалоги (FSM)
+    dp.register_message_handler(handle_product_input, state=AddProductState.waiting_for_product)
+    dp.register_message_handler(handle_partial_quantity_input, state=PartialDeleteState.waiting_for_quantity)
     dp.register_message_handler(handle_profile_text_input, state=ProfileState.waiting_for_allergies)
     dp.register_message_handler(handle_profile_text_input, state=ProfileState.waiting_for_dislikes)
 
     # Фідбек
-    dp.register_callback_query_handler(handle_feedback_click, lambda c: c.data == "feedback")
-    dp.register_message_handler(
-        lambda msg, state, b=bot, fc=feedback_chat_id: handle_feedback_text(msg, state, b, fc),
-        state=FeedbackState.waiting_for_text,
-    )
+    @rate_limit("feedback")
+    async def feedback_text(msg: types.Message, state: FSMContext):
+        await handle_feedback_text(msg, state, bot, feedback_chat_id)
+
+    dp.register_message_handler(feedback_text, state=FeedbackState.waiting_for_text)
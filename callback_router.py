@@ -0,0 +1,147 @@
+import inspect
+import logging
+import typing
+
+from aiogram import Dispatcher, types
+from aiogram.dispatcher import FSMContext
+
+from log import fields
+
+logger = logging.getLogger(__name__)
+
+# Один зареєстрований в aiogram хендлер на всі callback-кнопки замість довгого ланцюжка
+# lambda-фільтрів, які перевіряються по черзі на кожне натискання.
+# Формат callback_data: "префікс:дія[:арг1[:арг2…]]", напр. "fridge:full:42".
+# Маршрут шукається одним зверненням до словника за (префікс, дія), аргументи
+# приводяться до типів, заданих при реєстрації. Старі рядки (кнопки в історії чатів)
+# перекладаються через таблицю псевдонімів: точний збіг або найдовший префікс.
+
+SEP = ":"
+MAX_DATA_BYTES = 64  # обмеження Telegram на callback_data
+
+
+class Route(typing.NamedTuple):
+    handler: typing.Callable[..., typing.Awaitable]
+    arg_types: typing.Tuple[type, ...]
+    any_state: bool      # спрацьовує в будь-якому FSM-стані (напр. «Скасувати»)
+    wants_state: bool    # хендлер приймає state: FSMContext
+
+
+def data(prefix: str, action: str, *args) -> str:
+    """callback_data для кнопки; ValueError, якщо не влазить у 64 байти або містить роздільник."""
+    parts = [prefix, action, *map(str, args)]
+    if any(SEP in p for p in parts):
+        raise ValueError(f"'{SEP}' не можна використовувати в частинах callback_data: {parts}")
+    value = SEP.join(parts)
+    if len(value.encode()) > MAX_DATA_BYTES:
+        raise ValueError(f"callback_data довша за {MAX_DATA_BYTES} байт: {value}")
+    return value
+
+
+class CallbackRouter:
+    def __init__(self):
+        self._routes: typing.Dict[typing.Tuple[str, str], Route] = {}
+        self._aliases: typing.Dict[str, str] = {}
+        self._alias_prefixes: typing.List[typing.Tuple[str, str, str]] = []  # (старий префікс, префікс, дія)
+
+    def __len__(self):
+        return len(self._routes)
+
+    # ====== Реєстрація ======
+    def add(self, prefix: str, action: str, handler, *arg_types: type, any_state: bool = False):
+        key = (prefix, action)
+        if key in self._routes:
+            raise ValueError(f"Маршрут {prefix}{SEP}{action} уже зареєстровано")
+        wants_state = "state" in inspect.signature(handler).parameters
+        self._routes[key] = Route(handler, arg_types, any_state, wants_state)
+
+    def route(self, prefix: str, action: str, *arg_types: type, any_state: bool = False):
+        """Декоратор: @router.route("fridge", "full", int)."""
+        def decorator(handler):
+            self.add(prefix, action, handler, *arg_types, any_state=any_state)
+            return handler
+        return decorator
+
+    def alias(self, old: str, new: str):
+        """Стара callback_data, що точно відповідає новій."""
+        self._aliases[old] = new
+
+    def alias_prefix(self, old_prefix: str, prefix: str, action: str):
+        """Стара "old_prefix<арг>" → "prefix:action:<арг>" (напр. del_full_42 → fridge:full:42)."""
+        self._alias_prefixes.append((old_prefix, prefix, action))
+        # найдовший префікс — першим, тож del_full_ не перехопить del_
+        self._alias_prefixes.sort(key=lambda rule: len(rule[0]), reverse=True)
+
+    # ====== Розбір ======
+    def _translate(self, value: str) -> str:
+        new = self._aliases.get(value)
+        if new is not None:
+            return new
+        for old_prefix, prefix, action in self._alias_prefixes:
+            if value.startswith(old_prefix):
+                return SEP.join((prefix, action, value[len(old_prefix):]))
+        return value
+
+    def resolve(self, value: typing.Optional[str]) -> typing.Optional[typing.Tuple[Route, tuple]]:
+        """(маршрут, типізовані аргументи) або None, якщо маршруту нема чи аргументи не розбираються."""
+        if not value:
+            return None
+        if SEP not in value:
+            value = self._translate(value)
+        parts = value.split(SEP)
+        route = self._routes.get((parts[0], parts[1] if len(parts) > 1 else ""))
+        if route is None:
+            return None
+        raw_args = parts[2:]
+        if len(raw_args) != len(route.arg_types):
+            return None
+        try:
+            return route, tuple(t(a) for t, a in zip(route.arg_types, raw_args))
+        except ValueError:
+            return None
+
+    def handler_for(self, value: typing.Optional[str]):
+        """Справжній хендлер для callback_data — для middleware (ліміти, метрики)."""
+        resolved = self.resolve(value)
+        return resolved[0].handler if resolved else None
+
+    def handlers(self) -> typing.List[typing.Callable]:
+        return [route.handler for route in self._routes.values()]
+
+    # ====== Диспетчеризація ======
+    async def dispatch(self, callback_query: types.CallbackQuery, state: FSMContext):
+        resolved = self.resolve(callback_query.data)
+        if resolved is None:
+            logger.warning("⚠️ Невідома callback-кнопка", extra=fields(
+                user_id=callback_query.from_user.id, data=callback_query.data,
+            ))
+            await callback_query.answer()
+            return
+        route, args = resolved
+        # як і фільтр стану aiogram: звичайні кнопки не спрацьовують посеред діалогу
+        if not route.any_state and await state.get_state() is not None:
+            return
+        if route.wants_state:
+            await route.handler(callback_query, *args, state=state)
+        else:
+            await route.handler(callback_query, *args)
+
+    def register(self, dp: Dispatcher):
+        async def route_callback(callback_query: types.CallbackQuery, state: FSMContext):
+            await self.dispatch(callback_query, state)
+
+        # middleware бачать лише route_callback — через ці поля вони знаходять справжні хендлери
+        route_callback.resolve_handler = self.handler_for
+        route_callback.routed_handlers = self.handlers
+        dp.register_callback_query_handler(route_callback, state="*")
+
+
+def effective_handler(handler, event):
+    """Для route_callback — хендлер маршруту цього callback-у, інакше сам handler."""
+    resolve = getattr(handler, "resolve_handler", None)
+    if resolve is not None:
+        return resolve(getattr(event, "data", None)) or handler
+    return handler
+
+
+router = CallbackRouter()
@@ -1,29 +1,124 @@
+import logging
 import os
 import sqlite3
-import re
+import threading
 from datetime import datetime
-from typing import List, Tuple, Optional
+from typing import Callable, List, Tuple, Optional
 
-# ====== Налаштування шляху до БД ======
-# Підтримуємо обидві змінні на всякий випадок:
-DB_PATH = os.getenv("PRODUCTS_DB_PATH") or os.getenv("DB_PATH") or "products.db"
+from log import fields, payload
+from metrics import timed_query
+from migrations import apply_schema
+from product_parser import ParseResult, normalize_name, parse_products
 
-# створимо папку, якщо це щось типу /data/products.db
-db_dir = os.path.dirname(DB_PATH)
-if db_dir and not os.path.exists(db_dir):
-    os.makedirs(db_dir, exist_ok=True)
+logger = logging.getLogger(__name__)
 
-print("📢 Використовується база:", os.path.abspath(DB_PATH))
+# ====== Налаштування шляху до БД ======
+# Шлях фіксується при першому зверненні до БД (або явно через configure()), а не при імпорті:
+# імпорт db.py нічого не створює й не логує, а змінні середовища можна задати пізніше.
+DB_PATH: Optional[str] = None
+# Архів — окремий файл поруч з БД: робоча БД лишається компактною, архів можна бекапити чи чистити окремо
+ARCHIVE_PATH: Optional[str] = None
+
+def configure(path: Optional[str] = None) -> str:
+    """Фіксує шлях до БД (за замовчуванням — PRODUCTS_DB_PATH або DB_PATH) і створює для неї теку."""
+    global DB_PATH, ARCHIVE_PATH
+    # підтримуємо обидві змінні на всякий випадок
+    path = path or os.getenv("PRODUCTS_DB_PATH") or os.getenv("DB_PATH") or "products.db"
+    if path == DB_PATH:
+        return path
+    if DB_PATH is not None:
+        close_db()  # спільне зʼєднання інакше лишиться на старому файлі
+
+    # створимо папку, якщо це щось типу /data/products.db
+    db_dir = os.path.dirname(path)
+    if db_dir and not os.path.exists(db_dir):
+        os.makedirs(db_dir, exist_ok=True)
+
+    DB_PATH = path
+    ARCHIVE_PATH = os.getenv("DB_ARCHIVE_PATH") or path + ".archive"
+    logger.info("📢 Використовується база", extra=fields(path=os.path.abspath(path)))
+    return path
+
+def db_path() -> str:
+    return DB_PATH or configure()
+
+# ====== Режим зберігання ======
+# WAL: читачі не блокують запис, а коміт — це дозапис у журнал без fsync основного файлу.
+# synchronous=NORMAL у WAL не втрачає цілісність, лише останні коміти при збої живлення.
+JOURNAL_MODE = (os.getenv("DB_JOURNAL_MODE") or "wal").lower()
+SYNCHRONOUS = (os.getenv("DB_SYNCHRONOUS") or "normal").lower()
+CACHE_MB = int(os.getenv("DB_CACHE_MB") or 16)
+MMAP_MB = int(os.getenv("DB_MMAP_MB") or 64)
+# 1 — одне зʼєднання на процес (потік) замість відкриття файлу на кожен запит
+SHARED_CONNECTION = (os.getenv("DB_SHARED_CONNECTION") or "1") != "0"
+
+class _SharedConnection(sqlite3.Connection):
+    # хелпери в кінці роблять conn.close() — для спільного зʼєднання це no-op
+    def close(self):
+        pass
+
+    def really_close(self):
+        super().close()
+
+_local = threading.local()
+
+def _open(factory=sqlite3.Connection) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path(), timeout=5, factory=factory)
+    conn.execute(f"PRAGMA synchronous = {SYNCHRONOUS}")
+    conn.execute(f"PRAGMA cache_size = {-CACHE_MB * 1024}")
+    conn.execute(f"PRAGMA mmap_size = {MMAP_MB * 1024 * 1024}")
+    return conn
 
 def _connect():
     # окремий хелпер щоб не повторюватись
-    return sqlite3.connect(DB_PATH)
+    if not SHARED_CONNECTION:
+        return _open()
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.pid != os.getpid():
+        conn = _local.conn = _open(_SharedConnection)
+        _local.pid = os.getpid()
+    elif conn.in_transaction:
+        # попередній виклик впав посеред запису — не тягнемо його транзакцію далі
+        conn.rollback()
+    return conn
+
+def close_db():
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        conn.really_close()
+        _local.conn = None
+
+# ====== Підписки на зміни ======
+# Слухачі (напр. expiry_index) викликаються синхронно одразу після коміту:
+#   insert   — [(product_id, user_id, name, expiry_date)]
+#   delete   — [(product_id,)]
+#   quantity — [(product_id, quantity)]
+#   reminder — [(user_id, timezone, reminder_time, enabled)]
+_listeners: List[Callable[[str, list], None]] = []
+
+def add_change_listener(callback: Callable[[str, list], None]):
+    _listeners.append(callback)
+
+def _notify(event: str, rows: list):
+    for callback in _listeners:
+        try:
+            callback(event, rows)
+        except Exception:
+            logger.exception("❌ Помилка слухача змін БД", extra=fields(event=event))
 
 # ====== Ініціалізація ======
 def init_db():
     conn = _connect()
     cursor = conn.cursor()
 
+    # режим журналу зберігається у файлі БД. auto_vacuum діє одразу лише для нової БД — до першого запису
+    # у файл, тож раніше за journal_mode (WAL уже пише заголовок); наявну переводить
+    # `python -m migrations --vacuum` з зупиненим ботом — VACUUM на старті блокував би воркери
+    cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    cursor.execute(f"PRAGMA journal_mode = {JOURNAL_MODE}")
+    if cursor.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        logger.warning("⚠️ auto_vacuum вимкнено — файл БД не зменшується; запусти python -m migrations --vacuum")
+
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS products (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -44,74 +139,83 @@ def init_db():
         )
     """)
 
+    # Нагадування: часовий пояс і бажаний час; next_reminder_at — unix-час наступного (NULL — ще не заплановано)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS reminders (
+            user_id INTEGER PRIMARY KEY,
+            timezone TEXT,
+            reminder_time TEXT,
+            enabled INTEGER NOT NULL DEFAULT 1,
+            next_reminder_at INTEGER
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_reminders_next ON reminders(next_reminder_at)")
+    cursor.execute("INSERT OR IGNORE INTO reminders (user_id) SELECT DISTINCT user_id FROM products")
+    # Черга сповіщень: рядок на (користувач, локальний день, вид) — повторне планування нічого не дублює
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            day TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            text TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            last_error TEXT,
+            created_at INTEGER NOT NULL,
+            next_attempt_at INTEGER NOT NULL,
+            sent_at INTEGER,
+            UNIQUE(user_id, day, kind)
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_outbox_status ON outbox(status, next_attempt_at)")
+
+    # Часткий покривний індекс для перебудови індексу термінів: лише продукти з датою
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_products_expiry
+        ON products(expiry_date, user_id, name) WHERE expiry_date IS NOT NULL
+    """)
+
     conn.commit()
+
+    # індекси, типізовані колонки тощо — версійними міграціями (backfill дозаповнюється у фоні)
+    apply_schema(conn)
     conn.close()
 
-def normalize_name(name: str) -> str:
-    name = name.lower()
-    synonyms = {
-        "помідор": "томат",
-        "помідори": "томат",
-        "огірки": "огірок",
-        "огурець": "огірок",
-        "яйце": "яйця"
-    }
-    return synonyms.get(name, name)
-
-# --- Допоміжні парсери ---
-
-DATE_RE = re.compile(r"\b(\d{2})\.(\d{2})\.(\d{4})\b")
-
-def _extract_optional_date(s: str) -> tuple[str, Optional[str]]:
-    m = DATE_RE.search(s)
-    if not m:
-        return s.strip(), None
-    date_str = m.group(0)
-    try:
-        datetime.strptime(date_str, "%d.%m.%Y")
-    except ValueError:
-        return s.strip(), None
-    s_wo = (s[:m.start()] + s[m.end():]).strip()
-    s_wo = re.sub(r"[\(\)\-–—]*\s*$", "", s_wo).strip()
-    s_wo = re.sub(r"\s{2,}", " ", s_wo)
-    return s_wo, date_str
-
-def _parse_one_item(raw: str) -> Optional[tuple[str, float, str, Optional[str]]]:
-    s = raw.strip()
-    if not s:
-        return None
-    s_no_date, date_str = _extract_optional_date(s)
-    parts = s_no_date.split()
-    if len(parts) < 3:
-        return None
-    unit = parts[-1]
-    qty_str = parts[-2]
-    name = " ".join(parts[:-2]).strip().lower()
-    if not name:
-        return None
-    try:
-        quantity = float(qty_str.replace(",", "."))
-    except ValueError:
-        return None
-    return (normalize_name(name), quantity, unit, date_str)
+def _iso_date(expiry: Optional[str]) -> Optional[str]:
+    # дд.мм.рррр → рррр-мм-дд для колонки expiry_on
+    return f"{expiry[6:10]}-{expiry[3:5]}-{expiry[0:2]}" if expiry else None
 
 # --- Продукти ---
 
-async def add_product_to_db(user_id: int, text: str):
-    items = [it for it in (x.strip() for x in text.split(",")) if it]
-    parsed = []
-    for raw in items:
-        p = _parse_one_item(raw)
-        if p:
-            parsed.append((user_id, *p))
+@timed_query
+async def add_product_to_db(user_id: int, text: str) -> ParseResult:
+    """Розбирає "назва кількість одиниця [дд.мм.рррр], ..." і додає; повертає розібране й відхилене."""
+    result = parse_products(text)
+    parsed = [(user_id, *item) for item in result.items]
 
-    print("🔍 Отримано продукти:", items)
-    print("✅ Parsed продукти:", parsed)
+    logger.debug("Розпізнано продукти", extra=payload(
+        user_id=user_id, added=len(parsed), rejected=len(result.errors), parsed=parsed, errors=result.errors,
+    ))
     if not parsed:
-        return
+        return result
 
     conn = _connect()
     cursor = conn.cursor()
+    inserted, updated = _merge_products(cursor, parsed)
+    # новий користувач потрапляє в розклад нагадувань (час порахує планувальник)
+    cursor.execute("INSERT OR IGNORE INTO reminders (user_id) VALUES (?)", (user_id,))
+    conn.commit()
+    conn.close()
+    if inserted:
+        _notify("insert", inserted)
+    if updated:
+        _notify("quantity", updated)
+    return result
+
+def _merge_products(cursor: sqlite3.Cursor, parsed: List[Tuple[int, str, float, str, Optional[str]]]):
+    """Той самий продукт (назва, одиниця, термін) додає кількість, інакше — новий рядок. Без коміту."""
+    inserted, updated = [], []
     for entry in parsed:
         uid, name, qty, unit, expiry = entry
 
@@ -131,15 +235,50 @@ async def add_product_to_db(user_id: int, text: str):
             existing_id, existing_qty = row
             new_qty = float(existing_qty) + float(qty)
             cursor.execute("UPDATE products SET quantity = ? WHERE id = ?", (new_qty, existing_id))
+            updated.append((existing_id, new_qty))
         else:
             cursor.execute("""
-                INSERT INTO products (user_id, name, quantity, unit, expiry_date)
-                VALUES (?, ?, ?, ?, ?)
-            """, (uid, name, qty, unit, expiry))
-
+                INSERT INTO products (user_id, name, quantity, unit, expiry_date, expiry_on)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (uid, name, qty, unit, expiry, _iso_date(expiry)))
+            inserted.append((cursor.lastrowid, uid, name, expiry))
+    return inserted, updated
+
+@timed_query
+async def upsert_products(user_id: int, items: List[Tuple[str, float, str, Optional[str]]]) -> Tuple[int, int]:
+    """
+    Пачка вже розібраних (назва, кількість, одиниця, термін) — однією транзакцією, як /add.
+    Для імпорту: викликач ділить документ на пачки, щоб транзакції лишались короткими.
+    Повертає (нових рядків, оновлених).
+    """
+    if not items:
+        return 0, 0
+    conn = _connect()
+    cursor = conn.cursor()
+    inserted, updated = _merge_products(cursor, [(user_id, *item) for item in items])
+    cursor.execute("INSERT OR IGNORE INTO reminders (user_id) VALUES (?)", (user_id,))
     conn.commit()
     conn.close()
+    if inserted:
+        _notify("insert", inserted)
+    if updated:
+        _notify("quantity", updated)
+    return len(inserted), len(updated)
+
+@timed_query
+async def get_products_page(user_id: int, after_id: int, limit: int) -> List[Tuple[int, str, float, str, Optional[str]]]:
+    """(id, назва, кількість, одиниця, термін) після after_id — для експорту сторінками за id."""
+    conn = _connect()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT id, name, quantity, unit, expiry_date FROM products
+        WHERE user_id = ? AND id > ? ORDER BY id LIMIT ?
+    """, (user_id, after_id, limit))
+    rows = cursor.fetchall()
+    conn.close()
+    return rows
 
+@timed_query
 async def get_all_products(user_id: int) -> List[str]:
     conn = _connect()
     cursor = conn.cursor()
@@ -155,6 +294,7 @@ async def get_all_products(user_id: int) -> List[str]:
             view.append(f"{name} ({quantity} {unit})")
     return view
 
+@timed_query
 async def get_all_products_with_expiry(user_id: int) -> List[Tuple[str, float, str, Optional[str]]]:
     conn = _connect()
     cursor = conn.cursor()
@@ -163,6 +303,7 @@ async def get_all_products_with_expiry(user_id: int) -> List[Tuple[str, float, s
     conn.close()
     return rows
 
+@timed_query
 async def get_all_products_grouped_by_user() -> dict:
     conn = _connect()
     cursor = conn.cursor()
@@ -175,6 +316,7 @@ async def get_all_products_grouped_by_user() -> dict:
         users.setdefault(user_id, []).append((name, expiry))
     return users
 
+@timed_query
 async def get_all_products_with_ids(user_id: int) -> List[Tuple[int, str, float, str, Optional[str]]]:
     conn = _connect()
     cursor = conn.cursor()
@@ -183,28 +325,38 @@ async def get_all_products_with_ids(user_id: int) -> List[Tuple[int, str, float,
     conn.close()
     return rows
 
+@timed_query
 async def delete_product_by_id(product_id: int):
     conn = _connect()
     cursor = conn.cursor()
     cursor.execute("DELETE FROM products WHERE id = ?", (product_id,))
     conn.commit()
     conn.close()
+    _notify("delete", [(product_id,)])
 
+@timed_query
 async def delete_product(user_id: int, name: str):
     name = normalize_name(name)
     conn = _connect()
     cursor = conn.cursor()
+    cursor.execute("SELECT id FROM products WHERE user_id = ? AND name = ?", (user_id, name))
+    deleted = cursor.fetchall()
     cursor.execute("DELETE FROM products WHERE user_id = ? AND name = ?", (user_id, name))
     conn.commit()
     conn.close()
+    if deleted:
+        _notify("delete", deleted)
 
+@timed_query
 async def update_product_quantity_by_id(product_id: int, new_quantity: float):
     conn = _connect()
     cursor = conn.cursor()
     cursor.execute("UPDATE products SET quantity = ? WHERE id = ?", (new_quantity, product_id))
     conn.commit()
     conn.close()
+    _notify("quantity", [(product_id, new_quantity)])
 
+@timed_query
 async def get_expiring_products(user_id: int, days_threshold: int = 2) -> List[str]:
     today = datetime.now()
     result = []
@@ -228,6 +380,7 @@ async def get_expiring_products(user_id: int, days_threshold: int = 2) -> List[s
 
     return result
 
+@timed_query
 async def get_fridge_view(user_id: int) -> str:
     products = await get_all_products(user_id)
     if not products:
@@ -236,25 +389,34 @@ async def get_fridge_view(user_id: int) -> str:
 
 # --- Профіль користувача ---
 
+_BODY_FIELDS = ("sex", "age", "height_cm", "weight_kg", "activity", "goal")
+
+@timed_query
 async def get_user_profile(user_id: int) -> dict:
     conn = _connect()
     cursor = conn.cursor()
-    cursor.execute("SELECT allergies, dislikes, status FROM profile WHERE user_id = ?", (user_id,))
+    cursor.execute(f"SELECT allergies, dislikes, status, {', '.join(_BODY_FIELDS)} FROM profile WHERE user_id = ?",
+                   (user_id,))
     row = cursor.fetchone()
     conn.close()
     if row:
-        return {
+        profile = {
             "allergies": row[0] or "",
             "dislikes": row[1] or "",
             "status": row[2] or ""
         }
+        profile.update(zip(_BODY_FIELDS, row[3:]))
+        return profile
     else:
-        return {
+        profile = {
             "allergies": "",
             "dislikes": "",
             "status": ""
         }
+        profile.update(dict.fromkeys(_BODY_FIELDS))
+        return profile
 
+@timed_query
 async def update_user_allergies(user_id: int, new_allergies: str):
     conn = _connect()
     cursor = conn.cursor()
@@ -276,6 +438,7 @@ async def update_user_allergies(user_id: int, new_allergies: str):
     conn.commit()
     conn.close()
 
+@timed_query
 async def update_user_dislikes(user_id: int, new_dislikes: str):
     conn = _connect()
     cursor = conn.cursor()
@@ -297,6 +460,7 @@ async def update_user_dislikes(user_id: int, new_dislikes: str):
     conn.commit()
     conn.close()
 
+@timed_query
 async def update_user_status(user_id: int, status: str):
     conn = _connect()
     cursor = conn.cursor()
@@ -307,6 +471,22 @@ async def update_user_status(user_id: int, status: str):
     conn.commit()
     conn.close()
 
+@timed_query
+async def update_user_body(user_id: int, **values):
+    """Параметри для денної норми БЖУ; None не перезаписує вже збережене."""
+    values = {k: v for k, v in values.items() if k in _BODY_FIELDS and v is not None}
+    if not values:
+        return
+    conn = _connect()
+    columns = ", ".join(values)
+    conn.execute(f"""
+        INSERT INTO profile (user_id, {columns}) VALUES (?, {", ".join("?" * len(values))})
+        ON CONFLICT(user_id) DO UPDATE SET {", ".join(f"{k}=excluded.{k}" for k in values)}
+    """, (user_id, *values.values()))
+    conn.commit()
+    conn.close()
+
+@timed_query
 async def clear_user_allergies(user_id: int):
     conn = _connect()
     cursor = conn.cursor()
@@ -314,9 +494,396 @@ async def clear_user_allergies(user_id: int):
     conn.commit()
     conn.close()
 
+@timed_query
 async def clear_user_dislikes(user_id: int):
     conn = _connect()
     cursor = conn.cursor()
     cursor.execute("UPDATE profile SET dislikes = NULL WHERE user_id = ?", (user_id,))
     conn.commit()
     conn.close()
+
+# --- Нагадування ---
+
+@timed_query
+async def get_reminder_settings(user_id: int) -> dict:
+    conn = _connect()
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT timezone, reminder_time, enabled, next_reminder_at FROM reminders WHERE user_id = ?", (user_id,)
+    )
+    row = cursor.fetchone()
+    conn.close()
+    if not row:
+        return {"timezone": None, "reminder_time": None, "enabled": True, "next_reminder_at": None}
+    return {"timezone": row[0], "reminder_time": row[1], "enabled": bool(row[2]), "next_reminder_at": row[3]}
+
+@timed_query
+async def update_reminder_settings(user_id: int, timezone: Optional[str], reminder_time: Optional[str],
+                                   enabled: bool, next_reminder_at: Optional[int]):
+    conn = _connect()
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT INTO reminders (user_id, timezone, reminder_time, enabled, next_reminder_at) VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(user_id) DO UPDATE SET timezone=excluded.timezone, reminder_time=excluded.reminder_time,
+            enabled=excluded.enabled, next_reminder_at=excluded.next_reminder_at
+    """, (user_id, timezone, reminder_time, int(enabled), next_reminder_at))
+    conn.commit()
+    conn.close()
+    _notify("reminder", [(user_id, timezone, reminder_time, enabled)])
+
+@timed_query
+async def get_due_reminders(now_ts: int, limit: int) -> List[Tuple[int, Optional[str], Optional[str], int]]:
+    """
+    (user_id, timezone, reminder_time, next_reminder_at) користувачів, чий час нагадування настав
+    (за індексом next_reminder_at, найстаріші першими).
+    """
+    conn = _connect()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT user_id, timezone, reminder_time, next_reminder_at FROM reminders
+        WHERE next_reminder_at <= ? AND enabled = 1
+        ORDER BY next_reminder_at LIMIT ?
+    """, (now_ts, limit))
+    rows = cursor.fetchall()
+    conn.close()
+    return rows
+
+@timed_query
+async def get_unscheduled_reminders(limit: int) -> List[Tuple[int, Optional[str], Optional[str]]]:
+    conn = _connect()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT user_id, timezone, reminder_time FROM reminders
+        WHERE next_reminder_at IS NULL AND enabled = 1 LIMIT ?
+    """, (limit,))
+    rows = cursor.fetchall()
+    conn.close()
+    return rows
+
+@timed_query
+async def set_next_reminders(schedule: List[Tuple[int, int]]):
+    """schedule — пари (user_id, next_reminder_at), одним комітом."""
+    conn = _connect()
+    cursor = conn.cursor()
+    cursor.executemany(
+        "UPDATE reminders SET next_reminder_at = ? WHERE user_id = ?", [(ts, uid) for uid, ts in schedule]
+    )
+    conn.commit()
+    conn.close()
+
+# --- Індекс термінів придатності ---
+
+@timed_query
+async def get_expiry_entries() -> List[Tuple[int, int, str, str]]:
+    """(product_id, user_id, name, expiry_date) усіх продуктів з датою — за частковим індексом idx_products_expiry."""
+    conn = _connect()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT id, user_id, name, expiry_date FROM products INDEXED BY idx_products_expiry
+        WHERE expiry_date IS NOT NULL
+    """)
+    rows = cursor.fetchall()
+    conn.close()
+    return rows
+
+@timed_query
+async def get_all_reminder_settings() -> List[Tuple[int, Optional[str], Optional[str], int]]:
+    conn = _connect()
+    cursor = conn.cursor()
+    cursor.execute("SELECT user_id, timezone, reminder_time, enabled FROM reminders")
+    rows = cursor.fetchall()
+    conn.close()
+    return rows
+
+# --- Черга сповіщень (outbox) ---
+
+@timed_query
+async def enqueue_notifications(rows: List[Tuple[int, str, str, str]], reschedule: List[Tuple[int, int]] = ()) -> int:
+    """
+    rows — (user_id, day, kind, text); вже наявні (user_id, day, kind) пропускаються.
+    reschedule — пари (user_id, next_reminder_at), пишуться в тій самій транзакції.
+    Повертає кількість нових рядків.
+    """
+    now = int(datetime.now().timestamp())
+    conn = _connect()
+    cursor = conn.cursor()
+    before = conn.total_changes
+    cursor.executemany("""
+        INSERT OR IGNORE INTO outbox (user_id, day, kind, text, created_at, next_attempt_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, [(uid, day, kind, text, now, now) for uid, day, kind, text in rows])
+    added = conn.total_changes - before
+    if reschedule:
+        cursor.executemany(
+            "UPDATE reminders SET next_reminder_at = ? WHERE user_id = ?", [(ts, uid) for uid, ts in reschedule]
+        )
+    conn.commit()
+    conn.close()
+    return added
+
+@timed_query
+async def claim_outbox(now_ts: int, limit: int, lease_seconds: int, token: str) -> List[Tuple[int, int, str, int]]:
+    """
+    Забирає до `limit` рядків, готових до відправки (найстаріші першими), у статус 'sending'
+    на lease_seconds під міткою `token` і повертає їх (id, user_id, text, attempts). Забраний рядок
+    інший процес не візьме, доки не мине оренда, — тож старий і новий лідер після передачі не шлють
+    його обидва. 'sending' із простроченою орендою (процес упав посеред доставки) забирається знову.
+    """
+    conn = _connect()
+    cursor = conn.cursor()
+    # вибірка й позначка — в одній транзакції під блокуванням запису
+    cursor.execute("BEGIN IMMEDIATE")
+    cursor.execute("""
+        SELECT id, user_id, text, attempts FROM outbox
+        WHERE status IN ('pending', 'sending') AND next_attempt_at <= ?
+        ORDER BY next_attempt_at, id LIMIT ?
+    """, (now_ts, limit))
+    rows = cursor.fetchall()
+    cursor.executemany(
+        "UPDATE outbox SET status = 'sending', claim_token = ?, next_attempt_at = ? WHERE id = ?",
+        [(token, now_ts + lease_seconds, row[0]) for row in rows],
+    )
+    conn.commit()
+    conn.close()
+    return rows
+
+@timed_query
+async def mark_outbox_sent(outbox_id: int, token: str) -> bool:
+    """False — оренда вже не наша (минула, рядок забрав інший процес), нічого не змінено."""
+    conn = _connect()
+    cursor = conn.cursor()
+    cursor.execute(
+        "UPDATE outbox SET status = 'sent', attempts = attempts + 1, sent_at = ?, last_error = NULL, claim_token = NULL "
+        "WHERE id = ? AND status = 'sending' AND claim_token = ?",
+        (int(datetime.now().timestamp()), outbox_id, token),
+    )
+    updated = cursor.rowcount > 0
+    conn.commit()
+    conn.close()
+    return updated
+
+@timed_query
+async def mark_outbox_failed(outbox_id: int, token: str, error: str, retry_at: Optional[int],
+                             count_attempt: bool = True) -> bool:
+    """
+    retry_at=None — остаточна помилка (бот заблокований тощо), інакше повтор після retry_at.
+    count_attempt=False — спроба не рахується (Telegram попросив зачекати, RetryAfter).
+    False — оренда вже не наша, нічого не змінено.
+    """
+    conn = _connect()
+    cursor = conn.cursor()
+    cursor.execute("""
+        UPDATE outbox SET attempts = attempts + ?, last_error = ?, claim_token = NULL,
+            status = CASE WHEN ? IS NULL THEN 'failed' ELSE 'pending' END,
+            next_attempt_at = COALESCE(?, next_attempt_at)
+        WHERE id = ? AND status = 'sending' AND claim_token = ?
+    """, (int(count_attempt), error[:500], retry_at, retry_at, outbox_id, token))
+    updated = cursor.rowcount > 0
+    conn.commit()
+    conn.close()
+    return updated
+
+@timed_query
+async def get_outbox_stats() -> Tuple[dict, Optional[int]]:
+    """({status: кількість}, created_at найстарішого недоставленого — pending або sending)."""
+    conn = _connect()
+    cursor = conn.cursor()
+    cursor.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status")
+    counts = dict(cursor.fetchall())
+    cursor.execute("SELECT MIN(created_at) FROM outbox WHERE status IN ('pending', 'sending')")
+    oldest = cursor.fetchone()[0]
+    conn.close()
+    return counts, oldest
+
+@timed_query
+async def purge_outbox(before_ts: int) -> int:
+    """Видаляє доставлені й остаточно невдалі рядки, старші за before_ts."""
+    conn = _connect()
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM outbox WHERE status IN ('sent', 'failed') AND created_at < ?", (before_ts,))
+    deleted = cursor.rowcount
+    conn.commit()
+    conn.close()
+    return deleted
+
+# --- Рецепти ---
+
+@timed_query
+async def save_recipe(user_id: int, meal_type: str, title: str, body: str,
+                      ingredients: List[Tuple[str, str, float]], keep: int) -> int:
+    """
+    Зберігає згенерований рецепт з інгредієнтами (назва, одиниця, кількість); з неулюблених
+    лишає останні `keep` рецептів користувача. Повертає id рецепта.
+    """
+    conn = _connect()
+    cursor = conn.cursor()
+    cursor.execute(
+        "INSERT INTO recipes (user_id, meal_type, title, body, created_at) VALUES (?, ?, ?, ?, ?)",
+        (user_id, meal_type, title, body, int(datetime.now().timestamp())),
+    )
+    recipe_id = cursor.lastrowid
+    # різні рядки рецепта можуть звестися до однієї назви («яйце», «яйця курячі») — кількості сумуються
+    cursor.executemany("""
+        INSERT INTO recipe_ingredients (recipe_id, name, unit, quantity) VALUES (?, ?, ?, ?)
+        ON CONFLICT(recipe_id, name, unit) DO UPDATE SET quantity = quantity + excluded.quantity
+    """, [(recipe_id, name, unit, quantity) for name, unit, quantity in ingredients])
+    cursor.execute("""
+        DELETE FROM recipes WHERE user_id = ? AND favourite = 0 AND id < (
+            SELECT MIN(id) FROM (
+                SELECT id FROM recipes WHERE user_id = ? AND favourite = 0 ORDER BY id DESC LIMIT ?
+            )
+        )
+    """, (user_id, user_id, keep))
+    conn.commit()
+    conn.close()
+    return recipe_id
+
+@timed_query
+async def set_recipe_favourite(user_id: int, recipe_id: int, favourite: bool) -> bool:
+    """False — рецепта вже немає (чужий або прибраний як старий)."""
+    conn = _connect()
+    cursor = conn.cursor()
+    cursor.execute("UPDATE recipes SET favourite = ? WHERE id = ? AND user_id = ?",
+                   (int(favourite), recipe_id, user_id))
+    conn.commit()
+    conn.close()
+    return cursor.rowcount > 0
+
+@timed_query
+async def get_recipe(user_id: int, recipe_id: int) -> Optional[dict]:
+    conn = _connect()
+    cursor = conn.cursor()
+    cursor.execute("SELECT meal_type, title, body, favourite FROM recipes WHERE id = ? AND user_id = ?",
+                   (recipe_id, user_id))
+    row = cursor.fetchone()
+    if row is None:
+        conn.close()
+        return None
+    cursor.execute("SELECT name, unit, quantity FROM recipe_ingredients WHERE recipe_id = ?", (recipe_id,))
+    ingredients = {(name, unit): quantity for name, unit, quantity in cursor.fetchall()}
+    conn.close()
+    return {"id": recipe_id, "meal_type": row[0], "title": row[1], "body": row[2],
+            "favourite": bool(row[3]), "ingredients": ingredients}
+
+@timed_query
+async def search_recipes(user_id: int, match: str, limit: int) -> List[Tuple[int, str, bool]]:
+    """(id, назва, улюблений) рецептів користувача за запитом FTS5 MATCH; назва важить більше за кроки."""
+    conn = _connect()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT r.id, r.title, r.favourite FROM recipes_fts
+        JOIN recipes r ON r.id = recipes_fts.rowid
+        WHERE recipes_fts MATCH ? AND r.user_id = ?
+        ORDER BY bm25(recipes_fts, 10.0, 1.0)
+        LIMIT ?
+    """, (match, user_id, limit))
+    rows = [(rid, title, bool(fav)) for rid, title, fav in cursor.fetchall()]
+    conn.close()
+    return rows
+
+@timed_query
+async def get_favourites_coverage(user_id: int, today: str, limit: int) -> List[Tuple[int, str, int, int]]:
+    """
+    (id, назва, інгредієнтів, є в холодильнику) для улюблених рецептів — найповніше покриті першими.
+    «Є» — непрострочених партій (термін >= today, рррр-мм-дд) цієї назви й одиниці вистачає на рецепт.
+    Усе через індекси: idx_recipes_user, первинний ключ recipe_ingredients, idx_products_user.
+    """
+    conn = _connect()
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        WITH fridge AS (
+            SELECT name, unit, SUM(quantity) AS quantity FROM products
+            WHERE user_id = ? AND (expiry_date IS NULL OR COALESCE(expiry_on, {_ISO_EXPIRY}) >= ?)
+            GROUP BY name, unit
+        )
+        SELECT r.id, r.title, COUNT(*) AS total,
+               SUM(CASE WHEN f.quantity >= ri.quantity THEN 1 ELSE 0 END) AS covered
+        FROM recipes r
+        JOIN recipe_ingredients ri ON ri.recipe_id = r.id
+        LEFT JOIN fridge f ON f.name = ri.name AND f.unit = ri.unit
+        WHERE r.user_id = ? AND r.favourite = 1
+        GROUP BY r.id
+        ORDER BY CAST(covered AS REAL) / total DESC, covered DESC, r.id DESC
+        LIMIT ?
+    """, (user_id, today, user_id, limit))
+    rows = cursor.fetchall()
+    conn.close()
+    return rows
+
+# --- Обслуговування ---
+
+def _attach_archive(conn: sqlite3.Connection):
+    if any(row[1] == "archive" for row in conn.execute("PRAGMA database_list")):
+        return
+    conn.execute("ATTACH DATABASE ? AS archive", (ARCHIVE_PATH,))
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS archive.products_archive (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER,
+            name TEXT,
+            quantity REAL,
+            unit TEXT,
+            expiry_date TEXT NULL,
+            reason TEXT NOT NULL,
+            archived_at INTEGER NOT NULL
+        )
+    """)
+
+# дд.мм.рррр → рррр-мм-дд для рядків, які backfill міграції v2 ще не заповнив
+_ISO_EXPIRY = "substr(expiry_date, 7, 4) || '-' || substr(expiry_date, 4, 2) || '-' || substr(expiry_date, 1, 2)"
+
+@timed_query
+async def archive_products_batch(after_id: int, batch: int, expired_before: str) -> Tuple[int, int]:
+    """
+    Переглядає до `batch` рядків products з id > after_id і переносить в archive.products_archive ті, що
+    прострочені раніше `expired_before` (рррр-мм-дд) або мають кількість <= 0.
+    Повертає (останній переглянутий id або 0, якщо таблицю пройдено; скільки перенесено).
+    """
+    conn = _connect()
+    cursor = conn.cursor()
+    cursor.execute("SELECT MAX(id) FROM (SELECT id FROM products WHERE id > ? ORDER BY id LIMIT ?)", (after_id, batch))
+    last_id = cursor.fetchone()[0]
+    if last_id is None:
+        conn.close()
+        return 0, 0
+    cursor.execute(f"""
+        SELECT id, CASE WHEN quantity <= 0 THEN 'empty' ELSE 'expired' END FROM products
+        WHERE id > ? AND id <= ? AND (quantity <= 0 OR COALESCE(expiry_on, {_ISO_EXPIRY}) < ?)
+    """, (after_id, last_id, expired_before))
+    stale = cursor.fetchall()
+    if stale:
+        _attach_archive(conn)
+        now = int(datetime.now().timestamp())
+        cursor.executemany("""
+            INSERT OR REPLACE INTO archive.products_archive (id, user_id, name, quantity, unit, expiry_date, reason, archived_at)
+            SELECT id, user_id, name, quantity, unit, expiry_date, ?, ? FROM products WHERE id = ?
+        """, [(reason, now, pid) for pid, reason in stale])
+        cursor.executemany("DELETE FROM products WHERE id = ?", [(pid,) for pid, _ in stale])
+    conn.commit()
+    conn.close()
+    if stale:
+        _notify("delete", [(pid,) for pid, _ in stale])
+    return last_id, len(stale)
+
+@timed_query
+async def optimize_db(vacuum_pages: int = 0):
+    """Оновлює статистику планувальника, повертає вільні сторінки ОС і скидає WAL у файл."""
+    conn = _connect()
+    conn.execute("PRAGMA analysis_limit = 1000")  # наближена статистика — ANALYZE за мілісекунди
+    conn.execute("ANALYZE")
+    conn.commit()
+    # pragma звільняє по сторінці на крок, а execute() робить лише один крок — executescript проганяє до кінця
+    conn.executescript(f"PRAGMA incremental_vacuum({vacuum_pages});" if vacuum_pages else "PRAGMA incremental_vacuum;")
+    if JOURNAL_MODE == "wal":
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+
+def db_size_bytes() -> dict:
+    sizes = {}
+    main = db_path()
+    for path, name in ((main, "main"), (main + "-wal", "wal"), (ARCHIVE_PATH, "archive")):
+        try:
+            sizes[name] = os.path.getsize(path)
+        except OSError:
+            pass
+    return sizes
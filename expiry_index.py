@@ -0,0 +1,233 @@
+import asyncio
+import functools
+import heapq
+import itertools
+import logging
+import os
+import time
+import typing
+from datetime import date, datetime, timedelta
+
+import metrics
+import outbox
+from db import add_change_listener, get_all_reminder_settings, get_expiry_entries
+from log import fields
+from reminders import DEFAULT_TIME, local_moment, spread_offset
+
+logger = logging.getLogger(__name__)
+
+# Нагадування про терміни без щоденного сканування таблиці:
+# у памʼяті тримається min-heap подій (коли надіслати, продукт, за скільки днів),
+# збудований при старті з індексованого запиту й оновлюваний слухачем змін db.py.
+# Фонова задача спить рівно до найближчої події й кладе її в outbox; знайти, що настало, — O(log n)
+# на подію, незалежно від розміру таблиці. Видалені продукти з купи не виймаються —
+# застарілі записи відкидаються при вийманні (lazy deletion).
+
+# За скільки днів до терміну нагадувати, через кому (0 — у сам день)
+LEAD_DAYS = sorted({int(x) for x in (os.getenv("EXPIRY_LEAD_DAYS") or "2,0").split(",") if x.strip()}, reverse=True)
+# Після рестарту події за останні N годин плануються знову: outbox відкине вже заплановані
+CATCHUP_SECONDS = float(os.getenv("EXPIRY_CATCHUP_HOURS") or 12) * 3600
+
+metrics.Gauge("bot_expiry_index_events", "Подій у купі індексу термінів", lambda: {(): len(index)})
+
+Event = typing.Tuple[int, int, int, int, int]  # (due_ts, seq, product_id, lead_days, user_gen)
+
+
+# Дати й моменти сильно повторюються між продуктами — кешуємо, щоб перебудова не парсила одне й те саме
+@functools.lru_cache(maxsize=8192)
+def _parse_expiry(expiry: str) -> typing.Optional[date]:
+    try:
+        return datetime.strptime(expiry, "%d.%m.%Y").date()
+    except ValueError:
+        return None
+
+
+@functools.lru_cache(maxsize=65536)
+def _day_start(tz: typing.Optional[str], at: typing.Optional[str], day: date) -> float:
+    return local_moment(tz, at, day).timestamp()
+
+
+def _lead_text(lead: int) -> str:
+    if lead == 0:
+        return "сьогодні"
+    if lead == 1:
+        return "завтра"
+    return f"через {lead} дн."
+
+
+def format_notice(lead: int, items: typing.List[str]) -> str:
+    if lead == 0:
+        return (
+            "🔔 Продукти, у яких сьогодні спливає термін придатності:\n"
+            + "\n".join(items)
+            + "\n\nСпробуй приготувати щось із них або з’їсти сьогодні 🧑‍🍳🥗"
+        )
+    return (
+        f"⏳ Продукти, у яких {_lead_text(lead)} спливає термін придатності:\n"
+        + "\n".join(items)
+        + "\n\nЗаплануй страву з них, поки вони свіжі 🧑‍🍳"
+    )
+
+
+class ExpiryIndex:
+    def __init__(self, lead_days: typing.Sequence[int] = (2, 0), shard: typing.Optional[typing.Tuple[int, int]] = None):
+        self.lead_days = tuple(lead_days)
+        self.shard = shard  # (index, workers): воркер індексує лише своїх користувачів
+        self._heap: typing.List[Event] = []
+        self._seq = itertools.count()
+        self._products: typing.Dict[int, typing.Tuple[int, str, str]] = {}  # id → (user_id, name, expiry_date)
+        self._by_user: typing.Dict[int, typing.Set[int]] = {}
+        self._users: typing.Dict[int, typing.Tuple[typing.Optional[str], typing.Optional[str], bool]] = {}
+        self._gen: typing.Dict[int, int] = {}  # зміна налаштувань користувача знецінює його старі події
+        self._wakeup: typing.Optional[asyncio.Event] = None
+        self._task: typing.Optional[asyncio.Task] = None
+
+    def __len__(self):
+        return len(self._heap)
+
+    def stats(self) -> dict:
+        return {"events": len(self._heap), "products": len(self._products), "users": len(self._users)}
+
+    def _owns(self, user_id: int) -> bool:
+        return self.shard is None or user_id % self.shard[1] == self.shard[0]
+
+    # ====== Побудова й оновлення ======
+    async def rebuild(self):
+        started = time.monotonic()
+        self._heap.clear()
+        self._products.clear()
+        self._by_user.clear()
+        self._users = {
+            uid: (tz, at, bool(enabled)) for uid, tz, at, enabled in await get_all_reminder_settings() if self._owns(uid)
+        }
+        since = time.time() - CATCHUP_SECONDS
+        for product_id, user_id, name, expiry in await get_expiry_entries():
+            if self._owns(user_id):
+                self._add(product_id, user_id, name, expiry, since, wake=False)
+        heapq.heapify(self._heap)
+        logger.info("📇 Індекс термінів побудовано", extra=fields(
+            products=len(self._products), events=len(self._heap), ms=round((time.monotonic() - started) * 1000),
+        ))
+
+    def _events_for(self, product_id: int, user_id: int, expiry: str, since: float) -> typing.List[Event]:
+        tz, at, enabled = self._users.get(user_id, (None, DEFAULT_TIME, True))
+        if not enabled:
+            return []
+        day = _parse_expiry(expiry)
+        if day is None:
+            return []
+        gen = self._gen.get(user_id, 0)
+        offset = spread_offset(user_id)
+        events = []
+        for lead in self.lead_days:
+            due = _day_start(tz, at, day - timedelta(days=lead)) + offset
+            if due > since:  # старіші моменти не надолужуємо
+                events.append((int(due), next(self._seq), product_id, lead, gen))
+        return events
+
+    def _add(self, product_id: int, user_id: int, name: str, expiry: str, since: float, wake: bool = True):
+        self._products[product_id] = (user_id, name, expiry)
+        self._by_user.setdefault(user_id, set()).add(product_id)
+        events = self._events_for(product_id, user_id, expiry, since)
+        if not wake:
+            self._heap.extend(events)
+            return
+        for event in events:
+            heapq.heappush(self._heap, event)
+        # нова подія стала найближчою — задача має прокинутись раніше
+        if events and self._wakeup is not None and self._heap[0][0] == min(e[0] for e in events):
+            self._wakeup.set()
+
+    def _remove(self, product_id: int):
+        entry = self._products.pop(product_id, None)
+        if entry is not None:
+            self._by_user.get(entry[0], set()).discard(product_id)
+
+    def _reschedule_user(self, user_id: int, tz, at, enabled: bool):
+        self._users[user_id] = (tz, at, enabled)
+        self._gen[user_id] = self._gen.get(user_id, 0) + 1
+        now = time.time()
+        for product_id in list(self._by_user.get(user_id, ())):
+            _, name, expiry = self._products[product_id]
+            self._add(product_id, user_id, name, expiry, now)
+
+    def on_change(self, event: str, rows: list):
+        """Слухач db.py: оновлює купу інкрементно, без запитів до БД."""
+        if event == "insert":
+            now = time.time()
+            for product_id, user_id, name, expiry in rows:
+                if expiry and self._owns(user_id):
+                    self._add(product_id, user_id, name, expiry, now)
+        elif event == "delete":
+            for (product_id,) in rows:
+                self._remove(product_id)
+        elif event == "quantity":
+            for product_id, quantity in rows:
+                if quantity <= 0:
+                    self._remove(product_id)
+        elif event == "reminder":
+            for user_id, tz, at, enabled in rows:
+                if self._owns(user_id):
+                    self._reschedule_user(user_id, tz, at, bool(enabled))
+
+    # ====== Виймання подій ======
+    def pop_due(self, now: float) -> typing.List[typing.Tuple[int, str, str, str]]:
+        """Виймає всі події з due_ts <= now; повертає рядки для outbox (user_id, day, kind, text)."""
+        due: typing.Dict[typing.Tuple[int, int, date], typing.List[str]] = {}
+        while self._heap and self._heap[0][0] <= now:
+            _, _, product_id, lead, gen = heapq.heappop(self._heap)
+            entry = self._products.get(product_id)
+            if entry is None or gen != self._gen.get(entry[0], 0):
+                continue  # продукт видалено або налаштування змінились
+            user_id, name, expiry = entry
+            day = _parse_expiry(expiry) - timedelta(days=lead)
+            due.setdefault((user_id, lead, day), []).append(f"{name} (до {expiry})")
+        return [
+            (user_id, day.isoformat(), f"expiry_{lead}d", format_notice(lead, items))
+            for (user_id, lead, day), items in due.items()
+        ]
+
+    def next_due(self) -> typing.Optional[int]:
+        return self._heap[0][0] if self._heap else None
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            next_due = self.next_due()
+            timeout = None if next_due is None else max(0.0, next_due - time.time())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+                continue  # зʼявилась раніша подія — перерахувати сон
+            except asyncio.TimeoutError:
+                pass
+
+            rows = self.pop_due(time.time())
+            try:
+                await outbox.enqueue(rows)
+            except Exception:
+                # події вже вийняті; після рестарту їх поверне перебудова з надолуженням
+                logger.exception("❌ Не вдалося запланувати нагадування про терміни", extra=fields(notices=len(rows)))
+
+    # ====== Життєвий цикл ======
+    async def start(self):
+        if self._task is not None:
+            return
+        self._wakeup = asyncio.Event()
+        add_change_listener(self.on_change)
+        await self.rebuild()
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+index = ExpiryIndex(LEAD_DAYS)
+
+
+async def setup(shard: typing.Optional[typing.Tuple[int, int]] = None):
+    """Будує індекс і запускає задачу, що кладе нагадування в outbox; shard=(index, workers) для воркерів."""
+    index.shard = shard
+    await index.start()
@@ -0,0 +1,291 @@
+import asyncio
+import codecs
+import csv
+import io
+import itertools
+import json
+import logging
+import math
+import os
+import time
+import typing
+from datetime import datetime
+
+from db import get_products_page, upsert_products
+from log import fields
+from product_parser import normalize_name
+
+logger = logging.getLogger(__name__)
+
+# Імпорт і експорт холодильника файлами CSV / JSON.
+# Документ читається потоково (рядок за рядком або обʼєкт за обʼєктом), тож памʼять
+# обмежена розміром пачки, а не файлу. Кожна пачка валідується й пишеться однією
+# короткою транзакцією (upsert_products) — з тією ж логікою злиття, що й /add.
+# Помилкові рядки не зупиняють імпорт: вони збираються у звіт з номером рядка.
+
+MAX_BYTES = int(float(os.getenv("IMPORT_MAX_MB") or 20) * 1024 * 1024)  # Bot API віддає файли до 20 МБ
+BATCH_SIZE = int(os.getenv("IMPORT_BATCH") or 500)
+MAX_ROWS = int(os.getenv("IMPORT_MAX_ROWS") or 50000)
+ERRORS_SHOWN = 10
+MAX_NAME_LEN = 100
+
+COLUMNS = ("name", "quantity", "unit", "expiry_date")
+# заголовки, які розуміємо (англійські й українські)
+_HEADER_ALIASES = {
+    "name": "name", "назва": "name", "продукт": "name",
+    "quantity": "quantity", "qty": "quantity", "кількість": "quantity",
+    "unit": "unit", "одиниця": "unit",
+    "expiry_date": "expiry_date", "expiry": "expiry_date", "expiry_on": "expiry_date", "термін": "expiry_date",
+}
+
+Item = typing.Tuple[str, float, str, typing.Optional[str]]
+
+
+class ImportReport(typing.NamedTuple):
+    rows: int
+    added: int
+    updated: int
+    errors: typing.List[typing.Tuple[int, str]]  # перші ERRORS_SHOWN: (номер рядка, причина)
+    error_count: int
+    truncated: bool  # документ довший за MAX_ROWS
+
+
+def detect_format(file_name: typing.Optional[str], head: bytes) -> str:
+    """'json' або 'csv' — за розширенням, інакше за першим значущим символом."""
+    name = (file_name or "").lower()
+    if name.endswith((".json", ".jsonl", ".ndjson")):
+        return "json"
+    if name.endswith((".csv", ".tsv", ".txt")):
+        return "csv"
+    return "json" if head.lstrip(codecs.BOM_UTF8 + b" \t\r\n")[:1] in (b"[", b"{") else "csv"
+
+
+# ====== Валідація ======
+def _parse_date(value: typing.Any) -> typing.Optional[str]:
+    value = str(value or "").strip()
+    if not value:
+        return None
+    for fmt in ("%d.%m.%Y", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(value, fmt).strftime("%d.%m.%Y")
+        except ValueError:
+            pass
+    raise ValueError(f"термін «{value}» — очікую дд.мм.рррр або рррр-мм-дд")
+
+
+def normalize_record(record: typing.Dict[str, typing.Any]) -> Item:
+    """Словник з name/quantity/unit/expiry_date → (назва, кількість, одиниця, термін дд.мм.рррр); ValueError з причиною."""
+    name = " ".join(str(record.get("name") or "").split()).lower()
+    if not name:
+        raise ValueError("порожня назва")
+    if len(name) > MAX_NAME_LEN:
+        raise ValueError(f"назва довша за {MAX_NAME_LEN} символів")
+    raw_qty = record.get("quantity")
+    try:
+        quantity = float(str(raw_qty).replace(",", ".")) if not isinstance(raw_qty, (int, float)) else float(raw_qty)
+    except ValueError:
+        raise ValueError(f"кількість «{raw_qty}» — не число") from None
+    if not math.isfinite(quantity) or quantity <= 0:
+        raise ValueError(f"кількість «{raw_qty}» має бути більшою за 0")
+    unit = str(record.get("unit") or "").strip()
+    if not unit or " " in unit:
+        raise ValueError("одиниця має бути одним словом (г, кг, шт, мл…)")
+    return normalize_name(name), quantity, unit, _parse_date(record.get("expiry_date"))
+
+
+# ====== Потокове читання ======
+def _iter_csv(stream: typing.BinaryIO) -> typing.Iterator[typing.Tuple[int, typing.Any]]:
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", errors="replace", newline="")
+    first = text.readline()
+    # роздільник — найчастіший з ; , таб у першому рядку (Excel з українською локаллю пише ;)
+    delimiter = max(";,\t", key=first.count) if first.strip() else ","
+    reader = csv.reader(itertools.chain([first], text), delimiter=delimiter)
+    columns = COLUMNS
+    for row in reader:
+        line = reader.line_num
+        if not any(cell.strip() for cell in row):
+            continue
+        if line == 1:
+            header = [_HEADER_ALIASES.get(cell.strip().lower()) for cell in row]
+            if "name" in header:
+                columns = tuple(header)
+                continue
+        yield line, {col: value for col, value in zip(columns, row) if col}
+    text.detach()
+
+
+def _iter_json(stream: typing.BinaryIO, chunk_size: int = 64 * 1024) -> typing.Iterator[typing.Tuple[int, typing.Any]]:
+    """
+    JSON-масив обʼєктів або JSON Lines — без завантаження всього документа:
+    буфер дочитується шматками, а обʼєкти виймаються raw_decode по одному.
+    Номер «рядка» — порядковий номер обʼєкта.
+    """
+    decoder = json.JSONDecoder()
+    reader = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    buffer, pos, eof, index = "", 0, False, 0
+    in_array = None
+
+    def fill() -> bool:
+        nonlocal buffer, pos, eof
+        if eof:
+            return False
+        chunk = stream.read(chunk_size)
+        eof = not chunk
+        buffer = buffer[pos:] + reader.decode(chunk, final=eof)
+        pos = 0
+        return True
+
+    while True:
+        # пропускаємо пробіли й роздільники між обʼєктами
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos < len(buffer) or not fill():
+                break
+        if pos >= len(buffer):
+            return
+        if in_array is None:
+            in_array = buffer[pos] == "["
+            if in_array:
+                pos += 1
+                continue
+        if in_array and buffer[pos] == "]":
+            return
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+                # число чи літерал на межі шматка могли обірватись — дочитуємо, поки не буде запасу
+                if end == len(buffer) and not eof and fill():
+                    continue
+                break
+            except json.JSONDecodeError as e:
+                if not fill():
+                    raise ValueError(f"некоректний JSON після обʼєкта №{index}: {e.msg}") from None
+        pos = end
+        index += 1
+        yield index, value
+
+
+def _as_record(value: typing.Any) -> typing.Dict[str, typing.Any]:
+    if isinstance(value, dict):
+        return {_HEADER_ALIASES.get(str(k).lower(), k): v for k, v in value.items()}
+    if isinstance(value, list):
+        return dict(zip(COLUMNS, value))
+    raise ValueError("очікую обʼєкт {name, quantity, unit, expiry_date}")
+
+
+def iter_records(stream: typing.BinaryIO, fmt: str) -> typing.Iterator[typing.Tuple[int, typing.Any]]:
+    """(номер рядка, сирий запис) з документа."""
+    return _iter_json(stream) if fmt == "json" else _iter_csv(stream)
+
+
+# ====== Імпорт ======
+async def import_stream(
+    user_id: int,
+    stream: typing.BinaryIO,
+    fmt: str,
+    on_progress: typing.Optional[typing.Callable[[int, int], typing.Awaitable[None]]] = None,
+    batch_size: int = BATCH_SIZE,
+) -> ImportReport:
+    """
+    Читає документ, валідує записи й пише пачками по batch_size.
+    on_progress(оброблено рядків, записано) викликається після кожної пачки.
+    """
+    started = time.monotonic()
+    rows = added = updated = error_count = 0
+    errors: typing.List[typing.Tuple[int, str]] = []
+    batch: typing.List[Item] = []
+    truncated = False
+
+    def fail(line: int, reason: str):
+        nonlocal error_count
+        error_count += 1
+        if len(errors) < ERRORS_SHOWN:
+            errors.append((line, reason))
+
+    async def flush():
+        nonlocal added, updated
+        a, u = await upsert_products(user_id, batch)
+        added, updated = added + a, updated + u
+        batch.clear()
+        if on_progress is not None:
+            await on_progress(rows, added + updated)
+        await asyncio.sleep(0)  # віддати цикл іншим апдейтам між пачками
+
+    records = iter_records(stream, fmt)
+    while True:
+        try:
+            line, value = next(records)
+        except StopIteration:
+            break
+        except ValueError as e:
+            # зламаний JSON — далі читати нема звідки, але вже записане лишається
+            fail(rows + 1, str(e))
+            break
+        if rows >= MAX_ROWS:
+            truncated = True
+            break
+        rows += 1
+        try:
+            batch.append(normalize_record(_as_record(value)))
+        except ValueError as e:
+            fail(line, str(e))
+        if len(batch) >= batch_size:
+            await flush()
+    if batch or on_progress is not None:
+        await flush()
+
+    logger.info("📥 Імпорт холодильника", extra=fields(
+        user_id=user_id, format=fmt, rows=rows, added=added, updated=updated, errors=error_count,
+        truncated=truncated, ms=round((time.monotonic() - started) * 1000),
+    ))
+    return ImportReport(rows, added, updated, errors, error_count, truncated)
+
+
+def format_report(report: ImportReport) -> str:
+    text = (
+        f"✅ Імпорт завершено: {report.rows} рядків, "
+        f"додано {report.added}, оновлено кількість {report.updated}."
+    )
+    if report.truncated:
+        text += f"\n⚠️ Оброблено лише перші {MAX_ROWS} рядків."
+    if report.error_count:
+        text += f"\n\n❗️ Пропущено {report.error_count} рядків:\n" + "\n".join(
+            f"• рядок {line}: {reason}" for line, reason in report.errors
+        )
+        if report.error_count > len(report.errors):
+            text += f"\n…і ще {report.error_count - len(report.errors)}"
+    return text
+
+
+# ====== Експорт ======
+def _quantity(value: float) -> typing.Union[int, float]:
+    return int(value) if float(value).is_integer() else float(value)
+
+
+async def export_stream(user_id: int, out: typing.BinaryIO, fmt: str, page: int = 1000) -> int:
+    """Пише продукти користувача в out сторінками з БД; повертає кількість рядків."""
+    text = io.TextIOWrapper(out, encoding="utf-8", newline="")
+    writer = csv.writer(text) if fmt == "csv" else None
+    if writer:
+        writer.writerow(COLUMNS)
+    else:
+        text.write("[")
+    after_id, count = 0, 0
+    while True:
+        rows = await get_products_page(user_id, after_id, page)
+        if not rows:
+            break
+        for _, name, quantity, unit, expiry in rows:
+            if writer:
+                writer.writerow((name, _quantity(quantity), unit, expiry or ""))
+            else:
+                record = dict(zip(COLUMNS, (name, _quantity(quantity), unit, expiry)))
+                text.write(("," if count else "") + "\n  " + json.dumps(record, ensure_ascii=False))
+            count += 1
+        after_id = rows[-1][0]
+    if not writer:
+        text.write("\n]\n" if count else "]\n")
+    text.flush()
+    text.detach()
+    return count
@@ -0,0 +1,333 @@
+import asyncio
+import copy
+import json
+import os
+import time
+import typing
+from urllib.parse import urlparse
+
+import aiosqlite
+from aiogram.dispatcher.storage import BaseStorage
+
+from bounded_cache import BoundedCache
+
+# Стан, з якого ми видаляємо запис взагалі
+_EMPTY = {"state": None, "data": {}, "bucket": {}}
+
+
+class SQLiteStorage(BaseStorage):
+    """
+    FSM-сховище в SQLite: стани переживають рестарт і спільні для кількох процесів.
+
+    Записи накопичуються в памʼяті і скидаються в БД пачками (одна транзакція
+    на пачку). Стани, які не змінювались довше за `ttl` секунд, вважаються
+    протухлими і видаляються.
+    """
+
+    def __init__(self, path: str, ttl: typing.Optional[int] = None,
+                 flush_interval: float = 0.5, batch_size: int = 100,
+                 purge_interval: int = 600):
+        self.path = path
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.purge_interval = purge_interval
+
+        self._db: typing.Optional[aiosqlite.Connection] = None
+        self._db_lock = asyncio.Lock()
+        self._pending: typing.Dict[typing.Tuple[str, str], dict] = {}
+        self._flushing: typing.Dict[typing.Tuple[str, str], dict] = {}
+        # скидання по одному: друге (пачка заповнилась посеред відкладеного) перезаписало б _flushing
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: typing.Optional[asyncio.Task] = None
+        self._last_purge = 0.0
+
+    # ====== Зʼєднання ======
+    async def _get_db(self) -> aiosqlite.Connection:
+        async with self._db_lock:
+            if self._db is None:
+                db_dir = os.path.dirname(self.path)
+                if db_dir and not os.path.exists(db_dir):
+                    os.makedirs(db_dir, exist_ok=True)
+                self._db = await aiosqlite.connect(self.path)
+                # WAL + busy_timeout, щоб кілька воркерів не блокували одне одного
+                await self._db.execute("PRAGMA journal_mode=WAL")
+                await self._db.execute("PRAGMA busy_timeout=5000")
+                await self._db.execute("""
+                    CREATE TABLE IF NOT EXISTS fsm_states (
+                        chat TEXT NOT NULL,
+                        user TEXT NOT NULL,
+                        state TEXT NULL,
+                        data TEXT NOT NULL DEFAULT '{}',
+                        bucket TEXT NOT NULL DEFAULT '{}',
+                        updated_at REAL NOT NULL,
+                        PRIMARY KEY (chat, user)
+                    )
+                """)
+                await self._db.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_fsm_states_updated ON fsm_states(updated_at)"
+                )
+                await self._db.commit()
+            return self._db
+
+    async def close(self):
+        await self.flush()
+        if self._db is not None:
+            await self._db.close()
+            self._db = None
+
+    async def wait_closed(self):
+        if self._flush_task is not None:
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+
+    # ====== Читання / запис одного запису ======
+    def _key(self, chat, user) -> typing.Tuple[str, str]:
+        chat, user = self.check_address(chat=chat, user=user)
+        return str(chat), str(user)
+
+    def _is_stale(self, updated_at: float) -> bool:
+        return self.ttl is not None and updated_at < time.time() - self.ttl
+
+    async def _load(self, key) -> dict:
+        record = self._pending.get(key) or self._flushing.get(key)
+        if record is not None:
+            return record
+
+        db = await self._get_db()
+        async with db.execute(
+            "SELECT state, data, bucket, updated_at FROM fsm_states WHERE chat = ? AND user = ?", key
+        ) as cursor:
+            row = await cursor.fetchone()
+
+        if not row or self._is_stale(row[3]):
+            return {"state": None, "data": {}, "bucket": {}}
+        return {"state": row[0], "data": json.loads(row[1]), "bucket": json.loads(row[2])}
+
+    async def _save(self, key, record: dict):
+        self._pending[key] = record
+        if len(self._pending) >= self.batch_size:
+            await self.flush()
+        elif self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.ensure_future(self._delayed_flush())
+
+    async def _delayed_flush(self):
+        await asyncio.sleep(self.flush_interval)
+        await self.flush()
+
+    async def flush(self):
+        """Скидає накопичені зміни в БД однією транзакцією."""
+        async with self._flush_lock:
+            await self._flush()
+
+    async def _flush(self):
+        if not self._pending:
+            return
+        self._flushing, self._pending = self._pending, {}
+
+        now = time.time()
+        upserts, deletes = [], []
+        for (chat, user), record in self._flushing.items():
+            if record == _EMPTY:
+                deletes.append((chat, user))
+            else:
+                upserts.append((
+                    chat, user, record["state"],
+                    json.dumps(record["data"], ensure_ascii=False),
+                    json.dumps(record["bucket"], ensure_ascii=False),
+                    now,
+                ))
+
+        db = await self._get_db()
+        try:
+            if upserts:
+                await db.executemany("""
+                    INSERT INTO fsm_states (chat, user, state, data, bucket, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(chat, user) DO UPDATE SET
+                        state=excluded.state, data=excluded.data,
+                        bucket=excluded.bucket, updated_at=excluded.updated_at
+                """, upserts)
+            if deletes:
+                await db.executemany("DELETE FROM fsm_states WHERE chat = ? AND user = ?", deletes)
+            if self.ttl is not None and now - self._last_purge > self.purge_interval:
+                await db.execute("DELETE FROM fsm_states WHERE updated_at < ?", (now - self.ttl,))
+                self._last_purge = now
+            await db.commit()
+        except Exception:
+            # повертаємо в чергу те, що не встигли записати (новіші зміни мають пріоритет)
+            self._pending = {**self._flushing, **self._pending}
+            raise
+        finally:
+            self._flushing = {}
+
+    # ====== Інтерфейс BaseStorage ======
+    async def get_state(self, *, chat=None, user=None, default=None) -> typing.Optional[str]:
+        record = await self._load(self._key(chat, user))
+        return record["state"] if record["state"] is not None else self.resolve_state(default)
+
+    async def get_data(self, *, chat=None, user=None, default=None) -> typing.Dict:
+        record = await self._load(self._key(chat, user))
+        return json.loads(json.dumps(record["data"])) if record["data"] else (default or {})
+
+    async def set_state(self, *, chat=None, user=None, state=None):
+        key = self._key(chat, user)
+        record = dict(await self._load(key))
+        record["state"] = self.resolve_state(state)
+        await self._save(key, record)
+
+    async def set_data(self, *, chat=None, user=None, data: typing.Dict = None):
+        key = self._key(chat, user)
+        record = dict(await self._load(key))
+        record["data"] = json.loads(json.dumps(data or {}))
+        await self._save(key, record)
+
+    async def update_data(self, *, chat=None, user=None, data: typing.Dict = None, **kwargs):
+        key = self._key(chat, user)
+        record = dict(await self._load(key))
+        merged = dict(record["data"])
+        merged.update(data or {}, **kwargs)
+        record["data"] = json.loads(json.dumps(merged))
+        await self._save(key, record)
+
+    async def reset_state(self, *, chat=None, user=None, with_data: typing.Optional[bool] = True):
+        key = self._key(chat, user)
+        record = dict(await self._load(key))
+        record["state"] = None
+        if with_data:
+            record["data"] = {}
+        await self._save(key, record)
+
+    def has_bucket(self):
+        return True
+
+    async def get_bucket(self, *, chat=None, user=None, default=None) -> typing.Dict:
+        record = await self._load(self._key(chat, user))
+        return json.loads(json.dumps(record["bucket"])) if record["bucket"] else (default or {})
+
+    async def set_bucket(self, *, chat=None, user=None, bucket: typing.Dict = None):
+        key = self._key(chat, user)
+        record = dict(await self._load(key))
+        record["bucket"] = json.loads(json.dumps(bucket or {}))
+        await self._save(key, record)
+
+    async def update_bucket(self, *, chat=None, user=None, bucket: typing.Dict = None, **kwargs):
+        key = self._key(chat, user)
+        record = dict(await self._load(key))
+        merged = dict(record["bucket"])
+        merged.update(bucket or {}, **kwargs)
+        record["bucket"] = json.loads(json.dumps(merged))
+        await self._save(key, record)
+
+
+class BoundedMemoryStorage(BaseStorage):
+    """
+    FSM у памʼяті процесу, але обмежене: стани живуть у BoundedCache, тож покинуті
+    діалоги забуваються через `ttl` секунд без змін, а понад `max_size` користувачів
+    витісняються найдавніші. На відміну від MemoryStorage з aiogram, читання стану
+    не створює запис — користувач без стану нічого не займає.
+    """
+
+    def __init__(self, ttl: typing.Optional[int] = None, max_size: int = 100_000):
+        self._records = BoundedCache("fsm_memory", max_size, ttl=ttl)
+
+    async def close(self):
+        self._records.clear()
+
+    async def wait_closed(self):
+        pass
+
+    def _key(self, chat, user) -> typing.Tuple[str, str]:
+        chat, user = self.check_address(chat=chat, user=user)
+        return str(chat), str(user)
+
+    def _load(self, key) -> dict:
+        return self._records.get(key) or _EMPTY
+
+    def _save(self, key, record: dict):
+        if record == _EMPTY:
+            self._records.pop(key)
+        else:
+            self._records.set(key, record)
+
+    def _update(self, chat, user, **fields):
+        key = self._key(chat, user)
+        self._save(key, {**self._load(key), **fields})
+
+    async def get_state(self, *, chat=None, user=None, default=None) -> typing.Optional[str]:
+        state = self._load(self._key(chat, user))["state"]
+        return state if state is not None else self.resolve_state(default)
+
+    async def get_data(self, *, chat=None, user=None, default=None) -> typing.Dict:
+        data = self._load(self._key(chat, user))["data"]
+        return copy.deepcopy(data) if data else (default or {})
+
+    async def set_state(self, *, chat=None, user=None, state=None):
+        self._update(chat, user, state=self.resolve_state(state))
+
+    async def set_data(self, *, chat=None, user=None, data: typing.Dict = None):
+        self._update(chat, user, data=copy.deepcopy(data or {}))
+
+    async def update_data(self, *, chat=None, user=None, data: typing.Dict = None, **kwargs):
+        key = self._key(chat, user)
+        record = self._load(key)
+        merged = {**record["data"], **(data or {}), **kwargs}
+        self._save(key, {**record, "data": copy.deepcopy(merged)})
+
+    async def reset_state(self, *, chat=None, user=None, with_data: typing.Optional[bool] = True):
+        if with_data:
+            self._update(chat, user, state=None, data={})
+        else:
+            self._update(chat, user, state=None)
+
+    def has_bucket(self):
+        return True
+
+    async def get_bucket(self, *, chat=None, user=None, default=None) -> typing.Dict:
+        bucket = self._load(self._key(chat, user))["bucket"]
+        return copy.deepcopy(bucket) if bucket else (default or {})
+
+    async def set_bucket(self, *, chat=None, user=None, bucket: typing.Dict = None):
+        self._update(chat, user, bucket=copy.deepcopy(bucket or {}))
+
+    async def update_bucket(self, *, chat=None, user=None, bucket: typing.Dict = None, **kwargs):
+        key = self._key(chat, user)
+        record = self._load(key)
+        merged = {**record["bucket"], **(bucket or {}), **kwargs}
+        self._save(key, {**record, "bucket": copy.deepcopy(merged)})
+
+
+def create_storage() -> BaseStorage:
+    """Обирає FSM-сховище за змінною FSM_STORAGE: sqlite (за замовчуванням), redis або memory."""
+    kind = (os.getenv("FSM_STORAGE") or "sqlite").lower()
+    ttl = int(os.getenv("FSM_STATE_TTL") or 86400) or None
+
+    if kind == "memory":
+        return BoundedMemoryStorage(ttl=ttl, max_size=int(os.getenv("FSM_MEMORY_MAX") or 100_000))
+
+    if kind == "redis":
+        # будь-який сервер з Redis-протоколом (redis, KeyDB, локальна заглушка)
+        from aiogram.contrib.fsm_storage.redis import RedisStorage2
+        url = urlparse(os.getenv("REDIS_URL") or "redis://localhost:6379/0")
+        return RedisStorage2(
+            host=url.hostname or "localhost",
+            port=url.port or 6379,
+            db=int((url.path or "/0").lstrip("/") or 0),
+            password=url.password,
+            prefix="culinary_fsm",
+            state_ttl=ttl,
+            data_ttl=ttl,
+            bucket_ttl=ttl,
+        )
+
+    path = (
+        os.getenv("FSM_DB_PATH")
+        or os.getenv("PRODUCTS_DB_PATH")
+        or os.getenv("DB_PATH")
+        or "products.db"
+    )
+    return SQLiteStorage(
+        path,
+        ttl=ttl,
+        flush_interval=float(os.getenv("FSM_FLUSH_INTERVAL") or 0.5),
+        batch_size=int(os.getenv("FSM_BATCH_SIZE") or 100),
+    )
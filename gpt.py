@@ -1,14 +1,15 @@
-from dotenv import load_dotenv
-load_dotenv()
-
-import os
+import logging
 import re
 from datetime import datetime, timedelta, date
 from typing import List, Tuple, Optional
-from openai import AsyncOpenAI
 from db import get_all_products_with_expiry, get_user_profile
+from llm import router, LLMUnavailable
+from log import fields, payload
+
+logger = logging.getLogger(__name__)
 
-client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Префікс відповіді, коли LLM недоступна і ми пішли запасним шляхом
+LLM_FALLBACK_PREFIX = "🚦"
 
 BASIC_INGREDIENTS = [
     "сіль", "перець", "цукор", "борошно", "сода", "розпушувач", "оцет",
@@ -18,7 +19,6 @@ BASIC_INGREDIENTS = [
     "хліб", "батон", "сухарі", "гірчиця", "соєвий соус", "томатна паста", "кетчуп", "майонез",
     "крохмаль"
 ]
-last_generated_ingredients = {}
 
 def _parse_ddmmyyyy(d: str) -> Optional[date]:
     try:
@@ -26,10 +26,25 @@ def _parse_ddmmyyyy(d: str) -> Optional[date]:
     except Exception:
         return None
 
-async def suggest_recipe(user_id: int, meal_type: str) -> str:
-    global last_generated_ingredients
-    last_generated_ingredients.clear()
+def _fallback_recipe_text(priority_products: List[str], other_products: List[str]) -> str:
+    # без LLM можемо хоча б підказати, що варто використати першим
+    hint = priority_products or other_products[:5]
+    return (
+        f"{LLM_FALLBACK_PREFIX} Генератор рецептів зараз перевантажений, спробуй трохи пізніше.\n\n"
+        "🥕 Поки що варто використати:\n" + "\n".join(f"• {p}" for p in hint)
+    )
+
+# Холодильник з такою кількістю продуктів вважаємо простим — вистачить швидкої моделі
+SIMPLE_FRIDGE_SIZE = 5
+
+def choose_tier(meal_type: str, products_count: int) -> str:
+    if meal_type == "weekly":
+        return "large"
+    if meal_type == "snack" or products_count <= SIMPLE_FRIDGE_SIZE:
+        return "fast"
+    return "default"
 
+async def suggest_recipe(user_id: int, meal_type: str, on_queued=None) -> str:
     products: List[Tuple[str, int, str, Optional[str]]] = await get_all_products_with_expiry(user_id)
     profile = await get_user_profile(user_id)
 
@@ -121,57 +136,54 @@ async def suggest_recipe(user_id: int, meal_type: str) -> str:
         f"❗ Без жодних побажань, коментарів, пояснень. Лише чіткий рецепт у вказаному форматі."
     )
 
-    print("PROMPT:\n", prompt)
+    logger.debug("Промпт до LLM", extra=payload(user_id=user_id, meal_type=meal_type, prompt=prompt))
 
     try:
-        response = await client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
+        response = await router.complete(
+            choose_tier(meal_type, len(filtered_products)),
+            [
                 {"role": "system", "content": "Ти кулінарний помічник."},
                 {"role": "user", "content": prompt}
             ],
-            max_tokens=700,
-            temperature=0.6
+            on_queued=on_queued,
         )
 
         content = response.choices[0].message.content
-        print("GPT RESPONSE:\n", content)
+        logger.debug("Відповідь LLM", extra=payload(user_id=user_id, response=content))
 
         if "Інгредієнти:" not in content or "🔷 Рецепт:" not in content:
             return "⚠️ Структура рецепту не відповідає очікуваному формату! Спробуй згенерувати інший рецепт."
 
-        last_generated_ingredients = extract_ingredients(content)
         return content
 
-    except Exception as e:
-        print("GPT Error:", e)
+    except LLMUnavailable as e:
+        logger.warning("LLM недоступна, запасний шлях", extra=fields(user_id=user_id, reason=type(e).__name__))
+        return _fallback_recipe_text(priority_products, other_products)
+
+    except Exception:
+        logger.exception("Помилка генерації рецепту", extra=fields(user_id=user_id))
         return "❌ Не вдалося згенерувати страву. Спробуй ще раз пізніше."
 
 
+# «- Назва, Кількість Одиниця»: назва — до першої коми, за якою йде число (у назві теж бувають коми),
+# кількість з крапкою чи комою, одиниця — перше слово після неї (пробіл між ними необовʼязковий)
+_INGREDIENTS_BLOCK_RE = re.compile(r"Інгредієнти:(.*?)(?:🔷|$)", re.DOTALL)
+_INGREDIENT_LINE_RE = re.compile(r"(.*?),\s*(\d+(?:[.,]\d+)?)\s*([^\s*]+)")
+
+
 def extract_ingredients(text: str) -> dict:
+    """Блок «Інгредієнти:» рецепта → {(назва, одиниця): кількість} — для списання, БЖУ й бібліотеки."""
     ingredients = {}
-    match = re.search(r"Інгредієнти:(.*?)🔷 Рецепт:", text, re.DOTALL)
+    match = _INGREDIENTS_BLOCK_RE.search(text)
     if not match:
         return {}
-
-    block = match.group(1)
-    lines = block.strip().split("\n")
-    for line in lines:
-        if line.startswith("- "):
-            line = line[2:]
-        parts = line.strip().split(", ")
-        if len(parts) != 2:
-            continue
-        name = parts[0].strip().lower()
-        qty_unit = parts[1].strip().split(" ", 1)
-        if len(qty_unit) != 2:
-            continue
-        try:
-            quantity = float(qty_unit[0].replace(",", "."))
-        except ValueError:
+    for line in match.group(1).split("\n"):
+        found = _INGREDIENT_LINE_RE.match(line.strip().lstrip("-•* ").strip())
+        if not found:
             continue
-        unit = qty_unit[1]
-        ingredients[(name, unit)] = quantity
+        name = found.group(1).strip().lower()
+        if name:
+            ingredients[(name, found.group(3))] = float(found.group(2).replace(",", "."))
     return ingredients
 
 
@@ -1,10 +1,35 @@
+import io
+import os
+import tempfile
+import time
+
 from aiogram import Dispatcher, types
-from aiogram.types import (
-    InlineKeyboardMarkup, InlineKeyboardButton,
-    ReplyKeyboardMarkup, KeyboardButton
-)
+from aiogram.dispatcher import FSMContext
+from aiogram.dispatcher.filters.state import State, StatesGroup
+from aiogram.utils import exceptions
+from aiogram.types import ReplyKeyboardMarkup, KeyboardButton
 from gpt import suggest_recipe
-from db import add_product_to_db
+import fridge_io
+from product_parser import format_errors
+from callback_handlers import ROOT_MENU, cancel_keyboard, recipe_list_keyboard, show_favourites
+from db import (add_product_to_db, get_all_products_with_ids, get_reminder_settings, get_user_profile,
+                update_reminder_settings, update_user_body)
+from throttling import rate_limit, items_cost, document_cost
+from profiler import profiler, format_report
+import bounded_cache
+import expiry_index
+import metrics
+import nutrition
+import recipes
+from reminders import describe, next_reminder_at, parse_time, parse_timezone
+
+# ID адміністраторів через кому — їм доступні службові команди
+ADMIN_IDS = {int(x) for x in (os.getenv("ADMIN_IDS") or "").split(",") if x.strip()}
+
+def is_admin(user_id: int) -> bool:
+    return user_id in ADMIN_IDS
+
+ADMIN_ONLY = "🔒 Ця команда доступна лише адміністраторам."
 
 # 🔘 Постійна клавіатура з однією кнопкою "/start"
 start_reply_keyboard = ReplyKeyboardMarkup(
@@ -14,18 +39,9 @@ start_reply_keyboard = ReplyKeyboardMarkup(
 
 # Головне меню
 async def cmd_start(message: types.Message):
-    inline_kb = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton("📋 Холодильник", callback_data="fridge")],
-        [InlineKeyboardButton("🍽 Страва дня", callback_data="daily_dish")],
-        [InlineKeyboardButton("📅 Тижневе меню", callback_data="weekly_menu")],
-        [InlineKeyboardButton("👤 Профіль", callback_data="profile")],
-        [InlineKeyboardButton("ℹ️ Допомога / Про бота", callback_data="help")],
-        [InlineKeyboardButton("📝 Пропозиції та ідеї", callback_data="feedback")]  # 🔥 нова кнопка
-    ])
-
     await message.answer(
         "👋 Привіт! Обери, що хочеш зробити:",
-        reply_markup=inline_kb
+        reply_markup=ROOT_MENU
     )
 
     # Окремим повідомленням скидаємо стару клаву та показуємо лише /start
@@ -35,6 +51,7 @@ async def cmd_start(message: types.Message):
     )
 
 # Альтернативне додавання продукту
+@rate_limit("db_write", cost=items_cost)
 async def cmd_add(message: types.Message):
     args = message.get_args()
     if not args:
@@ -46,16 +63,240 @@ async def cmd_add(message: types.Message):
             "• Термін придатності у форматі дд.мм.рррр — опційно"
         )
         return
-    await add_product_to_db(user_id=message.from_user.id, text=args)
-    await message.reply(f"✅ Додав продукт(и): {args}")
+    result = await add_product_to_db(user_id=message.from_user.id, text=args)
+    text = f"✅ Додав продукт(и): {', '.join(name for name, *_ in result.items)}" if result.items else "❌ Нічого не додано."
+    if result.errors:
+        text += "\n\n❗️ Не розпізнав:\n" + format_errors(result.errors)
+    await message.reply(text)
 
 # Страва дня (через команду, необов’язково)
+@rate_limit("llm")
 async def cmd_menu(message: types.Message):
-    response = await suggest_recipe(user_id=message.from_user.id, meal_type="lunch")
+    async def notify_queue(position: int):
+        await message.answer(f"🚶 Зараз багато запитів — ти {position}-й у черзі, зачекай трохи.")
+
+    response = await suggest_recipe(user_id=message.from_user.id, meal_type="lunch", on_queued=notify_queue)
     await message.reply(response)
 
+# Налаштування нагадувань: /reminder [ГГ:ХХ] [Часовий/Пояс] | on | off
+@rate_limit("db_write")
+async def cmd_reminder(message: types.Message):
+    user_id = message.from_user.id
+    settings = await get_reminder_settings(user_id)
+    args = message.get_args().split()
+    if not args:
+        await message.reply(
+            describe(settings) + "\n\n"
+            "Змінити: /reminder 08:30 Europe/Kyiv\n"
+            "• лише час або лише пояс — теж можна\n"
+            "• /reminder off — вимкнути, /reminder on — увімкнути"
+        )
+        return
+
+    timezone, at, enabled = settings["timezone"], settings["reminder_time"], settings["enabled"]
+    for arg in args:
+        if arg.lower() in ("on", "off"):
+            enabled = arg.lower() == "on"
+        elif parse_time(arg):
+            at = parse_time(arg).strftime("%H:%M")
+        elif parse_timezone(arg):
+            timezone = arg
+        else:
+            await message.reply(f"❗️ Не зрозумів «{arg}». Час — ГГ:ХХ, пояс — як Europe/Kyiv або America/New_York.")
+            return
+
+    next_at = next_reminder_at(user_id, timezone, at) if enabled else None
+    await update_reminder_settings(user_id, timezone, at, enabled, next_at)
+    await message.reply("✅ " + describe({"timezone": timezone, "reminder_time": at, "enabled": enabled}))
+
+# Денна норма БЖУ: /goal [ціль] [вага зріст вік] [ч|ж] [активність]
+GOAL_HELP = (
+    "Задати: /goal набір 80 180 25 ч\n"
+    "• ціль — схуднення / підтримка / набір\n"
+    "• числа — вага кг, зріст см, вік (у такому порядку)\n"
+    "• стать — ч або ж; активність — 1.2 (сидяча) … 1.9 (щоденні тренування), за замовчуванням 1.55\n"
+    "Можна змінювати по одному параметру, напр. /goal 78"
+)
+
+@rate_limit("db_write")
+async def cmd_goal(message: types.Message):
+    user_id = message.from_user.id
+    args = message.get_args().split()
+    if args:
+        values, error = nutrition.parse_goal(args)
+        if error:
+            await message.reply(f"❗️ {error.capitalize()}.\n\n{GOAL_HELP}")
+            return
+        await update_user_body(user_id, **values)
+
+    profile = await get_user_profile(user_id)
+    targets = nutrition.daily_targets(profile)
+    fridge = await get_all_products_with_ids(user_id)
+    summary = nutrition.summarize((name, quantity, unit) for _, name, quantity, unit, _ in fridge)
+
+    lines = ["✅ Збережено.\n"] if args else []
+    if targets:
+        lines.append(f"🎯 Ціль: {profile.get('goal') or 'підтримка'} · {profile['weight_kg']:g} кг\n"
+                     f"📊 Денна норма: {targets}")
+    else:
+        lines.append("🎯 Для денної норми вкажи вагу, зріст, вік і стать.")
+    if fridge:
+        lines.append(nutrition.format_summary(summary, targets, title="У холодильнику"))
+    lines.append("\n" + GOAL_HELP)
+    await message.reply("\n".join(lines))
+
+# Збережені рецепти: /recipes — улюблені за покриттям холодильником, /recipes запит — пошук
+async def cmd_recipes(message: types.Message):
+    query = message.get_args().strip()
+    if not query:
+        await show_favourites(message)
+        return
+    found = await recipes.search(message.from_user.id, query)
+    if not found:
+        await message.reply(f"🔍 За запитом «{query}» нічого не знайшов серед збережених рецептів.")
+        return
+    keyboard = recipe_list_keyboard([(recipe_id, ("⭐ " if favourite else "") + title)
+                                     for recipe_id, title, favourite in found])
+    await message.reply(f"🔍 Знайдено за «{query}»:", reply_markup=keyboard)
+
+# Імпорт / експорт холодильника файлом
+class ImportState(StatesGroup):
+    waiting_for_file = State()
+
+IMPORT_HELP = (
+    "📥 Надішли файл CSV або JSON з продуктами (до {mb} МБ).\n\n"
+    "CSV: колонки name, quantity, unit, expiry_date (роздільник , або ;), заголовок — опційно:\n"
+    "помідори чері;300;г;14.07.2025\n\n"
+    "JSON: масив або по обʼєкту в рядку:\n"
+    '[{{"name": "яйця", "quantity": 6, "unit": "шт", "expiry_date": "2025-07-20"}}]\n\n'
+    "Термін — дд.мм.рррр або рррр-мм-дд, опційно. Той самий продукт з тим самим терміном додає кількість."
+)
+PROGRESS_SECONDS = 2.0  # не частіше — редагування теж рахується в ліміти Telegram
+
+@rate_limit("import", cost=document_cost)
+async def cmd_import(message: types.Message, state: FSMContext):
+    document = message.document or (message.reply_to_message and message.reply_to_message.document)
+    if document:
+        await run_import(message, document)
+        return
+    await message.reply(IMPORT_HELP.format(mb=fridge_io.MAX_BYTES // 2 ** 20), reply_markup=cancel_keyboard(to_main=True))
+    await ImportState.waiting_for_file.set()
+
+@rate_limit("import", cost=document_cost)
+async def handle_import_file(message: types.Message, state: FSMContext):
+    await state.finish()
+    await run_import(message, message.document)
+
+async def handle_import_waiting_text(message: types.Message):
+    await message.reply("📎 Чекаю файл CSV або JSON. Щоб скасувати — натисни «Скасувати».",
+                        reply_markup=cancel_keyboard(to_main=True))
+
+async def run_import(message: types.Message, document: types.Document):
+    if document.file_size and document.file_size > fridge_io.MAX_BYTES:
+        await message.reply(f"❗️ Файл завеликий: максимум {fridge_io.MAX_BYTES // 2 ** 20} МБ.")
+        return
+    progress = await message.reply("⏳ Завантажую файл…")
+    last_edit = time.monotonic()
+
+    async def on_progress(rows: int, written: int):
+        nonlocal last_edit
+        if time.monotonic() - last_edit < PROGRESS_SECONDS:
+            return
+        last_edit = time.monotonic()
+        try:
+            await progress.edit_text(f"⏳ Імпорт: оброблено {rows} рядків, записано {written}…")
+        except (exceptions.RetryAfter, exceptions.MessageNotModified):
+            pass  # прогрес — не критично, пропускаємо оновлення
+
+    # документ — у тимчасовому файлі на диску, у памʼяті лише поточна пачка
+    with tempfile.TemporaryFile() as buffer:
+        await document.download(destination_file=buffer)
+        buffer.seek(0)
+        fmt = fridge_io.detect_format(document.file_name, buffer.read(64))
+        buffer.seek(0)
+        report = await fridge_io.import_stream(message.from_user.id, buffer, fmt, on_progress)
+    await progress.edit_text(fridge_io.format_report(report))
+
+# /export [csv|json] — вміст холодильника файлом (формат, який приймає /import)
+@rate_limit("import")
+async def cmd_export(message: types.Message):
+    fmt = (message.get_args().strip().lower() or "csv")
+    if fmt not in ("csv", "json"):
+        await message.reply("❗️ Формат — csv або json, наприклад: /export json")
+        return
+    with tempfile.TemporaryFile() as buffer:
+        count = await fridge_io.export_stream(message.from_user.id, buffer, fmt)
+        if not count:
+            await message.reply("❌ У холодильнику порожньо — нема що експортувати.")
+            return
+        buffer.seek(0)
+        await message.answer_document(
+            types.InputFile(buffer, filename=f"fridge.{fmt}"),
+            caption=f"📤 {count} продуктів. Щоб завантажити назад — /import",
+        )
+
+# Профілювання event loop (лише для адмінів): /cpuprofile [хендлер] [секунд]
+async def cmd_cpuprofile(message: types.Message):
+    if not is_admin(message.from_user.id):
+        await message.reply(ADMIN_ONLY)
+        return
+    args = message.get_args().split()
+    seconds = float(args.pop()) if args and args[-1].replace(".", "", 1).isdigit() else 30.0
+    target = args[0] if args else None
+    seconds = min(seconds, 300.0)
+
+    await message.reply(f"🔬 Збираю профіль {target or 'усіх хендлерів'} протягом {seconds:g} с…")
+    try:
+        report = await profiler.sample(target, seconds)
+    except RuntimeError as e:
+        await message.reply(f"⚠️ {e}")
+        return
+
+    text, folded = format_report(report)
+    await message.reply(text[:4000])
+    if folded:
+        document = types.InputFile(io.BytesIO(folded.encode()), filename="profile.folded")
+        await message.answer_document(document, caption="Folded stacks для flamegraph.pl / speedscope")
+
+# Памʼять, яку тримає процес (лише для адмінів): /stats
+def _size(n: float) -> str:
+    return f"{n / 1024:,.0f} КБ" if n < 2 ** 20 else f"{n / 2 ** 20:,.1f} МБ"
+
+async def cmd_stats(message: types.Message):
+    if not is_admin(message.from_user.id):
+        await message.reply(ADMIN_ONLY)
+        return
+    lines = [f"📊 Памʼять процесу (RSS): {_size(metrics.rss_bytes())}", "", "🗃 Стан у памʼяті:"]
+    for c in bounded_cache.all_stats():
+        ttl = ""
+        if c["ttl"]:
+            ttl = f", ttl {c['ttl'] / 3600:.0f} год" if c["ttl"] >= 3600 else f", ttl {c['ttl'] / 60:.0f} хв"
+        lines.append(
+            f"• {c['name']}: {c['entries']:,}/{c['max_size']:,} записів, ~{_size(c['bytes'])}{ttl}; "
+            f"витіснено lru {c['evicted_lru']:,}, ttl {c['evicted_ttl']:,}"
+        )
+    index = expiry_index.index.stats()
+    lines.append(f"• expiry_index: {index['events']:,} подій, {index['products']:,} продуктів, "
+                 f"{index['users']:,} користувачів (дзеркало БД, не витісняється)")
+    await message.reply("\n".join(lines))
+
 # Реєстрація хендлерів
 def register_handlers(dp: Dispatcher):
     dp.register_message_handler(cmd_start, commands="start")
     dp.register_message_handler(cmd_add, commands="add")
-    dp.register_message_handler(cmd_menu, commands="menu")
\ No newline at end of file
+    dp.register_message_handler(cmd_menu, commands="menu")
+    dp.register_message_handler(cmd_reminder, commands="reminder")
+    dp.register_message_handler(cmd_goal, commands="goal")
+    dp.register_message_handler(cmd_recipes, commands="recipes")
+    # не /profile — так у користувачів називається екран «👤 Профіль»
+    dp.register_message_handler(cmd_cpuprofile, commands="cpuprofile")
+    dp.register_message_handler(cmd_stats, commands="stats")
+    # /import у підписі до файлу, у відповідь на файл або окремо — тоді чекаємо файл наступним повідомленням
+    dp.register_message_handler(
+        cmd_import, commands="import", commands_ignore_caption=False,
+        content_types=[types.ContentType.TEXT, types.ContentType.DOCUMENT],
+    )
+    dp.register_message_handler(handle_import_file, content_types=types.ContentType.DOCUMENT,
+                                state=ImportState.waiting_for_file)
+    dp.register_message_handler(handle_import_waiting_text, state=ImportState.waiting_for_file)
+    dp.register_message_handler(cmd_export, commands="export")
\ No newline at end of file
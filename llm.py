@@ -0,0 +1,368 @@
+import asyncio
+import collections
+import json
+import logging
+import os
+import random
+import time
+import typing
+
+import metrics
+from log import fields
+
+logger = logging.getLogger(__name__)
+
+# openai імпортується ~0.5 с (сотні модулів з типами) — лише коли справді потрібен клієнт,
+# а не на старті бота; bootstrap прогріває його у фоні вже після запуску
+if typing.TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+
+def warm_up():
+    """Імпортує openai заздалегідь (у потоці executor-а), щоб перший рецепт не чекав на імпорт."""
+    import openai  # noqa: F401
+
+# ====== Помилки ======
+class LLMUnavailable(Exception):
+    """LLM зараз недоступна — треба йти запасним шляхом."""
+
+class LLMQueueFull(LLMUnavailable):
+    pass
+
+class LLMCircuitOpen(LLMUnavailable):
+    pass
+
+class LLMDeadlineExceeded(LLMUnavailable):
+    pass
+
+def is_retryable(e: Exception) -> bool:
+    # винятки приходять від клієнта, тож openai на цей момент уже імпортовано
+    import openai
+
+    # 429 і 5xx, таймаути та обриви зʼєднання — тимчасові
+    if isinstance(e, (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    if isinstance(e, openai.APIStatusError):
+        return e.status_code == 429 or e.status_code >= 500
+    return False
+
+# ====== Запобіжник ======
+class CircuitBreaker:
+    """
+    Після `failure_threshold` невдач поспіль розмикається на `reset_timeout` секунд,
+    далі пропускає один пробний запит (half-open).
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+            # пропускаємо рівно один пробний запит, решта чекає його результату
+            self.state = "half_open"
+            return True
+        return False
+
+    def abort_probe(self):
+        """Пробний запит завершився без результату (черга, дедлайн, скасування) — знову розімкнено."""
+        if self.state == "half_open":
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def record_success(self):
+        self.state = "closed"
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                logger.warning("🔌 LLM запобіжник розімкнено", extra=fields(failures=self.failures))
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+# ====== Планувальник ======
+class LLMScheduler:
+    """
+    Єдина черга до LLM: не більше `max_concurrency` запитів одночасно,
+    не більше `max_queue` у черзі, дедлайн на кожен запит, повтори з
+    джитером на 429/5xx і запобіжник.
+    """
+
+    def __init__(self, max_concurrency: int = 8, max_queue: int = 200, deadline: float = 45.0,
+                 retries: int = 3, backoff: float = 0.5, breaker: typing.Optional[CircuitBreaker] = None):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.deadline = deadline
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker = breaker or CircuitBreaker()
+
+        self.active = 0
+        self._queue: typing.Deque[asyncio.Future] = collections.deque()
+
+    @classmethod
+    def from_env(cls) -> "LLMScheduler":
+        return cls(
+            max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY") or 8),
+            max_queue=int(os.getenv("LLM_MAX_QUEUE") or 200),
+            deadline=float(os.getenv("LLM_DEADLINE") or 45),
+            retries=int(os.getenv("LLM_RETRIES") or 3),
+            breaker=CircuitBreaker(
+                failure_threshold=int(os.getenv("LLM_BREAKER_FAILURES") or 5),
+                reset_timeout=float(os.getenv("LLM_BREAKER_RESET") or 30),
+            ),
+        )
+
+    @property
+    def waiting(self) -> int:
+        return sum(1 for f in self._queue if not f.done())
+
+    # --- слоти ---
+    async def _acquire(self, timeout: float, on_queued):
+        if self.active < self.max_concurrency and not self.waiting:
+            self.active += 1
+            return
+        if self.waiting >= self.max_queue:
+            raise LLMQueueFull()
+
+        slot = asyncio.get_running_loop().create_future()
+        self._queue.append(slot)
+        if on_queued is not None:
+            try:
+                await on_queued(self.waiting)
+            except Exception:
+                logger.warning("⚠️ Не вдалося повідомити про чергу", exc_info=True)
+
+        try:
+            await asyncio.wait_for(slot, timeout)
+        except BaseException:
+            if slot.done() and not slot.cancelled():
+                # слот уже передали нам — повертаємо його
+                self._release()
+            raise
+
+    def _release(self):
+        while self._queue:
+            slot = self._queue.popleft()
+            if not slot.done():
+                slot.set_result(None)  # слот переходить наступному, active не змінюється
+                return
+        self.active -= 1
+
+    # --- виконання ---
+    async def run(self, call: typing.Callable[[], typing.Awaitable], on_queued=None,
+                  deadline: typing.Optional[float] = None):
+        """
+        Виконує `call()` через чергу. `on_queued(position)` викликається, якщо
+        довелося стати в чергу. Кидає LLMUnavailable, якщо треба запасний шлях.
+        """
+        if not self.breaker.allow():
+            raise LLMCircuitOpen()
+        probe = self.breaker.state == "half_open"
+        try:
+            return await self._run(call, on_queued, deadline)
+        finally:
+            # пробний запит мусить закінчитися success/failure, інакше half_open залишився б назавжди
+            if probe:
+                self.breaker.abort_probe()
+
+    async def _run(self, call: typing.Callable[[], typing.Awaitable], on_queued,
+                   deadline: typing.Optional[float]):
+        loop = asyncio.get_running_loop()
+        deadline_at = loop.time() + (deadline or self.deadline)
+
+        try:
+            await self._acquire(deadline_at - loop.time(), on_queued)
+        except asyncio.TimeoutError:
+            raise LLMDeadlineExceeded()
+
+        try:
+            # поки стояли в черзі, запобіжник міг розімкнутись — не чекаємо дедлайну
+            if self.breaker.state == "open":
+                raise LLMCircuitOpen()
+
+            attempt = 0
+            while True:
+                remaining = deadline_at - loop.time()
+                if remaining <= 0:
+                    self.breaker.record_failure()
+                    raise LLMDeadlineExceeded()
+                try:
+                    result = await asyncio.wait_for(call(), remaining)
+                except asyncio.TimeoutError:
+                    self.breaker.record_failure()
+                    raise LLMDeadlineExceeded()
+                except Exception as e:
+                    if not is_retryable(e):
+                        # сервіс відповів (напр. 400) — він живий, запобіжник тут ні до чого
+                        self.breaker.record_success()
+                        raise
+                    attempt += 1
+                    if attempt > self.retries:
+                        self.breaker.record_failure()
+                        raise LLMUnavailable(str(e)) from e
+                    # експоненційна затримка з повним джитером
+                    delay = random.uniform(0, self.backoff * 2 ** (attempt - 1))
+                    logger.info("🔁 LLM повтор", extra=fields(attempt=attempt, retries=self.retries, delay=round(delay, 2), error=repr(e)))
+                    await asyncio.sleep(min(delay, max(0.0, deadline_at - loop.time())))
+                    continue
+                self.breaker.record_success()
+                return result
+        finally:
+            self._release()
+
+
+# ====== Бекенди та маршрутизація ======
+# Класи задач: fast — перекуси та прості холодильники, default — звичайні страви, large — тижневе меню
+TIERS = ("fast", "default", "large")
+
+class LLMBackend:
+    """Один провайдер/модель (OpenAI або будь-який OpenAI-сумісний сервер) зі своєю статистикою."""
+
+    def __init__(self, name: str, model: str, base_url: typing.Optional[str] = None,
+                 api_key: typing.Optional[str] = None, tiers: typing.Sequence[str] = TIERS,
+                 max_tokens: int = 700, temperature: float = 0.6, timeout: float = 30.0):
+        self.name = name
+        self.model = model
+        self.base_url = base_url
+        self.api_key = api_key
+        self.tiers = tuple(tiers)
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.timeout = timeout
+        self._client: typing.Optional["AsyncOpenAI"] = None
+
+        # експоненційно згладжені затримка (с) і частка помилок
+        self.latency = 0.0
+        self.error_rate = 0.0
+        self.requests = 0
+        self.errors = 0
+
+    @property
+    def client(self) -> "AsyncOpenAI":
+        if self._client is None:
+            from openai import AsyncOpenAI
+
+            # повтори та дедлайни робить LLMScheduler, тож у самому клієнті їх вимикаємо
+            self._client = AsyncOpenAI(
+                api_key=self.api_key or os.getenv("OPENAI_API_KEY") or "none",
+                base_url=self.base_url or os.getenv("OPENAI_BASE_URL") or None,
+                timeout=self.timeout,
+                max_retries=0,
+            )
+        return self._client
+
+    def record(self, latency: float, ok: bool, alpha: float = 0.2):
+        self.requests += 1
+        if not ok:
+            self.errors += 1
+        if self.requests == 1:
+            self.latency, self.error_rate = latency, 0.0 if ok else 1.0
+            return
+        self.latency += alpha * (latency - self.latency)
+        self.error_rate += alpha * ((0.0 if ok else 1.0) - self.error_rate)
+
+    def score(self) -> float:
+        # менше — краще; ще не випробуваний бекенд отримує шанс першим
+        if not self.requests:
+            return 0.0
+        return self.latency * (1 + 10 * self.error_rate)
+
+    async def complete(self, messages: list, max_tokens: typing.Optional[int] = None,
+                       temperature: typing.Optional[float] = None):
+        return await self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            max_tokens=max_tokens or self.max_tokens,
+            temperature=self.temperature if temperature is None else temperature,
+        )
+
+
+class LLMRouter:
+    """
+    Обирає бекенд для класу задачі за статистикою затримок і помилок.
+    Кожна спроба (включно з повторами планувальника) йде на найкращий на цей момент бекенд.
+    """
+
+    def __init__(self, backends: typing.List[LLMBackend], scheduler: LLMScheduler, explore: float = 0.05):
+        if not backends:
+            raise ValueError("Потрібен хоча б один LLM-бекенд")
+        self.backends = backends
+        self.scheduler = scheduler
+        self.explore = explore
+
+    @classmethod
+    def from_env(cls, scheduler: LLMScheduler) -> "LLMRouter":
+        """
+        LLM_BACKENDS — JSON-список бекендів, напр.
+        [{"name": "mini", "model": "gpt-4o-mini", "tiers": ["fast"]},
+         {"name": "local", "model": "llama3", "base_url": "http://localhost:11434/v1", "tiers": ["fast", "default"]}]
+        Без неї — один OpenAI-бекенд gpt-3.5-turbo для всіх задач.
+        """
+        raw = os.getenv("LLM_BACKENDS")
+        if raw:
+            backends = [LLMBackend(**cfg) for cfg in json.loads(raw)]
+        else:
+            backends = [LLMBackend(
+                "openai",
+                os.getenv("OPENAI_MODEL") or "gpt-3.5-turbo",
+                timeout=float(os.getenv("LLM_REQUEST_TIMEOUT") or 30),
+            )]
+        return cls(backends, scheduler, explore=float(os.getenv("LLM_EXPLORE") or 0.05))
+
+    def candidates(self, tier: str) -> typing.List[LLMBackend]:
+        for t in (tier, "default"):
+            found = [b for b in self.backends if t in b.tiers]
+            if found:
+                return found
+        return list(self.backends)
+
+    def pick(self, tier: str) -> LLMBackend:
+        found = self.candidates(tier)
+        if len(found) > 1 and random.random() < self.explore:
+            # зрідка пробуємо не найкращий, щоб статистика не застаріла
+            return random.choice(found)
+        return min(found, key=lambda b: b.score())
+
+    async def _attempt(self, tier: str, messages: list, **params):
+        backend = self.pick(tier)
+        start = time.monotonic()
+        try:
+            response = await backend.complete(messages, **params)
+        except BaseException as e:
+            elapsed = time.monotonic() - start
+            backend.record(elapsed, ok=False)
+            metrics.observe_llm(backend.name, elapsed, error=e)
+            raise
+        elapsed = time.monotonic() - start
+        backend.record(elapsed, ok=True)
+        metrics.observe_llm(backend.name, elapsed, response)
+        return response
+
+    async def complete(self, tier: str, messages: list, on_queued=None, **params):
+        try:
+            return await self.scheduler.run(
+                lambda: self._attempt(tier, messages, **params),
+                on_queued=on_queued,
+            )
+        except LLMUnavailable as e:
+            metrics.llm_errors.inc(("scheduler", type(e).__name__))
+            raise
+
+
+scheduler = LLMScheduler.from_env()
+router = LLMRouter.from_env(scheduler)
+
+metrics.Gauge("bot_llm_queue_waiting", "Запити в черзі до LLM", lambda: {(): scheduler.waiting})
+metrics.Gauge("bot_llm_active", "Запити до LLM у роботі", lambda: {(): scheduler.active})
+metrics.Gauge("bot_llm_breaker_open", "Запобіжник LLM розімкнено (1) чи ні (0)",
+              lambda: {(): int(scheduler.breaker.state != "closed")})
+metrics.Gauge("bot_llm_backend_latency_seconds", "Згладжена затримка бекенду",
+              lambda: {(b.name,): b.latency for b in router.backends}, ("backend",))
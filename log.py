@@ -0,0 +1,128 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import typing
+
+# Логи пишуться через QueueHandler: на event loop лише перевірка рівня й вкладання
+# запису в чергу, а форматування, редагування й запис у stdout — у фоновому потоці.
+
+# Поля з текстом користувача (продукти, алергії, фідбек, промпти) — у логах лише довжина
+REDACT_FIELDS = {"text", "items", "parsed", "prompt", "response", "allergies", "dislikes", "feedback"}
+
+_listener: typing.Optional[logging.handlers.QueueListener] = None
+
+
+def fields(**kwargs) -> dict:
+    """extra=fields(user_id=1, ...) — структуровані поля запису."""
+    return {"fields": kwargs}
+
+
+def payload(**kwargs) -> dict:
+    """Як fields(), але запис — великий вміст (промпт, відповідь LLM): він семплюється й обрізається."""
+    return {"fields": kwargs, "payload": True}
+
+
+class PayloadSampler(logging.Filter):
+    """Пропускає лише частку записів з великим вмістом; працює до черги, тож відкинуті нічого не коштують."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not getattr(record, "payload", False):
+            return True
+        return self.rate >= 1 or random.random() < self.rate
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    # стандартний prepare() форматує запис у потоці, що логує; нам треба у фоновому
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class StructuredFormatter(logging.Formatter):
+    """JSON (один рядок на запис) або читабельний текст; редагує поля користувача й обрізає великий вміст."""
+
+    def __init__(self, as_json: bool = True, redact: bool = True, max_payload: int = 2000):
+        super().__init__()
+        self.as_json = as_json
+        self.redact = redact
+        self.max_payload = max_payload
+
+    def _value(self, key: str, value):
+        if self.redact and key in REDACT_FIELDS:
+            return f"<redacted {len(str(value))} chars>"
+        if isinstance(value, str) and len(value) > self.max_payload:
+            return value[: self.max_payload] + f"… <+{len(value) - self.max_payload} chars>"
+        return value
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {key: self._value(key, value) for key, value in getattr(record, "fields", {}).items()}
+        message = record.getMessage()
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+
+        if self.as_json:
+            entry = {
+                "ts": round(record.created, 3),
+                "level": record.levelname,
+                "logger": record.name,
+                "msg": message,
+                **data,
+            }
+            return json.dumps(entry, ensure_ascii=False, default=str)
+
+        ts = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(record.created))
+        extra = " ".join(f"{k}={v}" for k, v in data.items() if k != "exc")
+        line = f"{ts} {record.levelname:7s} {record.name}: {message}" + (f" | {extra}" if extra else "")
+        return line + ("\n" + data["exc"] if "exc" in data else "")
+
+
+def setup_logging():
+    """
+    LOG_LEVEL (INFO), LOG_FORMAT (json | text), LOG_REDACT (1),
+    LOG_PAYLOAD_SAMPLE — частка промптів/відповідей, що потрапляють у лог (0.05),
+    LOG_PAYLOAD_MAX — максимум символів з одного поля (2000).
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    formatter = StructuredFormatter(
+        as_json=(os.getenv("LOG_FORMAT") or "json").lower() == "json",
+        redact=(os.getenv("LOG_REDACT") or "1") != "0",
+        max_payload=int(os.getenv("LOG_PAYLOAD_MAX") or 2000),
+    )
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(formatter)
+
+    records: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    handler = _DeferredQueueHandler(records)
+    handler.addFilter(PayloadSampler(float(os.getenv("LOG_PAYLOAD_SAMPLE") or 0.05)))
+
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel((os.getenv("LOG_LEVEL") or "INFO").upper())
+    # бібліотеки не повинні засипати лог DEBUG-ом, навіть якщо LOG_LEVEL=DEBUG
+    for noisy in ("aiogram", "aiohttp", "asyncio", "openai", "httpx", "httpcore"):
+        logging.getLogger(noisy).setLevel(max(root.level, logging.INFO))
+
+    _listener = logging.handlers.QueueListener(records, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Дописує все, що лишилось у черзі (при зупинці процесу)."""
+    global _listener
+    if _listener is not None and threading.current_thread() is not _listener._thread:
+        _listener.stop()
+        _listener = None
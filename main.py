@@ -1,79 +1,34 @@
-from aiogram import Bot, Dispatcher, types
-from aiogram.utils import executor
-from aiogram.contrib.fsm_storage.memory import MemoryStorage
 from dotenv import load_dotenv
-import aiocron
-from datetime import datetime
-import os
-
-from handlers import register_handlers
-from db import init_db, get_all_products_grouped_by_user
-from callback_handlers import register_callback_handlers
+from log import setup_logging, fields
 
+# .env і логування — до імпорту модулів бота, бо вони читають змінні при створенні застосунку
 load_dotenv()
+setup_logging()
 
-bot = Bot(token=os.getenv("TELEGRAM_BOT_TOKEN") or os.getenv("BOT_TOKEN"))
-storage = MemoryStorage()
-dp = Dispatcher(bot, storage=storage)
-
-# читаємо ID каналу для фідбеку
-FEEDBACK_CHAT_ID = os.getenv("FEEDBACK_CHAT_ID")
-
-# Ініціалізація БД при старті
-init_db()
-
-# Реєстрація хендлерів
-register_handlers(dp)
-register_callback_handlers(dp, bot, FEEDBACK_CHAT_ID)
-
-@aiocron.crontab('0 9 * * *')  # Щодня о 09:00
-async def daily_expiry_check():
-    print("⏰ Запуск щоденної перевірки терміну придатності")
-    users_products = await get_all_products_grouped_by_user()
-    today_str = datetime.today().strftime("%d.%m.%Y")
-
-    for user_id, products in users_products.items():
-        expiring = []
-        for name, date_str in products:
-            if not date_str:
-                continue
-            if date_str == today_str:
-                expiring.append(f"{name} (до {date_str})")
+from aiogram.utils import executor
+import logging
+import os
 
-        if expiring:
-            text = (
-                "🔔 Продукти, у яких сьогодні спливає термін придатності:\n"
-                + "\n".join(expiring)
-                + "\n\nСпробуй приготувати щось із них або з’їсти сьогодні 🧑‍🍳🥗"
-            )
-            await bot.send_message(user_id, text)
+import bootstrap
+from workers import run_sharded
+from webhook import run_webhook
 
-@aiocron.crontab('0 9 * * 6')  # Щосуботи о 9:00
-async def weekly_expired_check():
-    print("🔁 Щотижнева перевірка прострочених продуктів")
-    users_products = await get_all_products_grouped_by_user()
-    today = datetime.today()
+logger = logging.getLogger(__name__)
 
-    for user_id, products in users_products.items():
-        expired = []
-        for name, date_str in products:
-            if not date_str:
-                continue
-            try:
-                exp = datetime.strptime(date_str, "%d.%m.%Y")
-            except ValueError:
-                continue
-            if exp < today:
-                expired.append(f"{name} (до {date_str})")
+# Імпорт main.py нічого не відкриває: Bot, Dispatcher і хендлери збирає bootstrap.create_app(),
+# а БД, метрики, outbox, крон-задачі тощо стартують у bootstrap.startup() вже в робочому event loop
 
-        if expired:
-            text = (
-                "❗ У тебе є продукти з простроченим терміном придатності:\n"
-                + "\n".join(expired)
-                + "\n\nРекомендуємо видалити їх з бота та з холодильника 🗑"
-            )
-            await bot.send_message(user_id, text)
 
 if __name__ == "__main__":
-    print("🛠 Бот запускається...")
-    executor.start_polling(dp, skip_updates=True)
\ No newline at end of file
+    mode = (os.getenv("BOT_MODE") or "polling").lower()
+    # BOT_WORKERS>1: фронт-процес роздає апдейти воркерам за user_id
+    workers = int(os.getenv("BOT_WORKERS") or 1)
+    logger.info("🛠 Бот запускається...", extra=fields(mode=mode, workers=workers))
+    dp = bootstrap.get_dispatcher()
+    if mode == "webhook":
+        run_webhook(dp, on_startup=bootstrap.startup, on_shutdown=bootstrap.shutdown)
+    elif workers > 1:
+        # фронт лише отримує апдейти — БД, крон-задачі й outbox стартують у воркерах
+        run_sharded(dp.bot, workers, skip_updates=True)
+    else:
+        executor.start_polling(dp, skip_updates=True, on_startup=bootstrap.startup, on_shutdown=bootstrap.shutdown)
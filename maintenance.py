@@ -0,0 +1,49 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+
+import metrics
+from db import archive_products_batch, db_size_bytes, optimize_db
+from log import fields
+
+logger = logging.getLogger(__name__)
+
+# Щоденне обслуговування БД (лише лідер): прострочені понад ARCHIVE_AFTER_DAYS днів
+# і нульові продукти переносяться в архів (окремий файл) невеликими пачками (між пачками
+# event loop вільний), потім ANALYZE, incremental vacuum і checkpoint WAL.
+
+ARCHIVE_AFTER_DAYS = int(os.getenv("DB_ARCHIVE_AFTER_DAYS") or 30)
+BATCH_SIZE = int(os.getenv("DB_MAINTENANCE_BATCH") or 1000)
+
+archived_total = metrics.Counter("bot_db_archived_rows_total", "Продукти, перенесені в архів", ())
+metrics.Gauge("bot_db_size_bytes", "Розмір файлів БД", lambda: {(name,): size for name, size in db_size_bytes().items()},
+              ("file",))
+
+
+async def archive_stale(after_days: int = ARCHIVE_AFTER_DAYS, batch: int = BATCH_SIZE) -> int:
+    expired_before = (datetime.now() - timedelta(days=after_days)).strftime("%Y-%m-%d")
+    after_id, total = 0, 0
+    while True:
+        after_id, moved = await archive_products_batch(after_id, batch, expired_before)
+        total += moved
+        if not after_id:
+            break
+        await asyncio.sleep(0)  # дати хендлерам пройти між пачками
+    archived_total.inc((), total)
+    return total
+
+
+async def run():
+    started = time.monotonic()
+    before = db_size_bytes()
+    archived = await archive_stale()
+    await optimize_db()
+    after = db_size_bytes()
+    logger.info("🧹 Обслуговування БД", extra=fields(
+        archived=archived, main_before=before.get("main", 0) + before.get("wal", 0),
+        main_after=after.get("main", 0) + after.get("wal", 0), archive=after.get("archive", 0),
+        ms=round((time.monotonic() - started) * 1000),
+    ))
+    return archived
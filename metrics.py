@@ -0,0 +1,239 @@
+import bisect
+import contextvars
+import functools
+import logging
+import os
+import time
+import typing
+
+from aiohttp import web
+from aiogram import Dispatcher, types
+from aiogram.dispatcher.handler import current_handler
+from aiogram.dispatcher.middlewares import BaseMiddleware
+
+from callback_router import effective_handler
+from log import fields
+
+logger = logging.getLogger(__name__)
+
+# Метрики живуть у памʼяті процесу і віддаються у форматі Prometheus (text exposition 0.0.4).
+# На гарячому шляху — лише bisect і кілька додавань, без локів (все в одному event loop).
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+LLM_BUCKETS = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0)
+
+Labels = typing.Tuple[str, ...]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt_labels(names: Labels, values: Labels, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Labels = ()):
+        self.name, self.help, self.labels = name, help, labels
+        self.values: typing.Dict[Labels, float] = {}
+        REGISTRY.append(self)
+
+    def inc(self, labels: Labels = (), amount: float = 1.0):
+        self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def render(self) -> typing.List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_fmt_labels(self.labels, k)} {v}" for k, v in self.values.items()]
+        return lines
+
+
+class Gauge:
+    """Значення береться з функції в момент збору: fn() -> {labels: value}."""
+
+    def __init__(self, name: str, help: str, fn: typing.Callable[[], typing.Dict[Labels, float]],
+                 labels: Labels = (), kind: str = "gauge"):
+        self.name, self.help, self.fn, self.labels, self.kind = name, help, fn, labels, kind
+        REGISTRY.append(self)
+
+    def render(self) -> typing.List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines += [f"{self.name}{_fmt_labels(self.labels, k)} {v}" for k, v in self.fn().items()]
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Labels = (), buckets: typing.Sequence[float] = LATENCY_BUCKETS):
+        self.name, self.help, self.labels = name, help, labels
+        self.buckets = tuple(buckets)
+        # labels → [лічильники по кошиках..., +Inf], сума
+        self.counts: typing.Dict[Labels, typing.List[int]] = {}
+        self.sums: typing.Dict[Labels, float] = {}
+        REGISTRY.append(self)
+
+    def observe(self, labels: Labels, value: float):
+        counts = self.counts.get(labels)
+        if counts is None:
+            counts = self.counts[labels] = [0] * (len(self.buckets) + 1)
+            self.sums[labels] = 0.0
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sums[labels] += value
+
+    def render(self) -> typing.List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, counts in self.counts.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket = _fmt_labels(self.labels, key, 'le="%s"' % le)
+                lines.append(f"{self.name}_bucket{bucket} {cumulative}")
+            lines.append(f"{self.name}_sum{_fmt_labels(self.labels, key)} {self.sums[key]}")
+            lines.append(f"{self.name}_count{_fmt_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+REGISTRY: typing.List[typing.Union[Counter, Gauge, Histogram]] = []
+
+
+def render() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines += metric.render()
+    return "\n".join(lines) + "\n"
+
+
+# ====== Метрики бота ======
+handler_seconds = Histogram("bot_handler_seconds", "Час роботи хендлера", ("event", "handler"))
+handler_errors = Counter("bot_handler_errors_total", "Винятки в хендлерах", ("handler", "error"))
+db_query_seconds = Histogram("bot_db_query_seconds", "Час запиту до БД", ("query",))
+llm_request_seconds = Histogram(
+    "bot_llm_request_seconds", "Час однієї спроби запиту до LLM", ("backend", "outcome"), LLM_BUCKETS
+)
+llm_tokens = Counter("bot_llm_tokens_total", "Токени LLM", ("backend", "kind"))
+llm_errors = Counter("bot_llm_errors_total", "Помилки LLM за типом", ("backend", "error"))
+cron_seconds = Histogram("bot_cron_run_seconds", "Тривалість запуску крон-задачі", ("job",), LLM_BUCKETS)
+cron_last_run: typing.Dict[Labels, float] = {}
+Gauge("bot_cron_last_run_timestamp", "Коли крон-задача завершилась востаннє", lambda: cron_last_run, ("job",))
+
+
+def rss_bytes() -> int:
+    """Резидентна памʼять процесу: поточна з /proc на Linux, інакше пікова з getrusage."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+Gauge("process_resident_memory_bytes", "Резидентна памʼять процесу", lambda: {(): rss_bytes()})
+
+# хендлер поточного апдейта — щоб errors_handler знав, де стався виняток
+_handler_name: contextvars.ContextVar[str] = contextvars.ContextVar("metrics_handler", default="unknown")
+
+
+# ====== Інструментування ======
+def timed_query(func):
+    """Декоратор для async-функцій db.py: час запиту з міткою query=<імʼя функції>."""
+    labels = (func.__name__,)
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            db_query_seconds.observe(labels, time.perf_counter() - start)
+    return wrapper
+
+
+def timed_job(name: str):
+    """Декоратор для крон-задач."""
+    labels = (name,)
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                cron_seconds.observe(labels, time.perf_counter() - start)
+                cron_last_run[labels] = time.time()
+        return wrapper
+    return decorator
+
+
+def observe_llm(backend: str, seconds: float, response=None, error: typing.Optional[BaseException] = None):
+    labels = (backend,)
+    if error is not None:
+        llm_request_seconds.observe((backend, "error"), seconds)
+        llm_errors.inc((backend, type(error).__name__))
+        return
+    llm_request_seconds.observe((backend, "ok"), seconds)
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        llm_tokens.inc(labels + ("prompt",), usage.prompt_tokens or 0)
+        llm_tokens.inc(labels + ("completion",), usage.completion_tokens or 0)
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """Міряє час кожного хендлера (від проходження фільтрів до кінця обробки)."""
+
+    def _start(self, event: str, data: dict, update=None):
+        handler = effective_handler(current_handler.get(), update)
+        name = getattr(handler, "__name__", "unknown")
+        _handler_name.set(name)
+        data["_metrics"] = ((event, name), time.perf_counter())
+
+    def _stop(self, data: dict):
+        started = data.pop("_metrics", None)
+        if started is not None:
+            labels, start = started
+            handler_seconds.observe(labels, time.perf_counter() - start)
+
+    async def on_process_message(self, message: types.Message, data: dict):
+        self._start("message", data)
+
+    async def on_post_process_message(self, message: types.Message, results, data: dict):
+        self._stop(data)
+
+    async def on_process_callback_query(self, callback_query: types.CallbackQuery, data: dict):
+        self._start("callback_query", data, callback_query)
+
+    async def on_post_process_callback_query(self, callback_query: types.CallbackQuery, results, data: dict):
+        self._stop(data)
+
+
+async def _count_error(update: types.Update, exception: Exception):
+    handler_errors.inc((_handler_name.get(), type(exception).__name__))
+    # None — виняток іде далі, як і без метрик
+
+
+def setup(dp: Dispatcher):
+    dp.middleware.setup(MetricsMiddleware())
+    dp.register_errors_handler(_count_error)
+
+
+# ====== HTTP ======
+async def _handle_metrics(request: web.Request) -> web.Response:
+    return web.Response(text=render(), content_type="text/plain", charset="utf-8", headers={"X-Content-Type-Options": "nosniff"})
+
+
+async def start_server(port_offset: int = 0) -> typing.Optional[web.AppRunner]:
+    """Піднімає /metrics на METRICS_HOST:METRICS_PORT (+ зсув для воркерів). Без METRICS_PORT — нічого."""
+    port = os.getenv("METRICS_PORT")
+    if not port:
+        return None
+    app = web.Application()
+    app.router.add_get("/metrics", _handle_metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    host = os.getenv("METRICS_HOST") or "127.0.0.1"
+    await web.TCPSite(runner, host, int(port) + port_offset).start()
+    logger.info("📈 Метрики", extra=fields(url=f"http://{host}:{int(port) + port_offset}/metrics"))
+    return runner
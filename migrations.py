@@ -0,0 +1,319 @@
+"""
+Версійні міграції схеми.
+
+Кожна міграція — це швидка зміна схеми (виконується в init_db однією транзакцією)
+і, за потреби, backfill: заповнення даних невеликими пачками за rowid, кожна у своїй
+короткій транзакції. Backfill іде у фоні, поки бот обслуговує запити, і після
+рестарту продовжується з останнього курсора. Стан — у таблиці schema_version.
+
+Оцінка на копії продакшн-бази (оригінал не змінюється):
+    python -m migrations --dry-run --db /data/products.db
+Стан і ручний прогін усіх міграцій (бот зупинено):
+    python -m migrations --status
+    python -m migrations
+Переведення наявної БД на incremental auto_vacuum (повна перебудова файлу, бот зупинено):
+    python -m migrations --vacuum
+"""
+import argparse
+import asyncio
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+import typing
+
+from log import fields
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = int(os.getenv("MIGRATION_BATCH") or 2000)
+PAUSE_SECONDS = float(os.getenv("MIGRATION_PAUSE_MS") or 50) / 1000  # між пачками, щоб не тиснути на запис
+
+
+class Backfill(typing.NamedTuple):
+    table: str
+    # SQL, що обробляє рядки з rowid у (?, ?] — параметри: попередній курсор і кінець пачки.
+    # NOT INDEXED: інакше планувальник може взяти частковий індекс і сканувати його весь на кожну пачку
+    sql: str
+    # DDL після завершення (напр. індекс по щойно заповненій колонці)
+    finalize: typing.Sequence[str] = ()
+
+
+class Migration(typing.NamedTuple):
+    version: int
+    name: str
+    schema: typing.Sequence[str]
+    backfill: typing.Optional[Backfill] = None
+
+
+# дд.мм.рррр → рррр-мм-дд
+_ISO_FROM_DDMMYYYY = "substr(expiry_date, 7, 4) || '-' || substr(expiry_date, 4, 2) || '-' || substr(expiry_date, 1, 2)"
+
+MIGRATIONS: typing.List[Migration] = [
+    Migration(1, "products_user_index", [
+        # усі запити «продукти користувача» досі сканували всю таблицю
+        "CREATE INDEX IF NOT EXISTS idx_products_user ON products(user_id, name)",
+    ]),
+    Migration(2, "products_expiry_on", [
+        # типізована дата (ISO, порівнюється як текст) поруч зі старою дд.мм.рррр
+        "ALTER TABLE products ADD COLUMN expiry_on TEXT",
+    ], Backfill(
+        table="products",
+        sql=f"""
+            UPDATE products NOT INDEXED SET expiry_on = {_ISO_FROM_DDMMYYYY}
+            WHERE id > ? AND id <= ? AND expiry_date IS NOT NULL AND expiry_on IS NULL
+        """,
+        finalize=["CREATE INDEX IF NOT EXISTS idx_products_expiry_on ON products(expiry_on) WHERE expiry_on IS NOT NULL"],
+    )),
+    Migration(3, "profile_body", [
+        # параметри для денної норми БЖУ (/goal): стать ч/ж, вік, зріст см, вага кг, коефіцієнт активності, ціль
+        "ALTER TABLE profile ADD COLUMN sex TEXT",
+        "ALTER TABLE profile ADD COLUMN age INTEGER",
+        "ALTER TABLE profile ADD COLUMN height_cm REAL",
+        "ALTER TABLE profile ADD COLUMN weight_kg REAL",
+        "ALTER TABLE profile ADD COLUMN activity REAL",
+        "ALTER TABLE profile ADD COLUMN goal TEXT",
+    ]),
+    Migration(4, "recipes", [
+        # згенеровані рецепти: улюблені зберігаються, решта — останні RECIPES_KEEP на користувача
+        """CREATE TABLE IF NOT EXISTS recipes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            meal_type TEXT,
+            title TEXT NOT NULL,
+            body TEXT NOT NULL,
+            favourite INTEGER NOT NULL DEFAULT 0,
+            created_at INTEGER NOT NULL
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_recipes_user ON recipes(user_id, favourite, id)",
+        # структуровані інгредієнти (як у холодильнику: назва, одиниця) — для покриття без LLM
+        """CREATE TABLE IF NOT EXISTS recipe_ingredients (
+            recipe_id INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            unit TEXT NOT NULL,
+            quantity REAL NOT NULL,
+            PRIMARY KEY (recipe_id, name, unit)
+        ) WITHOUT ROWID""",
+        # повнотекстовий пошук по назві й кроках; зовнішній контент — текст не дублюється.
+        # title і body після вставки не змінюються, тож тригерів на UPDATE не треба
+        """CREATE VIRTUAL TABLE IF NOT EXISTS recipes_fts USING fts5(
+            title, body, content='recipes', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+        )""",
+        """CREATE TRIGGER IF NOT EXISTS recipes_fts_insert AFTER INSERT ON recipes BEGIN
+            INSERT INTO recipes_fts (rowid, title, body) VALUES (new.id, new.title, new.body);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS recipes_fts_delete AFTER DELETE ON recipes BEGIN
+            INSERT INTO recipes_fts (recipes_fts, rowid, title, body) VALUES ('delete', old.id, old.title, old.body);
+            -- foreign_keys у застосунку вимкнені, тож інгредієнти прибираємо тут
+            DELETE FROM recipe_ingredients WHERE recipe_id = old.id;
+        END""",
+    ]),
+    Migration(5, "outbox_claim_token", [
+        # хто забрав рядок на доставку: позначити доставленим може лише власник поточної оренди
+        "ALTER TABLE outbox ADD COLUMN claim_token TEXT",
+    ]),
+]
+
+
+def _ensure_table(conn: sqlite3.Connection):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            status TEXT NOT NULL,
+            cursor INTEGER NOT NULL DEFAULT 0,
+            target INTEGER,
+            applied_at INTEGER NOT NULL,
+            finished_at INTEGER
+        )
+    """)
+
+
+def status(conn: sqlite3.Connection) -> typing.Dict[int, typing.Tuple[str, int]]:
+    """{version: (status, cursor)} застосованих міграцій."""
+    _ensure_table(conn)
+    return {v: (s, c) for v, s, c in conn.execute("SELECT version, status, cursor FROM schema_version")}
+
+
+def apply_schema(conn: sqlite3.Connection) -> typing.List[int]:
+    """Застосовує зміни схеми нових міграцій; backfill лишається в статусі 'backfill'. Повертає версії."""
+    applied = status(conn)
+    done = []
+    for m in MIGRATIONS:
+        if m.version in applied:
+            continue
+        started = time.monotonic()
+        # DDL без явного BEGIN у sqlite3 комітиться одразу; IMMEDIATE — бо init_db запускає кожен воркер
+        conn.execute("BEGIN IMMEDIATE")
+        if conn.execute("SELECT 1 FROM schema_version WHERE version = ?", (m.version,)).fetchone():
+            conn.rollback()
+            continue
+        with conn:
+            for sql in m.schema:
+                conn.execute(sql)
+            # нові рядки вже пише оновлений код — backfill іде лише до поточного кінця таблиці
+            target = conn.execute(f"SELECT MAX(rowid) FROM {m.backfill.table}").fetchone()[0] if m.backfill else None
+            conn.execute(
+                "INSERT INTO schema_version (version, name, status, target, applied_at, finished_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (m.version, m.name, "backfill" if m.backfill else "done", target, int(time.time()),
+                 None if m.backfill else int(time.time())),
+            )
+        done.append(m.version)
+        logger.info("🧱 Міграцію застосовано", extra=fields(
+            version=m.version, name=m.name, ms=round((time.monotonic() - started) * 1000),
+        ))
+    return done
+
+
+def backfill_batch(conn: sqlite3.Connection, m: Migration, batch: int = BATCH_SIZE) -> typing.Optional[int]:
+    """Одна пачка backfill у власній транзакції. Повертає новий курсор або None, якщо завершено."""
+    cursor, target = conn.execute("SELECT cursor, target FROM schema_version WHERE version = ?", (m.version,)).fetchone()
+    end = conn.execute(
+        f"SELECT MAX(rowid) FROM (SELECT rowid FROM {m.backfill.table} WHERE rowid > ? AND rowid <= ? "
+        f"ORDER BY rowid LIMIT ?)",
+        (cursor, target or 0, batch),
+    ).fetchone()[0]
+    conn.execute("BEGIN IMMEDIATE")
+    with conn:
+        if end is None:
+            for sql in m.backfill.finalize:
+                conn.execute(sql)
+            conn.execute("UPDATE schema_version SET status = 'done', finished_at = ? WHERE version = ?",
+                         (int(time.time()), m.version))
+            return None
+        conn.execute(m.backfill.sql, (cursor, end))
+        conn.execute("UPDATE schema_version SET cursor = ? WHERE version = ?", (end, m.version))
+    return end
+
+
+def pending_backfills(conn: sqlite3.Connection) -> typing.List[Migration]:
+    applied = status(conn)
+    return [m for m in MIGRATIONS if m.backfill and applied.get(m.version, ("",))[0] == "backfill"]
+
+
+def run_backfills(conn: sqlite3.Connection, batch: int = BATCH_SIZE, pause: float = 0.0) -> dict:
+    """Доганяє всі незавершені backfill (синхронно). Повертає {version: (пачок, секунд роботи)}."""
+    report = {}
+    for m in pending_backfills(conn):
+        batches, busy = 0, 0.0
+        while True:
+            started = time.perf_counter()
+            more = backfill_batch(conn, m, batch)
+            busy += time.perf_counter() - started
+            batches += 1
+            if more is None:
+                break
+            if pause:
+                time.sleep(pause)
+        report[m.version] = (batches, busy)
+    return report
+
+
+async def run_backfills_online(path: str, batch: int = BATCH_SIZE, pause: float = PAUSE_SECONDS):
+    """Фонова задача для бота: кожна пачка — у потоці з окремим зʼєднанням, між пачками — пауза."""
+    loop = asyncio.get_running_loop()
+    conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    try:
+        for m in pending_backfills(conn):
+            logger.info("🧱 Backfill почато", extra=fields(version=m.version, name=m.name))
+            while await loop.run_in_executor(None, backfill_batch, conn, m, batch) is not None:
+                await asyncio.sleep(pause)
+            logger.info("🧱 Backfill завершено", extra=fields(version=m.version, name=m.name))
+    except Exception:
+        # курсор збережено — наступний старт продовжить з тієї ж пачки
+        logger.exception("❌ Backfill перервано")
+    finally:
+        conn.close()
+
+
+def enable_incremental_vacuum(conn: sqlite3.Connection, retries: int = 5) -> bool:
+    """
+    Переводить наявну БД на auto_vacuum = INCREMENTAL. Це можливо лише повною перебудовою файлу (VACUUM),
+    яка весь час тримає ексклюзивне блокування, — тож не під час старту бота, а окремо, з зупиненим ботом.
+    Повертає True, якщо файл перебудовано; False — режим уже увімкнено.
+    """
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+        return False
+    started = time.monotonic()
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    for attempt in range(retries):
+        try:
+            conn.execute("VACUUM")
+            break
+        except sqlite3.OperationalError as e:
+            # хтось ще тримає БД (забутий воркер, бекап) — чекаємо, а не здаємося з першого разу
+            if "locked" not in str(e) or attempt == retries - 1:
+                raise
+            time.sleep(2 ** attempt)
+    logger.info("🧱 auto_vacuum = INCREMENTAL", extra=fields(ms=round((time.monotonic() - started) * 1000)))
+    return True
+
+
+def dry_run(path: str, batch: int = BATCH_SIZE, pause: float = PAUSE_SECONDS) -> dict:
+    """Проганяє нові міграції на копії бази й оцінює тривалість онлайн-прогону (робота + паузи)."""
+    tmp = tempfile.mkdtemp(prefix="culinary-migrate-")
+    copy_path = os.path.join(tmp, "copy.db")
+    source = sqlite3.connect(path)
+    copy = sqlite3.connect(copy_path)
+    try:
+        source.backup(copy)  # консистентний знімок навіть під навантаженням
+        source.close()
+        rows = {t: copy.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0] for t in ("products",)}
+
+        started = time.perf_counter()
+        versions = apply_schema(copy)
+        schema_s = time.perf_counter() - started
+        backfills = run_backfills(copy, batch)
+        return {
+            "rows": rows,
+            "pending": versions,
+            "schema_s": round(schema_s, 3),
+            "backfills": {
+                v: {"batches": n, "work_s": round(busy, 3), "online_estimate_s": round(busy + n * pause, 1)}
+                for v, (n, busy) in backfills.items()
+            },
+        }
+    finally:
+        copy.close()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Міграції схеми БД")
+    parser.add_argument("--db", default=os.getenv("PRODUCTS_DB_PATH") or os.getenv("DB_PATH") or "products.db")
+    parser.add_argument("--dry-run", action="store_true", help="прогнати на копії й оцінити час")
+    parser.add_argument("--status", action="store_true")
+    parser.add_argument("--vacuum", action="store_true", help="увімкнути incremental auto_vacuum (VACUUM усього файлу)")
+    parser.add_argument("--batch", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    if args.dry_run:
+        report = dry_run(args.db, args.batch)
+        print(f"Рядків: {report['rows']}; нові міграції: {report['pending'] or 'немає'}; схема: {report['schema_s']} с")
+        for version, r in report["backfills"].items():
+            print(f"  v{version}: {r['batches']} пачок, робота {r['work_s']} с, онлайн ~{r['online_estimate_s']} с")
+        return
+
+    if args.vacuum:
+        conn = sqlite3.connect(args.db, timeout=30)
+        changed = enable_incremental_vacuum(conn)
+        conn.close()
+        print("auto_vacuum = INCREMENTAL" + ("" if changed else " (вже було)"))
+        return
+
+    conn = sqlite3.connect(args.db)
+    if not args.status:
+        apply_schema(conn)
+        run_backfills(conn, args.batch)
+    names = {m.version: m.name for m in MIGRATIONS}
+    for version, (state, cursor) in sorted(status(conn).items()):
+        print(f"v{version} {names.get(version, '?'):24s} {state:8s} cursor={cursor}")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
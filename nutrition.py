@@ -0,0 +1,279 @@
+import csv
+import logging
+import operator
+import os
+import threading
+import typing
+
+from log import fields
+from product_parser import normalize_name
+
+if typing.TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# БЖУ й калорії офлайн: таблиця nutrients.csv (на 100 г) вантажиться в масиви numpy при першому
+# зверненні, а будь-який набір продуктів — холодильник, рецепт (extract_ingredients) чи тижневий
+# план — рахується однією векторною операцією: назви → рядки таблиці, одиниці → грами, далі
+# грами × (БЖУ на грам) і сума по групах через bincount. Python-цикл лишається лише на пошук
+# назви, і той кешується. numpy імпортується ліниво — імпорт модуля нічого не вантажить.
+
+TABLE_PATH = os.getenv("NUTRIENTS_PATH") or os.path.join(os.path.dirname(os.path.abspath(__file__)), "nutrients.csv")
+
+COLUMNS = ("kcal", "protein", "fat", "carbs")
+
+
+class Macros(typing.NamedTuple):
+    kcal: float
+    protein: float
+    fat: float
+    carbs: float
+
+    def __str__(self):
+        return f"{self.kcal:.0f} ккал · Б {self.protein:.0f} г · Ж {self.fat:.0f} г · В {self.carbs:.0f} г"
+
+
+class Summary(typing.NamedTuple):
+    macros: Macros
+    unknown: typing.List[str]  # продукти, яких немає в таблиці або з невідомою одиницею
+
+
+Entry = typing.Tuple[str, float, str]  # (назва, кількість, одиниця)
+
+# ====== Одиниці ======
+_MASS, _VOLUME, _PIECE = 0, 1, 2
+# одиниця → (вид, множник): маса — в грами, обʼєм — у мл (далі × густина), штуки — × вага штуки
+_UNITS = {
+    "г": (_MASS, 1.0), "гр": (_MASS, 1.0), "грам": (_MASS, 1.0), "кг": (_MASS, 1000.0), "мг": (_MASS, 0.001),
+    "мл": (_VOLUME, 1.0), "л": (_VOLUME, 1000.0),
+    "ч.л.": (_VOLUME, 5.0), "ч.л": (_VOLUME, 5.0), "ст.л.": (_VOLUME, 15.0), "ст.л": (_VOLUME, 15.0),
+    "склянка": (_VOLUME, 250.0), "склянки": (_VOLUME, 250.0),
+    "шт": (_PIECE, 1.0), "шт.": (_PIECE, 1.0), "зубчик": (_PIECE, 1.0),
+}
+_UNIT_CODES = {unit: code for code, unit in enumerate(_UNITS)}
+
+
+class _Memo(dict):
+    """Кеш функції одного аргументу: map(memo.__getitem__, …) іде без Python-виклику на кожен елемент."""
+
+    def __init__(self, fn: typing.Callable[[str], int], max_size: int):
+        super().__init__()
+        self.fn = fn
+        self.max_size = max_size
+
+    def __missing__(self, key: str) -> int:
+        if len(self) >= self.max_size:
+            self.clear()  # назви вводять користувачі — не даємо кешу рости без меж
+        value = self[key] = self.fn(key)
+        return value
+
+
+class Table:
+    def __init__(self, path: str):
+        import numpy as np
+
+        names, rows, piece, density = [], [], [], []
+        self.index: typing.Dict[str, int] = {}
+        with open(path, encoding="utf-8") as f:
+            reader = csv.DictReader((line for line in f if not line.startswith("#")), delimiter=";")
+            for row in reader:
+                i = len(names)
+                names.append(row["name"])
+                rows.append([float(row[c]) for c in COLUMNS])
+                piece.append(float(row["piece_g"]) if row["piece_g"] else np.nan)
+                density.append(float(row["density"]) if row["density"] else 1.0)
+                for alias in [row["name"]] + [a for a in (row["aliases"] or "").split("|") if a]:
+                    self.index.setdefault(alias.strip(), i)
+
+        self.names = names
+        # рядок на продукт, колонки — COLUMNS на 1 г; останній рядок — нулі для невідомих
+        self.per_gram = np.vstack([np.asarray(rows, dtype=np.float64) / 100.0, np.zeros((1, len(COLUMNS)))])
+        self.unknown_row = len(names)
+        # вага штуки / густина для кожного продукту × вид одиниці → множник у грами
+        self.piece_g = np.append(np.asarray(piece, dtype=np.float64), np.nan)
+        self.density = np.append(np.asarray(density, dtype=np.float64), 1.0)
+        self.unit_kind = np.asarray([kind for kind, _ in _UNITS.values()] + [-1], dtype=np.int8)
+        self.unit_scale = np.asarray([scale for _, scale in _UNITS.values()] + [np.nan], dtype=np.float64)
+        self.unknown_unit = len(_UNITS)
+        self._rows = _Memo(self._lookup, 65536)
+        self._unit_codes = _Memo(self._unit_code, 1024)
+
+    def _lookup(self, name: str) -> int:
+        """Рядок таблиці для назви: повна назва, синонім, далі без останніх слів («помідори чері» → «помідори»)."""
+        words = name.lower().replace("ё", "е").split()
+        while words:
+            candidate = " ".join(words)
+            for key in (candidate, normalize_name(candidate)):
+                i = self.index.get(key)
+                if i is not None:
+                    return i
+            words.pop()
+        return self.unknown_row
+
+    def _unit_code(self, unit: str) -> int:
+        return _UNIT_CODES.get(unit.lower(), self.unknown_unit)
+
+    def encode(self, names: typing.Sequence[str], units: typing.Sequence[str]
+               ) -> typing.Tuple["np.ndarray", "np.ndarray"]:
+        """Назви й одиниці → індекси рядків таблиці й одиниць (map по кешах, без циклу в Python)."""
+        import numpy as np
+
+        return (np.fromiter(map(self._rows.__getitem__, names), dtype=np.intp, count=len(names)),
+                np.fromiter(map(self._unit_codes.__getitem__, units), dtype=np.intp, count=len(units)))
+
+    def lookup(self, name: str) -> int:
+        return self._rows[name]
+
+    def grams(self, rows: "np.ndarray", units: "np.ndarray", qty: "np.ndarray") -> "np.ndarray":
+        """Кількості в грамах; NaN — не вдалося перевести (невідома одиниця чи вага штуки)."""
+        import numpy as np
+
+        kind = self.unit_kind[units]
+        factor = np.where(kind == _VOLUME, self.density[rows], np.where(kind == _PIECE, self.piece_g[rows], 1.0))
+        grams = qty * self.unit_scale[units] * factor
+        grams[rows == self.unknown_row] = np.nan
+        return grams
+
+    def totals_by(self, groups: "np.ndarray", rows: "np.ndarray", units: "np.ndarray", qty: "np.ndarray",
+                  size: int) -> "np.ndarray":
+        """БЖУ по групах (групи — цілі 0..size-1): масив size × COLUMNS. Невідоме не рахується."""
+        import numpy as np
+
+        grams = np.nan_to_num(self.grams(rows, units, qty), nan=0.0)
+        weighted = self.per_gram[rows] * grams[:, None]
+        return np.stack([np.bincount(groups, weights=weighted[:, c], minlength=size) for c in range(len(COLUMNS))],
+                        axis=1)
+
+
+_table: typing.Optional[Table] = None
+_lock = threading.Lock()
+
+
+def table() -> Table:
+    """Таблиця продуктів — вантажиться один раз, при першому зверненні (або warm_up на старті)."""
+    global _table
+    if _table is None:
+        with _lock:
+            if _table is None:
+                _table = Table(TABLE_PATH)
+                logger.info("🥗 Таблицю БЖУ завантажено", extra=fields(products=len(_table.names), path=TABLE_PATH))
+    return _table
+
+
+def warm_up():
+    table()
+
+
+# ====== Підрахунок ======
+def summarize(entries: typing.Iterable[Entry]) -> Summary:
+    """БЖУ для набору продуктів (холодильник або рецепт) + що не вдалося врахувати."""
+    entries = list(entries)
+    if not entries:
+        return Summary(Macros(0.0, 0.0, 0.0, 0.0), [])
+    import numpy as np
+
+    t = table()
+    names, qty, units = zip(*entries)
+    rows, unit_codes = t.encode(names, units)
+    qty = np.asarray(qty, dtype=np.float64)
+    grams = t.grams(rows, unit_codes, qty)
+    total = t.totals_by(np.zeros(len(entries), dtype=np.intp), rows, unit_codes, qty, 1)[0]
+    unknown = [names[i] for i in np.flatnonzero(np.isnan(grams))]
+    return Summary(Macros(*(round(float(v), 1) for v in total)), unknown)
+
+
+def recipe_summary(ingredients: typing.Dict[typing.Tuple[str, str], float]) -> Summary:
+    """БЖУ рецепта з extract_ingredients: {(назва, одиниця): кількість}."""
+    return summarize((name, qty, unit) for (name, unit), qty in ingredients.items())
+
+
+def totals_by_key(rows: typing.Iterable[typing.Tuple[typing.Hashable, str, float, str]]
+                  ) -> typing.Dict[typing.Hashable, Macros]:
+    """
+    БЖУ багатьох наборів за раз: рядки (ключ, назва, кількість, одиниця) → {ключ: Macros}.
+    Ключ — user_id для аналітики по холодильниках, день для тижневого плану тощо (одного типу).
+    """
+    rows = list(rows)
+    if not rows:
+        return {}
+    import numpy as np
+
+    t = table()
+    # по колонці за прохід: zip(*rows) на сотнях тисяч рядків у рази повільніший
+    keys, names, qty, units = (list(map(operator.itemgetter(c), rows)) for c in range(4))
+    unique, groups = np.unique(np.asarray(keys), return_inverse=True)
+    totals = t.totals_by(groups.ravel(), *t.encode(names, units), np.asarray(qty, dtype=np.float64), len(unique))
+    return dict(zip(unique.tolist(), map(Macros._make, totals.round(1).tolist())))
+
+
+# ====== Денна норма ======
+GOALS = {
+    # ціль → (множник калорій, білок г/кг)
+    "схуднення": (0.85, 2.0),
+    "підтримка": (1.0, 1.6),
+    "набір": (1.1, 1.8),
+}
+GOAL_ALIASES = {"схуднути": "схуднення", "сушка": "схуднення", "підтримка": "підтримка", "баланс": "підтримка",
+                "набір": "набір", "маса": "набір", "набрати": "набір"}
+FAT_G_PER_KG = 0.9
+DEFAULT_ACTIVITY = 1.55  # 3–5 тренувань на тиждень
+
+
+def daily_targets(profile: dict) -> typing.Optional[Macros]:
+    """Денна норма з профілю (Міффлін — Сан Жеор × активність × ціль); None — якщо даних не вистачає."""
+    weight, height, age, sex = (profile.get(k) for k in ("weight_kg", "height_cm", "age", "sex"))
+    if not (weight and height and age and sex):
+        return None
+    bmr = 10 * weight + 6.25 * height - 5 * age + (5 if sex == "ч" else -161)
+    calories, protein_per_kg = GOALS.get(profile.get("goal") or "підтримка", GOALS["підтримка"])
+    kcal = bmr * (profile.get("activity") or DEFAULT_ACTIVITY) * calories
+    protein = protein_per_kg * weight
+    fat = FAT_G_PER_KG * weight
+    carbs = max(0.0, (kcal - protein * 4 - fat * 9) / 4)
+    return Macros(round(kcal), round(protein), round(fat), round(carbs))
+
+
+def format_summary(summary: Summary, targets: typing.Optional[Macros] = None, title: str = "БЖУ") -> str:
+    text = f"🏋️ {title}: {summary.macros}"
+    if targets and targets.kcal:
+        text += f" (~{summary.macros.kcal / targets.kcal:.0%} денної норми)"
+    if summary.unknown:
+        shown = ", ".join(summary.unknown[:5]) + ("…" if len(summary.unknown) > 5 else "")
+        text += f"\n   без урахування: {shown}"
+    return text
+
+
+_SEX = {"ч": "ч", "чол": "ч", "m": "ч", "ж": "ж", "жін": "ж", "f": "ж"}
+
+
+def parse_goal(args: typing.List[str]) -> typing.Tuple[dict, typing.Optional[str]]:
+    """
+    Аргументи /goal у будь-якому порядку: ціль, стать (ч/ж), числа — вага кг, зріст см, вік
+    (саме в такому порядку), коефіцієнт активності 1.2–1.9. Повертає (значення, помилка).
+    """
+    values: dict = {}
+    numbers = []
+    for arg in args:
+        word = arg.lower().strip(",")
+        if word in GOAL_ALIASES or word in GOALS:
+            values["goal"] = GOAL_ALIASES.get(word, word)
+        elif word in _SEX:
+            values["sex"] = _SEX[word]
+        else:
+            try:
+                number = float(word.replace(",", "."))
+            except ValueError:
+                return {}, f"не зрозумів «{arg}»"
+            if 1.0 <= number <= 2.5 and "." in word.replace(",", "."):
+                values["activity"] = number
+            else:
+                numbers.append(number)
+    for key, number, low, high in zip(("weight_kg", "height_cm", "age"), numbers,
+                                      (25, 100, 10), (300, 250, 110)):
+        if not low <= number <= high:
+            return {}, f"{number:g} — не схоже на {'вагу' if key == 'weight_kg' else 'зріст' if key == 'height_cm' else 'вік'}"
+        values[key] = int(number) if key == "age" else number
+    if len(numbers) > 3:
+        return {}, "забагато чисел: вага, зріст, вік"
+    return values, None
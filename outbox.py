@@ -0,0 +1,202 @@
+import asyncio
+import logging
+import os
+import time
+import typing
+import uuid
+
+from aiogram import Bot
+from aiogram.utils import exceptions
+
+import metrics
+from db import claim_outbox, enqueue_notifications, get_outbox_stats, mark_outbox_failed, mark_outbox_sent, purge_outbox
+from log import fields
+
+logger = logging.getLogger(__name__)
+
+# Сповіщення (нагадування, підсумки) не надсилаються з планувальника напряму:
+# планувальник одним комітом кладе їх у таблицю outbox, а цей воркер доставляє
+# з дозволеною швидкістю. Рядок унікальний на (користувач, день, вид), тож
+# повторний запуск планувальника після падіння нікому не надішле двічі, а
+# недоставлене після рестарту просто дочитується з таблиці.
+
+RATE = float(os.getenv("OUTBOX_RATE") or 25)  # повідомлень за секунду (ліміт Telegram ~30)
+CONCURRENCY = int(os.getenv("OUTBOX_CONCURRENCY") or 10)
+MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS") or 5)
+RETRY_BASE = 30  # с; далі подвоюється з кожною спробою
+KEEP_DAYS = int(os.getenv("OUTBOX_KEEP_DAYS") or 7)
+POLL_SECONDS = 5.0
+MARK_RETRIES = 5  # запис результату доставки: ~8 с перечікування зайнятої БД
+# Скільки рядок лишається за процесом, що його забрав ('sending'); далі вважається, що процес упав,
+# і рядок доставить наступний лідер. Має бути більшим за час доставки однієї пачки
+CLAIM_SECONDS = int(os.getenv("OUTBOX_CLAIM_SECONDS") or 300)
+
+# Помилки, після яких повторювати немає сенсу: користувач заблокував бота, чату нема тощо
+_PERMANENT = (exceptions.Unauthorized, exceptions.ChatNotFound, exceptions.BadRequest)
+
+enqueued_total = metrics.Counter("bot_outbox_enqueued_total", "Нові рядки outbox (дублікати не рахуються)", ())
+delivered_total = metrics.Counter("bot_outbox_delivered_total", "Спроби доставки з outbox", ("result",))
+
+
+class OutboxWorker:
+    def __init__(self, bot: Bot, rate: float = RATE, concurrency: int = CONCURRENCY,
+                 is_leader: typing.Callable[[], bool] = lambda: True):
+        self.bot = bot
+        self.rate = rate
+        self.interval = 1 / rate if rate > 0 else 0.0
+        self.concurrency = concurrency
+        self.is_leader = is_leader  # у режимі воркерів доставляє лише лідер — ліміт Telegram спільний
+        self.backlog: typing.Dict[str, int] = {}
+        self.oldest_pending: typing.Optional[int] = None
+        self.drain_rate = 0.0  # згладжена швидкість доставки, повідомлень/с
+        self._wakeup: typing.Optional[asyncio.Event] = None
+        self._paused_until = 0.0
+        self._task: typing.Optional[asyncio.Task] = None
+        self._last_purge = 0.0
+
+    def notify(self):
+        """Є нові рядки — не чекати наступного опитування."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _mark(self, mark, outbox_id: int, *args, **kwargs):
+        """Записує результат доставки; зайняту БД перечікує, а помилку лише логує — пачка доставляється далі."""
+        for attempt in range(MARK_RETRIES):
+            try:
+                if not await mark(outbox_id, *args, **kwargs):
+                    # оренда минула й рядок уже забрав інший процес — його результат головніший
+                    logger.warning("⚠️ Оренду рядка outbox втрачено, результат не записано",
+                                   extra=fields(outbox_id=outbox_id))
+                return
+            except Exception:
+                if attempt == MARK_RETRIES - 1:
+                    logger.exception("❌ Не вдалося записати результат доставки", extra=fields(outbox_id=outbox_id))
+                    return
+                await asyncio.sleep(0.5 * 2 ** attempt)
+
+    async def _deliver(self, token: str, outbox_id: int, user_id: int, text: str, attempts: int) -> bool:
+        try:
+            await self.bot.send_message(user_id, text)
+        except exceptions.RetryAfter as e:
+            # Telegram просить зачекати — пауза для всієї доставки, спроба не «згорає» даремно
+            self._paused_until = time.monotonic() + e.timeout
+            await self._mark(mark_outbox_failed, outbox_id, token, str(e), int(time.time()) + e.timeout,
+                             count_attempt=False)
+            delivered_total.inc(("retry",))
+            return False
+        except _PERMANENT as e:
+            await self._mark(mark_outbox_failed, outbox_id, token, f"{type(e).__name__}: {e}", None)
+            delivered_total.inc(("failed",))
+            return False
+        except Exception as e:
+            final = attempts + 1 >= MAX_ATTEMPTS
+            retry_at = None if final else int(time.time()) + RETRY_BASE * 2 ** attempts
+            await self._mark(mark_outbox_failed, outbox_id, token, f"{type(e).__name__}: {e}", retry_at)
+            delivered_total.inc(("failed" if final else "retry",))
+            logger.warning("⚠️ Не вдалося доставити сповіщення", extra=fields(
+                outbox_id=outbox_id, user_id=user_id, attempts=attempts + 1, final=final, error=str(e),
+            ))
+            return False
+        # повідомлення вже в Telegram: збій запису не має кидати виняток у пачку
+        await self._mark(mark_outbox_sent, outbox_id, token)
+        delivered_total.inc(("sent",))
+        return True
+
+    async def drain_once(self) -> int:
+        """Доставляє одну пачку готових рядків із рівномірним темпом; повертає кількість доставлених."""
+        # пачка — стільки, скільки цей воркер встигає рівномірно надіслати за POLL_SECONDS (rate 0 — без темпу)
+        batch = max(1, int((self.rate if self.rate > 0 else RATE) * POLL_SECONDS))
+        # мітка оренди цієї пачки: позначити рядок може лише той, хто його забрав
+        token = uuid.uuid4().hex
+        rows = await claim_outbox(int(time.time()), batch, CLAIM_SECONDS, token)
+        if not rows:
+            return 0
+        slots = asyncio.Semaphore(self.concurrency)
+        started = time.monotonic()
+        next_slot = started
+
+        async def send(row):
+            async with slots:
+                return await self._deliver(token, *row)
+
+        tasks = []
+        for row in rows:
+            now = time.monotonic()
+            wait = max(next_slot, self._paused_until) - now
+            if wait > 0:
+                await asyncio.sleep(wait)
+            next_slot = max(now, next_slot) + self.interval
+            tasks.append(asyncio.ensure_future(send(row)))
+        sent = sum(await asyncio.gather(*tasks))
+
+        elapsed = max(time.monotonic() - started, 1e-3)
+        self.drain_rate = 0.7 * self.drain_rate + 0.3 * (sent / elapsed)
+        return sent
+
+    async def refresh_stats(self):
+        self.backlog, self.oldest_pending = await get_outbox_stats()
+        if time.monotonic() - self._last_purge > 3600:
+            self._last_purge = time.monotonic()
+            await purge_outbox(int(time.time()) - KEEP_DAYS * 86400)
+
+    async def _run(self):
+        while True:
+            processed = 0
+            try:
+                if self.is_leader():
+                    processed = await self.drain_once()
+                    await self.refresh_stats()
+            except Exception:
+                logger.exception("❌ Помилка доставки з outbox")
+            if processed:
+                continue
+            self.drain_rate *= 0.7
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    async def start(self):
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.ensure_future(self._run())
+            logger.info("📬 Доставка з outbox запущена", extra=fields(rate=RATE, concurrency=self.concurrency))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+worker: typing.Optional[OutboxWorker] = None
+
+metrics.Gauge("bot_outbox_backlog", "Рядки outbox за статусом", lambda: {
+    (status,): count for status, count in (worker.backlog if worker else {}).items()
+}, ("status",))
+metrics.Gauge("bot_outbox_oldest_pending_seconds", "Вік найстарішого недоставленого сповіщення", lambda: {
+    (): time.time() - worker.oldest_pending
+} if worker and worker.oldest_pending else {})
+metrics.Gauge("bot_outbox_drain_rate", "Згладжена швидкість доставки, повідомлень/с",
+              lambda: {(): round(worker.drain_rate, 3)} if worker else {})
+
+
+async def enqueue(rows: typing.List[typing.Tuple[int, str, str, str]],
+                  reschedule: typing.List[typing.Tuple[int, int]] = ()) -> int:
+    """Кладе (user_id, day, kind, text) в outbox одною транзакцією (разом з reschedule для reminders)."""
+    if not rows and not reschedule:
+        return 0
+    added = await enqueue_notifications(rows, reschedule)
+    if added:
+        enqueued_total.inc((), added)
+        if worker is not None:
+            worker.notify()
+    return added
+
+
+async def setup(bot: Bot, is_leader: typing.Callable[[], bool] = lambda: True):
+    global worker
+    if worker is None:
+        worker = OutboxWorker(bot, is_leader=is_leader)
+        await worker.start()
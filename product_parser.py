@@ -0,0 +1,120 @@
+import functools
+import re
+import typing
+
+# Розбір введення продуктів: "назва кількість одиниця [дд.мм.рррр], ..." за один прохід по повідомленню.
+# Шаблони скомпільовані один раз, дата перевіряється арифметикою замість strptime,
+# а кожен відхилений елемент повертається з позицією й причиною, щоб бот міг про нього сказати.
+
+Item = typing.Tuple[str, float, str, typing.Optional[str]]  # (назва, кількість, одиниця, термін дд.мм.рррр)
+
+DATE_RE = re.compile(r"\b(\d{2})\.(\d{2})\.(\d{4})\b")
+_TRAILING_RE = re.compile(r"[\(\)\-–—]*\s*$")  # дужки/тире, що лишились після вирізаної дати
+_TRAILING_CHARS = "()-–—"
+_DAYS_IN_MONTH = (0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+_SYNONYMS = {
+    "помідор": "томат",
+    "помідори": "томат",
+    "огірки": "огірок",
+    "огурець": "огірок",
+    "яйце": "яйця"
+}
+
+
+class ParseError(typing.NamedTuple):
+    index: int   # порядковий номер елемента в повідомленні (з 0)
+    start: int   # зсув початку елемента в тексті
+    raw: str
+    reason: str
+
+
+class ParseResult(typing.NamedTuple):
+    items: typing.List[Item]
+    errors: typing.List[ParseError]
+
+
+def normalize_name(name: str) -> str:
+    name = name.lower()
+    return _SYNONYMS.get(name, name)
+
+
+def is_valid_date(day: int, month: int, year: int) -> bool:
+    if year < 1 or not 1 <= month <= 12 or day < 1:
+        return False
+    if month == 2 and year % 4 == 0 and (year % 100 != 0 or year % 400 == 0):
+        return day <= 29
+    return day <= _DAYS_IN_MONTH[month]
+
+
+# різних дат у введенні небагато — кешуємо перевірку рядка дд.мм.рррр
+@functools.lru_cache(maxsize=4096)
+def _valid_date_str(value: str) -> bool:
+    return is_valid_date(int(value[0:2]), int(value[3:5]), int(value[6:10]))
+
+
+_INF = float("inf")
+
+
+def _parse(s: str) -> typing.Union[Item, str]:
+    """Ядро розбору вже обрізаного непорожнього елемента: продукт або причина відмови."""
+    expiry = None
+    # дата завжди містить дві крапки — без них регулярний вираз не запускаємо
+    if s.count(".") > 1:
+        m = DATE_RE.search(s)
+        if m is not None:
+            expiry = m.group(0)
+            if not _valid_date_str(expiry):
+                return f"немає такої дати {expiry}"
+            start, end = m.span()
+            s = (s[:start] + s[end:]).strip()
+            if s and s[-1] in _TRAILING_CHARS:
+                s = _TRAILING_RE.sub("", s).strip()
+
+    parts = s.split()
+    if len(parts) < 3:
+        return "потрібно: назва, кількість, одиниця"
+    qty = parts[-2]
+    try:
+        quantity = float(qty.replace(",", ".") if "," in qty else qty)
+    except ValueError:
+        return f"кількість «{qty}» — не число"
+    if not 0 < quantity < _INF:
+        return f"кількість «{qty}» має бути більшою за 0"
+    name = " ".join(parts[:-2]).lower()
+    return _SYNONYMS.get(name, name), quantity, parts[-1], expiry
+
+
+def parse_item(raw: str) -> typing.Tuple[typing.Optional[Item], typing.Optional[str]]:
+    """Один елемент → (продукт, None) або (None, причина); порожній елемент — (None, None)."""
+    s = raw.strip()
+    if not s:
+        return None, None
+    result = _parse(s)
+    return (None, result) if isinstance(result, str) else (result, None)
+
+
+def parse_products(text: str) -> ParseResult:
+    """Усі елементи повідомлення через кому: розпізнані продукти й помилки з позиціями."""
+    items: typing.List[Item] = []
+    errors: typing.List[ParseError] = []
+    start = index = 0
+    for raw in text.split(","):
+        s = raw.strip()
+        if s:
+            result = _parse(s)
+            if type(result) is str:
+                errors.append(ParseError(index, start + raw.index(s[0]), s, result))
+            else:
+                items.append(result)
+            index += 1
+        start += len(raw) + 1
+    return ParseResult(items, errors)
+
+
+def format_errors(errors: typing.List[ParseError], limit: int = 10) -> str:
+    """Людський перелік відхилених елементів для відповіді користувачу."""
+    lines = [f"• «{e.raw}» — {e.reason}" for e in errors[:limit]]
+    if len(errors) > limit:
+        lines.append(f"…і ще {len(errors) - limit}")
+    return "\n".join(lines)
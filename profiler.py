@@ -0,0 +1,190 @@
+import asyncio
+import collections
+import inspect
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+import typing
+
+from aiogram import Dispatcher
+
+import metrics
+from log import fields
+
+logger = logging.getLogger(__name__)
+
+# Профілювання без зовнішніх залежностей і без asyncio debug-режиму:
+# - heartbeat-корутина міряє лаг event loop;
+# - потік-сторож помічає, що heartbeat не оновлювався довше за поріг, і знімає стек
+#   головного потоку через sys._current_frames() — тобто бачить, хто саме блокує loop;
+# - семплер на вимогу адміна кілька секунд знімає стеки з частотою ~200 Гц.
+# Усе це лише читає фрейми з іншого потоку, нічого не патчить і не сповільнює хендлери.
+
+loop_lag_seconds = metrics.Histogram("bot_loop_lag_seconds", "Запізнення heartbeat-корутини event loop", ())
+loop_stalls = metrics.Counter("bot_loop_stalls_total", "Скільки разів event loop був заблокований довше за поріг", ("handler",))
+
+# фрейми, у яких loop просто чекає на I/O
+_IDLE_FUNCS = {"select", "poll", "epoll", "_run_once"}
+
+
+class LoopProfiler:
+    def __init__(self, block_threshold: float = 0.1, interval: float = 0.05):
+        self.block_threshold = block_threshold
+        self.interval = interval
+        self._names: typing.Dict[typing.Any, str] = {}  # code object → імʼя хендлера/задачі
+        self._loop_thread: typing.Optional[int] = None
+        self._beat = time.monotonic()
+        self._stop = threading.Event()
+        self._heartbeat: typing.Optional[asyncio.Task] = None
+        self._watchdog: typing.Optional[threading.Thread] = None
+        self._sampling = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "LoopProfiler":
+        return cls(block_threshold=float(os.getenv("PROFILER_BLOCK_MS") or 100) / 1000)
+
+    # ====== Хто є хто ======
+    def watch(self, *funcs, name: typing.Optional[str] = None):
+        """Реєструє функції, імена яких показувати в звітах (хендлери, крон-задачі)."""
+        for func in funcs:
+            func = inspect.unwrap(getattr(func, "func", func))  # aiocron.Cron → функція
+            self._names[func.__code__] = name or func.__name__
+
+    def watch_dispatcher(self, dp: Dispatcher):
+        for observer in (dp.message_handlers, dp.callback_query_handlers):
+            for handler_obj in observer.handlers:
+                # роутер callback-ів: у звітах — хендлери маршрутів, а не спільна обгортка
+                routed = getattr(handler_obj.handler, "routed_handlers", None)
+                self.watch(*(routed() if routed else [handler_obj.handler]))
+
+    def _handler_of(self, frame) -> str:
+        # найзовнішній зареєстрований фрейм — хендлер, з якого все почалося
+        found = "unknown"
+        while frame is not None:
+            found = self._names.get(frame.f_code, found)
+            frame = frame.f_back
+        return found
+
+    # ====== Лаг і сторож ======
+    async def start(self):
+        if self._heartbeat is not None:
+            return
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._heartbeat = asyncio.ensure_future(self._run_heartbeat())
+        self._watchdog = threading.Thread(target=self._run_watchdog, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+        logger.info("🩺 Профайлер event loop увімкнено", extra=fields(block_ms=round(self.block_threshold * 1000)))
+
+    async def stop(self):
+        self._stop.set()
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            await asyncio.gather(self._heartbeat, return_exceptions=True)
+            self._heartbeat = None
+
+    async def _run_heartbeat(self):
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(self.interval)
+            self._beat = now = time.monotonic()
+            loop_lag_seconds.observe((), max(0.0, now - start - self.interval))
+
+    def _run_watchdog(self):
+        stalled_since: typing.Optional[float] = None
+        handler = "unknown"
+        while not self._stop.wait(self.block_threshold / 2):
+            beat = self._beat
+            behind = time.monotonic() - beat
+            if behind > self.block_threshold and stalled_since is None:
+                stalled_since = beat
+                frame = sys._current_frames().get(self._loop_thread)
+                handler = self._handler_of(frame)
+                stack = "".join(traceback.format_stack(frame, limit=25)) if frame is not None else ""
+                logger.warning("🐢 Event loop заблоковано", extra=fields(
+                    handler=handler, blocked_ms=round(behind * 1000), stack=stack,
+                ))
+            elif stalled_since is not None and beat != stalled_since:
+                loop_stalls.inc((handler,))
+                logger.warning("🐢 Event loop знову вільний", extra=fields(
+                    handler=handler, blocked_ms=round((beat - stalled_since) * 1000),
+                ))
+                stalled_since = None
+
+    # ====== Семплер на вимогу ======
+    def _sample(self, target: typing.Optional[str], seconds: float, hz: float) -> dict:
+        stacks: typing.Counter[tuple] = collections.Counter()
+        total = idle = 0
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            frame = sys._current_frames().get(self._loop_thread)
+            total += 1
+            if frame is None or frame.f_code.co_name in _IDLE_FUNCS:
+                idle += 1
+            else:
+                chain = []
+                while frame is not None:
+                    chain.append(frame.f_code)
+                    frame = frame.f_back
+                chain.reverse()
+                if target is None or any(self._names.get(code) == target for code in chain):
+                    stacks[tuple(chain)] += 1
+            time.sleep(1 / hz)
+        return {"target": target, "seconds": seconds, "total": total, "idle": idle, "stacks": stacks}
+
+    async def sample(self, target: typing.Optional[str] = None, seconds: float = 30, hz: float = 200) -> dict:
+        """Знімає стеки event loop протягом `seconds`; target — імʼя хендлера або None (усе)."""
+        if self._loop_thread is None:
+            self._loop_thread = threading.get_ident()
+        if not self._sampling.acquire(blocking=False):
+            raise RuntimeError("Профілювання вже триває")
+        try:
+            return await asyncio.get_running_loop().run_in_executor(None, self._sample, target, seconds, hz)
+        finally:
+            self._sampling.release()
+
+
+def _label(code) -> str:
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+def format_report(report: dict, top: int = 15) -> typing.Tuple[str, str]:
+    """Текст для адміна (топ функцій за включним часом) і folded stacks для flamegraph.pl / speedscope."""
+    stacks = report["stacks"]
+    matched = sum(stacks.values())
+    busy = report["total"] - report["idle"]
+    inclusive: typing.Counter[str] = collections.Counter()
+    own: typing.Counter[str] = collections.Counter()
+    for chain, count in stacks.items():
+        for label in {_label(code) for code in chain}:
+            inclusive[label] += count
+        own[_label(chain[-1])] += count
+
+    lines = [
+        f"🔬 Профіль: {report['target'] or 'усі хендлери'}, {report['seconds']:g} с",
+        f"Семплів: {report['total']}, loop зайнятий: {busy} ({100 * busy / max(1, report['total']):.1f}%), "
+        f"з них у цілі: {matched}",
+    ]
+    if matched:
+        lines.append("\nВключно (власний) час:")
+        for label, count in inclusive.most_common(top):
+            lines.append(f"{100 * count / matched:5.1f}% ({100 * own[label] / matched:4.1f}%)  {label}")
+    folded = "\n".join(
+        ";".join(_label(code) for code in chain) + f" {count}" for chain, count in stacks.most_common()
+    )
+    return "\n".join(lines), folded
+
+
+profiler = LoopProfiler.from_env()
+
+
+async def setup(dp: Dispatcher, *funcs):
+    """Запамʼятовує імена хендлерів (для /cpuprofile); PROFILER=1 вмикає постійний нагляд за loop."""
+    profiler.watch_dispatcher(dp)
+    profiler.watch(*funcs)
+    if os.getenv("PROFILER") == "1":
+        await profiler.start()
@@ -0,0 +1,57 @@
+import os
+import re
+import typing
+from datetime import date
+
+from db import get_favourites_coverage, save_recipe, search_recipes
+from product_parser import normalize_name
+
+# Бібліотека рецептів: кожен згенерований рецепт зберігається разом зі структурованими
+# інгредієнтами (ті самі, що списує «✅ Готую це!»). Улюблені лишаються назавжди, з решти —
+# останні RECIPES_KEEP на користувача. Пошук — FTS5 по назві й кроках, а «що приготувати
+# з улюблених» — один SQL-запит покриття холодильником, без LLM.
+
+RECIPES_KEEP = int(os.getenv("RECIPES_KEEP") or 50)
+SEARCH_LIMIT = 10
+TITLE_MAX = 80
+
+_TITLE_JUNK = "🔶*#_ \t"
+_WORD_RE = re.compile(r"\w+")
+
+
+def title_of(recipe: str) -> str:
+    """Назва страви — перший непорожній рядок рецепта без емодзі й розмітки."""
+    for line in recipe.splitlines():
+        title = line.strip().strip(_TITLE_JUNK)
+        if title:
+            return title[:TITLE_MAX]
+    return "Без назви"
+
+
+def fts_query(text: str) -> typing.Optional[str]:
+    """Запит користувача → FTS5 MATCH: кожне слово як префікс, усі слова обовʼязкові."""
+    words = _WORD_RE.findall(text.lower())
+    if not words:
+        return None
+    # у лапках — щоб слова на кшталт AND/NOT/NEAR не стали операторами
+    return " ".join(f'"{w}"*' for w in words[:8])
+
+
+async def save(user_id: int, meal_type: str, recipe: str,
+               ingredients: typing.Dict[typing.Tuple[str, str], float]) -> int:
+    rows = [(normalize_name(name), unit, quantity) for (name, unit), quantity in ingredients.items()]
+    return await save_recipe(user_id, meal_type, title_of(recipe), recipe, rows, RECIPES_KEEP)
+
+
+async def search(user_id: int, text: str) -> typing.List[typing.Tuple[int, str, bool]]:
+    match = fts_query(text)
+    return await search_recipes(user_id, match, SEARCH_LIMIT) if match else []
+
+
+async def favourites(user_id: int) -> typing.List[typing.Tuple[int, str, int, int]]:
+    """Улюблені з покриттям холодильником: (id, назва, інгредієнтів, є)."""
+    return await get_favourites_coverage(user_id, date.today().isoformat(), SEARCH_LIMIT)
+
+
+def coverage_label(total: int, covered: int) -> str:
+    return "✅ усе є" if covered >= total else f"{covered}/{total} є"
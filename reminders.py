@@ -0,0 +1,150 @@
+import logging
+import os
+import re
+import typing
+from datetime import date, datetime, timedelta, timezone
+from datetime import time as dtime
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from db import (
+    get_all_products_with_expiry,
+    get_due_reminders,
+    get_unscheduled_reminders,
+    set_next_reminders,
+)
+import outbox
+from log import fields
+
+logger = logging.getLogger(__name__)
+
+# Кожен користувач отримує нагадування у свій час і своєму часовому поясі.
+# Щоб не було сплеску о 09:00, кожному додається сталий зсув у межах вікна
+# REMINDER_SPREAD_MINUTES; щохвилинний тік бере лише тих, у кого next_reminder_at уже настав.
+# Тік планує суботній підсумок прострочених; про терміни, що спливають, — expiry_index.
+# Доставляє все outbox.py.
+
+DEFAULT_TZ = os.getenv("DEFAULT_TZ") or "Europe/Kyiv"
+DEFAULT_TIME = os.getenv("DEFAULT_REMINDER_TIME") or "09:00"
+SPREAD_SECONDS = int(os.getenv("REMINDER_SPREAD_MINUTES") or 60) * 60
+BATCH_SIZE = int(os.getenv("REMINDER_BATCH") or 500)
+WEEKLY_DAY = 5  # субота — день підсумку прострочених
+
+TIME_RE = re.compile(r"^([01]?\d|2[0-3]):([0-5]\d)$")
+
+
+def parse_time(value: str) -> typing.Optional[dtime]:
+    m = TIME_RE.match(value.strip())
+    return dtime(int(m.group(1)), int(m.group(2))) if m else None
+
+
+def parse_timezone(value: str) -> typing.Optional[ZoneInfo]:
+    try:
+        return ZoneInfo(value.strip())
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+
+
+def spread_offset(user_id: int) -> int:
+    # мультиплікативний хеш: сусідні user_id розходяться по всьому вікну, а зсув сталий між рестартами
+    return (user_id * 2654435761) % 2 ** 32 % SPREAD_SECONDS if SPREAD_SECONDS else 0
+
+
+def user_timezone(tz_name: typing.Optional[str]) -> ZoneInfo:
+    return parse_timezone(tz_name or DEFAULT_TZ) or ZoneInfo(DEFAULT_TZ)
+
+
+def local_moment(tz_name: typing.Optional[str], reminder_time: typing.Optional[str], day: date) -> datetime:
+    """Час нагадування в день `day` у поясі користувача, без розсіювання."""
+    at = parse_time(reminder_time or DEFAULT_TIME) or parse_time(DEFAULT_TIME)
+    return datetime.combine(day, at, tzinfo=user_timezone(tz_name))
+
+
+def reminder_moment(user_id: int, tz_name: typing.Optional[str], reminder_time: typing.Optional[str],
+                    day: date) -> datetime:
+    """Момент нагадування користувачу в його локальний день `day` (з урахуванням розсіювання)."""
+    return local_moment(tz_name, reminder_time, day) + timedelta(seconds=spread_offset(user_id))
+
+
+def next_reminder_at(user_id: int, tz_name: typing.Optional[str], reminder_time: typing.Optional[str],
+                     after: typing.Optional[datetime] = None) -> int:
+    """Unix-час найближчого нагадування після `after` (за замовчуванням — зараз)."""
+    local_now = (after or datetime.now(timezone.utc)).astimezone(user_timezone(tz_name))
+    day = local_now.date()
+    while True:
+        candidate = reminder_moment(user_id, tz_name, reminder_time, day)
+        if candidate > local_now:
+            return int(candidate.timestamp())
+        day += timedelta(days=1)
+
+
+def slot_day(user_id: int, tz_name: typing.Optional[str], scheduled_at: int) -> date:
+    """
+    Локальний день, до якого належить запланований момент: розсіювання може перенести 23:30
+    за північ, а запізнілий прохід — відбутися наступного дня, але нагадування — за день слоту.
+    """
+    slot = datetime.fromtimestamp(scheduled_at - spread_offset(user_id), timezone.utc)
+    return slot.astimezone(user_timezone(tz_name)).date()
+
+
+def _parse_ddmmyyyy(value: typing.Optional[str]) -> typing.Optional[date]:
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, "%d.%m.%Y").date()
+    except ValueError:
+        return None
+
+
+async def build_reminders(user_id: int, today: date) -> typing.List[typing.Tuple[str, str]]:
+    """(вид, текст) нагадувань користувачу на його локальну дату `today` (щоденні про терміни — в expiry_index)."""
+    if today.weekday() != WEEKLY_DAY:
+        return []
+    products = await get_all_products_with_expiry(user_id)
+    expired = [
+        f"{name} (до {expiry})" for name, _, _, expiry in products
+        if (_parse_ddmmyyyy(expiry) or today) < today
+    ]
+    if not expired:
+        return []
+    return [(
+        "expired_weekly",
+        "❗ У тебе є продукти з простроченим терміном придатності:\n"
+        + "\n".join(expired)
+        + "\n\nРекомендуємо видалити їх з бота та з холодильника 🗑",
+    )]
+
+
+async def tick(now: typing.Optional[datetime] = None) -> int:
+    """
+    Один прохід планувальника: тим, кому вже час, кладе нагадування в outbox і переносить
+    next_reminder_at — однією транзакцією, тож після падіння прохід можна просто повторити.
+    Повертає кількість оброблених користувачів.
+    """
+    now = now or datetime.now(timezone.utc)
+    now_ts = int(now.timestamp())
+
+    # нові користувачі: лише планування, без надсилання
+    fresh = await get_unscheduled_reminders(BATCH_SIZE)
+    if fresh:
+        await set_next_reminders([(uid, next_reminder_at(uid, tz, at, now)) for uid, tz, at in fresh])
+
+    due = await get_due_reminders(now_ts, BATCH_SIZE)
+    rows, schedule = [], []
+    for user_id, tz_name, at, scheduled_at in due:
+        today = slot_day(user_id, tz_name, scheduled_at)
+        for kind, text in await build_reminders(user_id, today):
+            rows.append((user_id, today.isoformat(), kind, text))
+        schedule.append((user_id, next_reminder_at(user_id, tz_name, at, now)))
+
+    if schedule:
+        added = await outbox.enqueue(rows, schedule)
+        logger.info("⏰ Нагадування заплановано", extra=fields(users=len(schedule), queued=added))
+    return len(schedule)
+
+
+def describe(settings: dict) -> str:
+    tz = settings.get("timezone") or DEFAULT_TZ
+    at = settings.get("reminder_time") or DEFAULT_TIME
+    if not settings.get("enabled", True):
+        return "🔕 Нагадування вимкнено."
+    return f"⏰ Нагадування щодня о {at} ({tz}), підсумок прострочених — щосуботи."
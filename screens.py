@@ -0,0 +1,65 @@
+import logging
+import typing
+
+from aiogram import types
+from aiogram.utils import exceptions
+
+import metrics
+from log import fields
+
+logger = logging.getLogger(__name__)
+
+# Екрани замість ланцюжків повідомлень: натискання кнопки перемальовує те саме
+# повідомлення (текст + клавіатура) одним editMessageText, а нове повідомлення
+# надсилається лише у відповідь на текст користувача або коли редагувати нема що
+# (повідомлення видалене, не текстове тощо). Короткі підтвердження — спливаючим
+# повідомленням через answerCallbackQuery, який і так обовʼязковий.
+
+# edit — перемальовано на місці, unchanged — нічого не змінилось (виклик не знадобився б),
+# send — нове повідомлення, fallback — редагування не вдалося й надіслано нове
+ui_calls = metrics.Counter("bot_ui_calls_total", "Як показано екран", ("kind",))
+
+Target = typing.Union[types.CallbackQuery, types.Message]
+
+# Помилки, після яких редагувати марно — показуємо новим повідомленням. Решта BadRequest
+# (розмітка, задовгий текст, клавіатура) — помилка в коді: нове повідомлення з тим самим вмістом теж упало б
+CANT_EDIT = (exceptions.MessageCantBeEdited, exceptions.MessageToEditNotFound)
+
+
+async def edit(message: types.Message, text: str, keyboard: typing.Optional[types.InlineKeyboardMarkup] = None,
+               **kwargs) -> types.Message:
+    """Перемальовує повідомлення бота; якщо не вийшло — надсилає нове в той самий чат."""
+    if message.text is not None:
+        try:
+            result = await message.edit_text(text, reply_markup=keyboard, **kwargs)
+            ui_calls.inc(("edit",))
+            return result if isinstance(result, types.Message) else message
+        except exceptions.MessageNotModified:
+            ui_calls.inc(("unchanged",))
+            return message
+        except CANT_EDIT as e:
+            logger.debug("Екран не відредаговано — надсилаю новим", extra=fields(
+                chat_id=message.chat.id, message_id=message.message_id, error=str(e),
+            ))
+            ui_calls.inc(("fallback",))
+    else:
+        ui_calls.inc(("send",))
+    return await message.answer(text, reply_markup=keyboard, **kwargs)
+
+
+async def show(target: Target, text: str, keyboard: typing.Optional[types.InlineKeyboardMarkup] = None,
+               notice: typing.Optional[str] = None, **kwargs) -> types.Message:
+    """
+    Показує екран. Для натискання кнопки — редагує повідомлення з цією кнопкою
+    (notice — спливаюче підтвердження; тоді хендлер не викликає callback_query.answer сам).
+    Для повідомлення користувача — надсилає нове.
+    """
+    if isinstance(target, types.CallbackQuery):
+        if notice is not None:
+            await target.answer(notice)
+        if target.message is not None:
+            return await edit(target.message, text, keyboard, **kwargs)
+        ui_calls.inc(("send",))
+        return await target.bot.send_message(target.from_user.id, text, reply_markup=keyboard, **kwargs)
+    ui_calls.inc(("send",))
+    return await target.answer(text, reply_markup=keyboard, **kwargs)
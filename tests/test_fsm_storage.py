@@ -0,0 +1,77 @@
+import asyncio
+import time
+
+from fsm_storage import SQLiteStorage
+
+
+def _storage(tmp_path, **kwargs) -> SQLiteStorage:
+    return SQLiteStorage(str(tmp_path / "fsm.db"), flush_interval=0.01, **kwargs)
+
+
+def test_state_survives_restart(tmp_path):
+    async def scenario():
+        storage = _storage(tmp_path)
+        await storage.set_state(chat=1, user=1, state="AddProductState:waiting_for_product")
+        await storage.update_data(chat=1, user=1, product_id=7)
+        await storage.close()
+
+        reopened = _storage(tmp_path)
+        assert await reopened.get_state(chat=1, user=1) == "AddProductState:waiting_for_product"
+        assert await reopened.get_data(chat=1, user=1) == {"product_id": 7}
+        await reopened.reset_state(chat=1, user=1)
+        await reopened.close()
+
+        empty = _storage(tmp_path)
+        assert await empty.get_state(chat=1, user=1) is None
+        assert await empty.get_data(chat=1, user=1) == {}
+        await empty.close()
+
+    asyncio.run(scenario())
+
+
+def test_stale_state_expires(tmp_path):
+    async def scenario():
+        storage = _storage(tmp_path, ttl=60)
+        await storage.set_state(chat=1, user=1, state="FeedbackState:waiting_for_text")
+        await storage.flush()
+        db = await storage._get_db()
+        await db.execute("UPDATE fsm_states SET updated_at = ?", (time.time() - 120,))
+        await db.commit()
+        assert await storage.get_state(chat=1, user=1) is None
+        await storage.close()
+
+    asyncio.run(scenario())
+
+
+def test_overlapping_flushes_keep_every_record(tmp_path):
+    async def scenario():
+        storage = _storage(tmp_path, batch_size=3)
+        db = await storage._get_db()
+        executemany = db.executemany
+
+        async def slow_executemany(*args):
+            await asyncio.sleep(0.05)  # перша пачка ще пишеться, коли заповнюється друга
+            return await executemany(*args)
+
+        db.executemany = slow_executemany
+        try:
+            first = asyncio.ensure_future(asyncio.gather(*(
+                storage.set_state(chat=user, user=user, state="first") for user in range(1, 4)
+            )))
+            await asyncio.sleep(0.01)
+            second = asyncio.ensure_future(asyncio.gather(*(
+                storage.set_state(chat=user, user=user, state="second") for user in range(4, 7)
+            )))
+            await asyncio.sleep(0.01)
+            # поки пишеться перша пачка, обидві читаються з памʼяті, а не старі рядки з БД
+            assert await storage.get_state(chat=1, user=1) == "first"
+            assert await storage.get_state(chat=4, user=4) == "second"
+            await asyncio.gather(first, second)
+        finally:
+            await storage.close()
+
+        reopened = _storage(tmp_path)
+        assert [await reopened.get_state(chat=u, user=u) for u in range(1, 7)] == ["first"] * 3 + ["second"] * 3
+        await reopened.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,28 @@
+from gpt import extract_ingredients
+
+RECIPE = """🔶 Омлет з сиром
+**Інгредієнти:**
+- Яйця, 3 шт
+- сир твердий, 50 г
+- сіль, перець, 2 г
+- молоко, 0,1 л
+- масло вершкове, 10г
+- зелень за смаком
+**🔷 Рецепт:**
+1. Збити яйця, 2 хв
+2. Додати сир, 50 г
+"""
+
+
+def test_extract_ingredients_reads_only_ingredient_block():
+    assert extract_ingredients(RECIPE) == {
+        ("яйця", "шт"): 3.0,
+        ("сир твердий", "г"): 50.0,
+        ("сіль, перець", "г"): 2.0,
+        ("молоко", "л"): 0.1,
+        ("масло вершкове", "г"): 10.0,
+    }
+
+
+def test_extract_ingredients_without_block():
+    assert extract_ingredients("🔶 Омлет\nПросто посмаж яйця.") == {}
@@ -0,0 +1,63 @@
+import asyncio
+import time
+
+import pytest
+
+from llm import CircuitBreaker, LLMCircuitOpen, LLMDeadlineExceeded, LLMQueueFull, LLMScheduler
+
+
+def _scheduler(**kwargs) -> LLMScheduler:
+    """Планувальник із розімкненим запобіжником, у якого вже минув reset_timeout."""
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30.0)
+    breaker.state = "open"
+    breaker.opened_at = time.monotonic() - 60
+    return LLMScheduler(breaker=breaker, **kwargs)
+
+
+async def _ok():
+    return "ok"
+
+
+def test_cancelled_probe_reopens_breaker():
+    async def scenario():
+        sched = _scheduler()
+        probe = asyncio.ensure_future(sched.run(lambda: asyncio.sleep(10)))
+        await asyncio.sleep(0.01)
+        assert sched.breaker.state == "half_open"
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        assert sched.breaker.state == "open"
+        # новий reset_timeout відраховується від скасування
+        with pytest.raises(LLMCircuitOpen):
+            await sched.run(_ok)
+        sched.breaker.opened_at -= 60
+        assert await sched.run(_ok) == "ok"
+        assert sched.breaker.state == "closed"
+
+    asyncio.run(scenario())
+
+
+def test_probe_timed_out_in_queue_reopens_breaker():
+    async def scenario():
+        sched = _scheduler(max_concurrency=1)
+        sched.active = 1  # слот зайнятий — пробний запит стає в чергу й не дочікується
+        with pytest.raises(LLMDeadlineExceeded):
+            await sched.run(_ok, deadline=0.05)
+        assert sched.breaker.state == "open"
+        sched.active = 0
+        sched.breaker.opened_at -= 60
+        assert await sched.run(_ok) == "ok"
+
+    asyncio.run(scenario())
+
+
+def test_probe_rejected_by_full_queue_reopens_breaker():
+    async def scenario():
+        sched = _scheduler(max_concurrency=1, max_queue=0)
+        sched.active = 1
+        with pytest.raises(LLMQueueFull):
+            await sched.run(_ok)
+        assert sched.breaker.state == "open"
+
+    asyncio.run(scenario())
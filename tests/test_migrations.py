@@ -0,0 +1,65 @@
+import sqlite3
+
+import migrations
+
+
+def _legacy_db(path) -> sqlite3.Connection:
+    """База до версійних міграцій: лише базові таблиці, дати у форматі дд.мм.рррр."""
+    conn = sqlite3.connect(str(path))
+    conn.execute("""
+        CREATE TABLE products (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, name TEXT,
+            quantity REAL, unit TEXT, expiry_date TEXT
+        )
+    """)
+    conn.execute("CREATE TABLE profile (user_id INTEGER PRIMARY KEY, allergies TEXT)")
+    conn.execute("CREATE TABLE outbox (id INTEGER PRIMARY KEY AUTOINCREMENT, status TEXT)")
+    conn.executemany(
+        "INSERT INTO products (user_id, name, quantity, unit, expiry_date) VALUES (?, ?, ?, ?, ?)",
+        [(i % 7, f"продукт {i}", 1.0, "шт", f"{i % 28 + 1:02d}.{i % 12 + 1:02d}.2030" if i % 3 else None)
+         for i in range(1, 501)],
+    )
+    conn.commit()
+    return conn
+
+
+def test_apply_schema_is_idempotent(tmp_path):
+    conn = _legacy_db(tmp_path / "bot.db")
+    versions = [m.version for m in migrations.MIGRATIONS]
+    assert migrations.apply_schema(conn) == versions
+    assert migrations.apply_schema(conn) == []
+    # інший процес (воркер) бачить уже застосоване й нічого не повторює
+    other = sqlite3.connect(str(tmp_path / "bot.db"))
+    assert migrations.apply_schema(other) == []
+    assert sorted(migrations.status(other)) == versions
+    other.close()
+    conn.close()
+
+
+def test_backfill_resumes_from_cursor_and_finishes(tmp_path):
+    conn = _legacy_db(tmp_path / "bot.db")
+    migrations.apply_schema(conn)
+    expiry = next(m for m in migrations.MIGRATIONS if m.backfill)
+    assert migrations.status(conn)[expiry.version][0] == "backfill"
+    # рядок, доданий уже новим кодом, backfill не чіпає (target — кінець таблиці на момент міграції)
+    conn.execute("INSERT INTO products (user_id, name, quantity, unit, expiry_date, expiry_on) "
+                 "VALUES (1, 'новий', 1, 'шт', '01.02.2031', '2031-02-01')")
+    conn.commit()
+
+    cursor = migrations.backfill_batch(conn, expiry, batch=100)
+    assert cursor == 100
+    conn.close()
+
+    # рестарт: нове зʼєднання продовжує з курсора
+    conn = sqlite3.connect(str(tmp_path / "bot.db"))
+    assert migrations.status(conn)[expiry.version] == ("backfill", 100)
+    report = migrations.run_backfills(conn, batch=100)
+    assert report[expiry.version][0] == 5  # 4 пачки, що лишились, і фінальна
+    assert migrations.status(conn)[expiry.version][0] == "done"
+    assert migrations.pending_backfills(conn) == []
+
+    rows = conn.execute("SELECT expiry_date, expiry_on FROM products").fetchall()
+    assert all(on == f"{d[6:10]}-{d[3:5]}-{d[0:2]}" for d, on in rows if d)
+    assert all(on is None for d, on in rows if not d)
+    assert conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'idx_products_expiry_on'").fetchone()
+    conn.close()
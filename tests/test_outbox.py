@@ -0,0 +1,84 @@
+import asyncio
+import sqlite3
+import time
+
+import pytest
+from aiogram.utils import exceptions
+
+import db
+import outbox
+
+
+class _Bot:
+    def __init__(self, error: Exception = None):
+        self.error = error
+        self.sent = []
+
+    async def send_message(self, user_id, text):
+        if self.error is not None:
+            raise self.error
+        await asyncio.sleep(0.01)
+        self.sent.append(user_id)
+
+
+@pytest.fixture
+def outbox_db(tmp_path):
+    db.configure(str(tmp_path / "bot.db"))
+    db.init_db()
+    return db.db_path()
+
+
+def _rows(path):
+    conn = sqlite3.connect(path)
+    rows = conn.execute("SELECT user_id, status, attempts FROM outbox ORDER BY user_id").fetchall()
+    conn.close()
+    return rows
+
+
+def test_concurrent_leaders_deliver_each_row_once(outbox_db):
+    async def scenario():
+        await db.enqueue_notifications([(user, "2026-10-17", "expired_weekly", "текст") for user in range(20)])
+        old, new = outbox.OutboxWorker(_Bot(), rate=1000), outbox.OutboxWorker(_Bot(), rate=1000)
+        await asyncio.gather(old.drain_once(), new.drain_once())
+        return old.bot.sent + new.bot.sent
+
+    assert sorted(asyncio.run(scenario())) == list(range(20))
+    assert {status for _, status, _ in _rows(outbox_db)} == {"sent"}
+
+
+def test_retry_after_does_not_burn_an_attempt(outbox_db):
+    async def scenario():
+        await db.enqueue_notifications([(1, "2026-10-17", "expired_weekly", "текст")])
+        await outbox.OutboxWorker(_Bot(exceptions.RetryAfter(1)), rate=1000).drain_once()
+
+    asyncio.run(scenario())
+    assert _rows(outbox_db) == [(1, "pending", 0)]
+
+
+def test_expired_lease_cannot_mark_reclaimed_row(outbox_db):
+    async def scenario():
+        await db.enqueue_notifications([(1, "2026-10-17", "expired_weekly", "текст")])
+        now = int(time.time())
+        [(outbox_id, *_)] = await db.claim_outbox(now, 10, -1, "old")  # оренда одразу прострочена
+        assert await db.claim_outbox(now, 10, 300, "new")
+        assert not await db.mark_outbox_failed(outbox_id, "old", "timeout", None)
+        assert await db.mark_outbox_sent(outbox_id, "new")
+
+    asyncio.run(scenario())
+    assert _rows(outbox_db) == [(1, "sent", 1)]
+
+
+def test_failed_mark_after_send_does_not_break_the_batch(outbox_db, monkeypatch):
+    async def broken_mark(*args, **kwargs):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(outbox, "mark_outbox_sent", broken_mark)
+    monkeypatch.setattr(outbox, "MARK_RETRIES", 2)
+
+    async def scenario():
+        await db.enqueue_notifications([(user, "2026-10-17", "expired_weekly", "текст") for user in range(3)])
+        worker = outbox.OutboxWorker(_Bot(), rate=1000)
+        return await worker.drain_once(), worker.bot.sent
+
+    sent, delivered = asyncio.run(scenario())
+    assert sent == 3 and sorted(delivered) == [0, 1, 2]
@@ -0,0 +1,128 @@
+"""
+Властивості product_parser на детермінованому генерованому корпусі.
+
+Корпус — випадкові елементи з граматики «назва кількість одиниця [дата]» із шумом:
+зайві пробіли й табуляції, дужки й тире навколо дати, дата на початку чи в середині,
+неіснуючі дати, нульові/відʼємні/нечислові кількості, порожні елементи. Еталон — старий
+поелементний парсер з db.py (benchmarks/bench_parser.py, там же порівняння швидкості).
+"""
+import math
+import random
+from datetime import datetime
+
+import pytest
+
+from benchmarks.bench_parser import LEGACY_DATE_RE, legacy_parse_one_item
+from product_parser import is_valid_date, parse_item, parse_products
+
+CORPUS = 20_000
+SEEDS = (7, 8, 9)
+
+WORDS = ["помідори", "Помідори", "чері", "яйце", "яйця", "молоко", "сир", "твердий", "курка", "філе",
+         "огурець", "Огірки", "гречка", "тунець", "консервований", "рис", "морква", "100%", "2.5%", "ПЕТ"]
+UNITS = ["г", "кг", "шт", "л", "мл", "уп", "пачка", "банка"]
+QTYS = ["1", "2", "12", "300", "0.5", "1.5", "2.25", "1e3", "0", "-2", "nan", "inf", "???", "½", "+3", "1_000"]
+SPACES = [" ", " ", " ", "  ", "\t", " \t "]
+
+
+def gen_date(rnd: random.Random) -> str:
+    if rnd.random() < 0.8:
+        return f"{rnd.randint(1, 28):02d}.{rnd.randint(1, 12):02d}.{rnd.randint(2024, 2031)}"
+    return rnd.choice(["31.02.2025", "29.02.2023", "29.02.2024", "00.01.2025", "15.13.2025", "31.04.2026",
+                       "01.01.0000", "29.02.2100", "29.02.2000"])
+
+
+def gen_item(rnd: random.Random) -> str:
+    sp = lambda: rnd.choice(SPACES)
+    tokens = [rnd.choice(WORDS) for _ in range(rnd.choice([0, 1, 1, 2, 3]))]
+    if rnd.random() < 0.95:
+        tokens.append(rnd.choice(QTYS))
+    if rnd.random() < 0.95:
+        tokens.append(rnd.choice(UNITS))
+    body = sp().join(tokens)
+    r = rnd.random()
+    if r < 0.35:
+        body += sp() + gen_date(rnd)
+    elif r < 0.45:
+        body += sp() + rnd.choice(["(", "(до ", "– ", "- ", "—"]) + gen_date(rnd) + rnd.choice(["", ")", " )"])
+    elif r < 0.5:
+        body = gen_date(rnd) + sp() + body
+    elif r < 0.55 and len(tokens) > 1:
+        parts = body.split(" ", 1)
+        body = parts[0] + " " + gen_date(rnd) + " " + parts[-1]
+    elif r < 0.58:
+        body += sp() + gen_date(rnd) + sp() + gen_date(rnd)
+    if rnd.random() < 0.3:
+        body = sp() + body + sp()
+    return body
+
+
+def gen_message(n: int, rnd: random.Random) -> str:
+    return ",".join(gen_item(rnd) if rnd.random() > 0.03 else rnd.choice(["", " "]) for _ in range(n))
+
+
+def _stricter_than_legacy(raw: str, old: tuple) -> bool:
+    """Старий прийняв, новий відхилив — допустимо лише для неіснуючої дати або кількості ≤ 0 / nan / inf."""
+    m = LEGACY_DATE_RE.search(raw.strip())
+    if m and not is_valid_date(int(m.group(1)), int(m.group(2)), int(m.group(3))):
+        return True
+    return not (0 < old[1] < math.inf)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_corpus_agrees_with_legacy_parser(seed):
+    rnd = random.Random(seed)
+    for _ in range(CORPUS):
+        raw = gen_item(rnd)
+        old = legacy_parse_one_item(raw)
+        new, reason = parse_item(raw)
+        if new is not None:
+            # жодних нових «тихих» значень: прийняте розбирається так само, як раніше
+            assert new == old, raw
+        elif raw.strip():
+            assert reason, raw
+            if old is not None:
+                assert _stricter_than_legacy(raw, old), (raw, old, reason)
+        else:
+            assert reason is None
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_error_positions_point_at_rejected_items(seed):
+    rnd = random.Random(seed)
+    for _ in range(CORPUS // 100):
+        text = gen_message(rnd.randint(1, 30), rnd)
+        result = parse_products(text)
+        non_empty = [raw for raw in text.split(",") if raw.strip()]
+        assert len(result.items) + len(result.errors) == len(non_empty)
+        for error in result.errors:
+            assert text[error.start:].startswith(error.raw), (text, error)
+            assert non_empty[error.index].strip() == error.raw
+
+
+def test_round_trip_of_well_formed_items():
+    rnd = random.Random(11)
+    for _ in range(CORPUS // 10):
+        expected = [(
+            " ".join(rnd.sample(["сир", "твердий", "курка", "філе", "гречка", "морква"], rnd.randint(1, 3))),
+            float(rnd.choice(["1", "2", "300", "0.5", "1.5"])),
+            rnd.choice(UNITS),
+            f"{rnd.randint(1, 28):02d}.{rnd.randint(1, 12):02d}.{rnd.randint(2025, 2030)}" if rnd.random() < 0.7 else None,
+        ) for _ in range(rnd.randint(1, 20))]
+        text = ", ".join(" ".join(f"{v:g}" if isinstance(v, float) else v for v in item if v is not None)
+                         for item in expected)
+        result = parse_products(text)
+        assert result.errors == []
+        assert result.items == expected
+
+
+def test_date_arithmetic_matches_strptime():
+    for year in (0, 1, 4, 100, 400, 1900, 2000, 2023, 2024, 2100, 9999):
+        for month in range(0, 20):
+            for day in range(0, 40):
+                try:
+                    datetime.strptime(f"{day:02d}.{month:02d}.{year:04d}", "%d.%m.%Y")
+                    expected = True
+                except ValueError:
+                    expected = False
+                assert is_valid_date(day, month, year) == expected, (day, month, year)
@@ -0,0 +1,22 @@
+import asyncio
+
+import db
+import recipes
+
+
+def test_duplicate_ingredients_are_summed(tmp_path):
+    db.configure(str(tmp_path / "bot.db"))
+    db.init_db()
+
+    async def scenario():
+        recipe_id = await recipes.save(1, "lunch", "🔶 Омлет\nКроки", {
+            ("Яйця", "шт"): 2.0,
+            ("яйця", "шт"): 1.0,
+            ("молоко", "мл"): 100.0,
+        })
+        return await db.get_recipe(1, recipe_id)
+
+    recipe = asyncio.run(scenario())
+    assert recipe["title"] == "Омлет"
+    assert recipe["ingredients"][("яйця", "шт")] == 3.0
+    assert recipe["ingredients"][("молоко", "мл")] == 100.0
@@ -0,0 +1,41 @@
+import asyncio
+import sqlite3
+from datetime import date, datetime, timezone
+
+import reminders
+
+SATURDAY = date(2026, 10, 17)
+
+
+def test_late_slot_keeps_its_local_day():
+    tz = "Europe/Kyiv"
+    crossed = 0
+    for user_id in range(1, 200):
+        scheduled = reminders.reminder_moment(user_id, tz, "23:30", SATURDAY)
+        # розсіювання переносить частину нагадувань за північ — у неділю за місцевим часом
+        crossed += scheduled.date() != SATURDAY
+        assert reminders.slot_day(user_id, tz, int(scheduled.timestamp())) == SATURDAY
+    assert crossed
+
+
+def test_late_tick_sends_weekly_digest_for_saturday_slot(tmp_path):
+    import db
+
+    db.configure(str(tmp_path / "bot.db"))
+    db.init_db()
+    user_id, tz = 42, "Europe/Kyiv"
+    scheduled = int(reminders.reminder_moment(user_id, tz, "23:30", SATURDAY).timestamp())
+
+    async def scenario():
+        await db.add_product_to_db(user_id, "молоко 1 л 01.10.2026")
+        await db.update_reminder_settings(user_id, tz, "23:30", True, scheduled)
+        # крон прокинувся лише в неділю по обіді за київським часом
+        await reminders.tick(datetime(2026, 10, 18, 12, tzinfo=timezone.utc))
+
+    asyncio.run(scenario())
+    conn = sqlite3.connect(db.db_path())
+    rows = conn.execute("SELECT day, kind FROM outbox WHERE user_id = ?", (user_id,)).fetchall()
+    next_at = conn.execute("SELECT next_reminder_at FROM reminders WHERE user_id = ?", (user_id,)).fetchone()[0]
+    conn.close()
+    assert rows == [(SATURDAY.isoformat(), "expired_weekly")]
+    assert next_at > datetime(2026, 10, 18, 12, tzinfo=timezone.utc).timestamp()
@@ -0,0 +1,35 @@
+import asyncio
+
+import pytest
+from aiogram import types
+from aiogram.utils import exceptions
+
+import screens
+
+
+def _message(error: Exception) -> types.Message:
+    message = types.Message(message_id=5, text="старий екран", chat=types.Chat(id=1, type="private"))
+    answers = []
+
+    async def edit_text(text, **kwargs):
+        raise error
+
+    async def answer(text, **kwargs):
+        answers.append(text)
+        return message
+
+    message.edit_text, message.answer, message.answers = edit_text, answer, answers
+    return message
+
+
+def test_uneditable_message_falls_back_to_new_one():
+    message = _message(exceptions.MessageCantBeEdited("Message can't be edited"))
+    asyncio.run(screens.edit(message, "новий екран"))
+    assert message.answers == ["новий екран"]
+
+
+def test_other_bad_request_propagates():
+    message = _message(exceptions.BadRequest("Can't parse entities: unsupported start tag"))
+    with pytest.raises(exceptions.BadRequest):
+        asyncio.run(screens.edit(message, "<b>новий екран"))
+    assert message.answers == []
@@ -0,0 +1,152 @@
+import collections
+import math
+import os
+import time
+import typing
+
+from aiogram import Dispatcher, types
+from aiogram.dispatcher.handler import CancelHandler, current_handler
+from aiogram.dispatcher.middlewares import BaseMiddleware
+
+import metrics
+from bounded_cache import BoundedCache
+from callback_router import effective_handler
+
+# Класи дій: llm — генерація рецептів, db_write — запис у холодильник, feedback — фідбек,
+# import — імпорт/експорт файлом (один документ може містити тисячі продуктів)
+DEFAULT_LIMITS = {
+    "llm": "6/600",        # 6 рецептів, поповнення 6 за 10 хв
+    "db_write": "500/60",  # 500 продуктів за хвилину (велика вставка = багато токенів)
+    "feedback": "3/600",
+    "import": "5/600",
+}
+
+# Скільки разів кожен клас дій було обмежено (для метрик)
+throttled_events: typing.Counter[str] = collections.Counter()
+metrics.Gauge(
+    "bot_throttled_total", "Скільки разів спрацював ліміт",
+    lambda: {(action,): n for action, n in throttled_events.items()}, ("action",), kind="counter",
+)
+
+
+def rate_limit(action: str, cost: typing.Optional[typing.Callable[[typing.Any], int]] = None):
+    """Позначає хендлер класом дії; `cost(event)` — скільки токенів коштує виклик (за замовчуванням 1)."""
+    def decorator(func):
+        func.throttle_action = action
+        func.throttle_cost = cost
+        return func
+    return decorator
+
+
+def items_cost(message: types.Message) -> int:
+    # вставка "a 1 шт, b 2 шт, ..." коштує по токену за продукт
+    text = message.get_args() if message.is_command() else (message.text or "")
+    return max(1, text.count(",") + 1)
+
+
+def document_cost(message: types.Message) -> int:
+    # /import без файлу лише показує підказку — безкоштовно
+    reply = message.reply_to_message
+    return 1 if message.document or (reply and reply.document) else 0
+
+
+def parse_limit(spec: str) -> typing.Tuple[float, float]:
+    """'6/600' → (місткість 6, поповнення 6/600 токенів за секунду)."""
+    amount, period = spec.split("/")
+    return float(amount), float(amount) / float(period)
+
+
+class TokenBucket:
+    """Стан відра — простий dict, щоб його можна було зберегти у FSM-сховищі."""
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+
+    def take(self, state: dict, cost: float, now: float) -> typing.Tuple[bool, float]:
+        tokens = state.get("tokens", self.capacity)
+        updated = state.get("ts", now)
+        tokens = min(self.capacity, tokens + (now - updated) * self.rate)
+
+        # запит, дорожчий за все відро, пропускаємо з повного відра, щоб не блокувати назавжди
+        cost = min(cost, self.capacity)
+        if tokens >= cost:
+            state["tokens"], state["ts"] = tokens - cost, now
+            return True, 0.0
+
+        state["tokens"], state["ts"] = tokens, now
+        return False, (cost - tokens) / self.rate
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """
+    Обмежує дорогі дії за користувачем і класом дії (token bucket).
+    Відра живуть у памʼяті або в FSM-сховищі (store="storage"), щоб їх бачили всі воркери.
+    """
+
+    def __init__(self, limits: typing.Dict[str, str], store: str = "memory", max_users: int = 100_000):
+        super().__init__()
+        self.buckets = {action: TokenBucket(*parse_limit(spec)) for action, spec in limits.items()}
+        self.store = store
+        # за час повного поповнення відро стає повним — такий запис можна просто забути
+        refill = max((b.capacity / b.rate for b in self.buckets.values()), default=None)
+        self._memory = BoundedCache("throttle_buckets", max_users, ttl=refill)
+
+    @classmethod
+    def from_env(cls) -> "ThrottlingMiddleware":
+        limits = {
+            action: os.getenv(f"THROTTLE_{action.upper()}") or spec
+            for action, spec in DEFAULT_LIMITS.items()
+        }
+        return cls(
+            limits,
+            store=(os.getenv("THROTTLE_STORE") or "memory").lower(),
+            max_users=int(os.getenv("THROTTLE_MEMORY_MAX") or 100_000),
+        )
+
+    async def _load(self, user_id: int, action: str) -> dict:
+        if self.store == "storage":
+            bucket = await Dispatcher.get_current().storage.get_bucket(chat=user_id, user=user_id)
+            return bucket.get(f"throttle_{action}", {})
+        return self._memory.get((user_id, action)) or {}
+
+    async def _save(self, user_id: int, action: str, state: dict):
+        if self.store == "storage":
+            await Dispatcher.get_current().storage.update_bucket(
+                chat=user_id, user=user_id, bucket={f"throttle_{action}": state}
+            )
+        else:
+            self._memory.set((user_id, action), state)
+
+    async def _check(self, user_id: int, event) -> typing.Optional[float]:
+        handler = effective_handler(current_handler.get(), event)
+        action = getattr(handler, "throttle_action", None)
+        bucket = self.buckets.get(action)
+        if bucket is None:
+            return None
+
+        cost_fn = getattr(handler, "throttle_cost", None)
+        cost = cost_fn(event) if cost_fn else 1
+
+        state = await self._load(user_id, action)
+        allowed, retry_after = bucket.take(state, cost, time.time())
+        await self._save(user_id, action, state)
+        if allowed:
+            return None
+
+        throttled_events[action] += 1
+        return retry_after
+
+    async def on_process_message(self, message: types.Message, data: dict):
+        retry_after = await self._check(message.from_user.id, message)
+        if retry_after is not None:
+            await message.answer(f"⏳ Забагато запитів. Спробуй ще раз через {math.ceil(retry_after)} с.")
+            raise CancelHandler()
+
+    async def on_process_callback_query(self, callback_query: types.CallbackQuery, data: dict):
+        retry_after = await self._check(callback_query.from_user.id, callback_query)
+        if retry_after is not None:
+            await callback_query.answer(
+                f"⏳ Забагато запитів. Спробуй ще раз через {math.ceil(retry_after)} с.", show_alert=True
+            )
+            raise CancelHandler()
@@ -0,0 +1,98 @@
+import hmac
+import logging
+import os
+import typing
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher, types
+from aiogram.dispatcher.webhook import WebhookRequestHandler
+from aiogram.utils.executor import Executor
+
+from log import fields
+from workers import UserOrderedRunner
+
+logger = logging.getLogger(__name__)
+
+# Ключі в aiohttp-застосунку
+SECRET_KEY = "WEBHOOK_SECRET"
+RUNNER_KEY = "WEBHOOK_RUNNER"
+
+
+class ConcurrentWebhookHandler(WebhookRequestHandler):
+    """
+    Вебхук, який одразу відповідає Telegram 200 OK, а апдейт обробляє у фоні.
+
+    Апдейти різних користувачів обробляються паралельно, одного — по черзі.
+    Запити без правильного X-Telegram-Bot-Api-Secret-Token відхиляються.
+    """
+
+    def check_secret(self):
+        secret = self.request.app.get(SECRET_KEY)
+        if not secret:
+            return
+        got = self.request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+        if not hmac.compare_digest(got, secret):
+            raise web.HTTPForbidden()
+
+    async def post(self):
+        self.validate_ip()
+        self.check_secret()
+
+        self.get_dispatcher()
+        data = await self.request.json()
+        # повільні хендлери (GPT) не тримають зʼєднання з Telegram
+        await self.request.app[RUNNER_KEY].submit(data)
+        return web.Response(text="ok")
+
+
+def create_web_app(dp: Dispatcher, path: str, secret: typing.Optional[str] = None,
+                   max_inflight: int = 200) -> web.Application:
+    async def process(update: dict):
+        Bot.set_current(dp.bot)
+        Dispatcher.set_current(dp)
+        await dp.updates_handler.notify(types.Update(**update))
+
+    app = web.Application()
+    app[SECRET_KEY] = secret
+    app[RUNNER_KEY] = UserOrderedRunner(process, limit=max_inflight)
+    app.router.add_route("*", path, ConcurrentWebhookHandler, name="webhook_handler")
+    app["BOT_DISPATCHER"] = dp
+    return app
+
+
+def run_webhook(dp: Dispatcher, on_startup=None, on_shutdown=None):
+    """Запускає бота у режимі вебхука на локальному aiohttp-сервері."""
+    base_url = (os.getenv("WEBHOOK_HOST") or "").rstrip("/")
+    if not base_url:
+        raise RuntimeError("Для BOT_MODE=webhook потрібна змінна WEBHOOK_HOST (публічний https-URL)")
+    path = os.getenv("WEBHOOK_PATH") or "/webhook"
+    secret = os.getenv("WEBHOOK_SECRET") or None
+    max_inflight = int(os.getenv("WEBHOOK_MAX_INFLIGHT") or 200)
+
+    async def set_webhook(dispatcher: Dispatcher):
+        # drop_pending_updates=False: апдейти, що прийшли поки бот лежав, не губляться
+        await dispatcher.bot.set_webhook(
+            base_url + path,
+            secret_token=secret,
+            drop_pending_updates=False,
+            max_connections=int(os.getenv("WEBHOOK_MAX_CONNECTIONS") or 40),
+        )
+        logger.info("🌐 Вебхук встановлено", extra=fields(url=base_url + path))
+
+    async def wait_inflight(dispatcher: Dispatcher):
+        await app[RUNNER_KEY].join()
+
+    app = create_web_app(dp, path, secret, max_inflight)
+    executor = Executor(dp, skip_updates=False)
+    executor.on_startup(set_webhook, polling=False)
+    if on_startup:
+        executor.on_startup(on_startup, polling=False)
+    executor.on_shutdown(wait_inflight, polling=False)
+    if on_shutdown:
+        executor.on_shutdown(on_shutdown, polling=False)
+
+    executor.set_webhook(webhook_path=None, request_handler=ConcurrentWebhookHandler, web_app=app)
+    executor.run_app(
+        host=os.getenv("WEBAPP_HOST") or "0.0.0.0",
+        port=int(os.getenv("WEBAPP_PORT") or os.getenv("PORT") or 8080),
+    )
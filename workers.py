@@ -0,0 +1,243 @@
+import asyncio
+import logging
+import multiprocessing as mp
+import os
+import queue as queue_mod
+import sqlite3
+import time
+import typing
+import uuid
+
+from aiogram import Bot, Dispatcher, types
+
+from db import db_path
+from log import fields
+
+logger = logging.getLogger(__name__)
+
+# Типи апдейтів, у яких є користувач (для шардування)
+_USER_FIELDS = (
+    "message", "edited_message", "callback_query", "inline_query",
+    "chosen_inline_result", "shipping_query", "pre_checkout_query",
+    "my_chat_member", "chat_member", "chat_join_request",
+)
+
+# ====== Шардування ======
+def update_user_id(update: dict) -> typing.Optional[int]:
+    for field in _USER_FIELDS:
+        obj = update.get(field)
+        if obj and obj.get("from"):
+            return obj["from"]["id"]
+    return None
+
+def shard_for(user_id: typing.Optional[int], workers: int) -> int:
+    # id користувача — ціле число, тож простий модуль стабільний між рестартами
+    return (user_id or 0) % workers
+
+async def close_bot_session(bot: Bot):
+    # bot.close() — це метод Bot API (вихід з хмари), тож закриваємо лише HTTP-сесію
+    session = await bot.get_session()
+    await session.close()
+
+# ====== Вибір лідера для cron-задач ======
+class LeaderLease:
+    """
+    Оренда лідерства в SQLite: cron-задачі виконує лише той воркер, який тримає оренду.
+    Якщо лідер падає, оренда спливає через `ttl` секунд і її підхоплює інший.
+    """
+
+    def __init__(self, path: typing.Optional[str] = None, name: str = "cron", ttl: float = 30.0):
+        self.path = path or db_path()
+        self.name = name
+        self.ttl = ttl
+        self.holder = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS leases (
+                name TEXT PRIMARY KEY,
+                holder TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        """)
+        return conn
+
+    def try_acquire(self) -> bool:
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("""
+                INSERT INTO leases (name, holder, expires_at) VALUES (?, ?, ?)
+                ON CONFLICT(name) DO UPDATE SET holder=excluded.holder, expires_at=excluded.expires_at
+                WHERE leases.holder = excluded.holder OR leases.expires_at < ?
+            """, (self.name, self.holder, now + self.ttl, now))
+            conn.commit()
+            row = conn.execute("SELECT holder FROM leases WHERE name = ?", (self.name,)).fetchone()
+        finally:
+            conn.close()
+        self.is_leader = bool(row and row[0] == self.holder)
+        return self.is_leader
+
+    def release(self):
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM leases WHERE name = ? AND holder = ?", (self.name, self.holder))
+            conn.commit()
+        finally:
+            conn.close()
+        self.is_leader = False
+
+    async def keep_alive(self):
+        while True:
+            try:
+                self.try_acquire()
+            except sqlite3.Error:
+                logger.warning("⚠️ Не вдалося оновити оренду лідера", exc_info=True)
+                self.is_leader = False
+            await asyncio.sleep(self.ttl / 3)
+
+# single — звичайний режим (cron завжди тут), front — лише роутинг, worker — за орендою
+_role = "single"
+_lease: typing.Optional[LeaderLease] = None
+
+def is_cron_leader() -> bool:
+    if _role == "front":
+        return False
+    return _lease is None or _lease.is_leader
+
+# ====== Воркер ======
+class UserOrderedRunner:
+    """
+    Обробляє апдейти конкурентно між користувачами, але строго послідовно
+    для одного користувача. `limit` обмежує кількість апдейтів в обробці.
+    """
+
+    def __init__(self, process: typing.Callable[[dict], typing.Awaitable], limit: typing.Optional[int] = None):
+        self.process = process
+        self._tails: typing.Dict[typing.Optional[int], asyncio.Future] = {}
+        self._slots = asyncio.Semaphore(limit) if limit else None
+
+    async def _run_after(self, prev, update):
+        try:
+            if prev is not None:
+                await asyncio.gather(prev, return_exceptions=True)
+            await self.process(update)
+        except Exception:
+            logger.exception("❌ Помилка обробки апдейту")
+        finally:
+            if self._slots is not None:
+                self._slots.release()
+
+    async def submit(self, update: dict) -> asyncio.Future:
+        if self._slots is not None:
+            await self._slots.acquire()
+
+        user_id = update_user_id(update)
+        task = asyncio.ensure_future(self._run_after(self._tails.get(user_id), update))
+        self._tails[user_id] = task
+
+        def forget(t, uid=user_id):
+            if self._tails.get(uid) is t:
+                del self._tails[uid]
+        task.add_done_callback(forget)
+        return task
+
+    async def join(self):
+        if self._tails:
+            await asyncio.gather(*self._tails.values(), return_exceptions=True)
+
+async def serve_queue(updates: "mp.Queue", process: typing.Callable[[dict], typing.Awaitable]):
+    """Читає апдейти з черги процесу і передає їх у UserOrderedRunner."""
+    loop = asyncio.get_running_loop()
+    runner = UserOrderedRunner(process)
+
+    while True:
+        try:
+            update = updates.get_nowait()
+        except queue_mod.Empty:
+            update = await loop.run_in_executor(None, updates.get)
+        if update is None:
+            break
+        await runner.submit(update)
+
+    await runner.join()
+
+def worker_main(index: int, updates: "mp.Queue", workers: int):
+    global _role, _lease
+    # bootstrap імпортує workers, тож тут, а не на рівні модуля
+    import bootstrap
+    dp = bootstrap.get_dispatcher()
+    Bot.set_current(dp.bot)
+    Dispatcher.set_current(dp)
+    shard = (index, workers)
+
+    _role = "worker"
+    _lease = LeaderLease()
+    loop = asyncio.get_event_loop()
+    lease_task = loop.create_task(_lease.keep_alive())
+
+    async def process(update: dict):
+        await dp.updates_handler.notify(types.Update.to_object(update))
+
+    logger.info("👷 Воркер запущено", extra=fields(worker=index, pid=os.getpid()))
+    # БД, метрики на METRICS_PORT + 1 + index, outbox (доставляє лише лідер), індекс термінів
+    # лише своїх користувачів, backfill міграцій — у воркері 0
+    loop.run_until_complete(bootstrap.startup(dp, shard=shard))
+    try:
+        loop.run_until_complete(serve_queue(updates, process))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        lease_task.cancel()
+        _lease.release()
+        loop.run_until_complete(bootstrap.shutdown(dp, shard=shard))
+        loop.run_until_complete(dp.storage.close())
+        loop.run_until_complete(close_bot_session(dp.bot))
+
+# ====== Фронт ======
+async def _poll_and_route(bot: Bot, queues: typing.List["mp.Queue"], skip_updates: bool):
+    offset = None
+    if skip_updates:
+        skipped = await bot.get_updates(offset=-1, timeout=1)
+        if skipped:
+            offset = skipped[-1].update_id + 1
+
+    while True:
+        try:
+            updates = await bot.get_updates(offset=offset, timeout=20)
+        except Exception:
+            logger.warning("⚠️ Помилка getUpdates", exc_info=True)
+            await asyncio.sleep(1)
+            continue
+
+        for update in updates:
+            offset = update.update_id + 1
+            data = update.to_python()
+            queues[shard_for(update_user_id(data), len(queues))].put(data)
+
+def run_sharded(bot: Bot, workers: int, skip_updates: bool = True):
+    """Фронт-процес: отримує апдейти і розкидає їх по `workers` процесах за user_id."""
+    global _role
+    _role = "front"
+    ctx = mp.get_context("spawn")
+    queues = [ctx.Queue() for _ in range(workers)]
+    procs = [
+        ctx.Process(target=worker_main, args=(i, queues[i], workers), name=f"bot-worker-{i}", daemon=True)
+        for i in range(workers)
+    ]
+    for p in procs:
+        p.start()
+
+    loop = asyncio.get_event_loop()
+    try:
+        loop.run_until_complete(_poll_and_route(bot, queues, skip_updates))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for q in queues:
+            q.put(None)
+        for p in procs:
+            p.join(timeout=10)
+        loop.run_until_complete(close_bot_session(bot))